@@ -0,0 +1,29 @@
+from nbodykit.lab import *
+from nbodykit import setup_logging, set_options, CurrentMPIComm
+from nbodykit.utils import ParallelSort
+import numpy
+import pytest
+
+setup_logging()
+
+@pytest.mark.parametrize('engine', ['mpsort', 'samplesort'])
+@pytest.mark.parametrize('N', [1e6, 1e7, 1e8, 1e9])
+def test_sort(benchmark, N, engine):
+
+    comm = CurrentMPIComm.get()
+
+    # records of Position, Velocity and a random 64-bit key
+    with benchmark("Data"):
+        size = int(N) * (comm.rank + 1) // comm.size - int(N) * comm.rank // comm.size
+        rng = numpy.random.RandomState(comm.rank)
+        data = numpy.empty(size, dtype=[('Key', 'u8'), ('Position', ('f4', 3)), ('Velocity', ('f4', 3))])
+        data['Key'] = rng.randint(0, 2**63, size=size, dtype='i8')
+        data['Position'] = rng.uniform(size=(size, 3))
+        data['Velocity'] = rng.uniform(size=(size, 3))
+
+    with benchmark("Sort"):
+        with set_options(sort_engine=engine):
+            ParallelSort(data, orderby='Key', comm=comm)
+
+    # save meta-data
+    benchmark.attrs.update(N=N, engine=engine)
@@ -19,6 +19,18 @@ _global_options = {}
 _global_options['global_cache_size'] = 1e8 # 100 MB
 _global_options['dask_chunk_size'] = 100000
 _global_options['paint_chunk_size'] = 1024 * 1024 * 4
+_global_options['paint_memory_budget'] = None
+_global_options['paint_pipeline'] = False
+_global_options['io_concurrency'] = 4
+_global_options['mesh_cache_dir'] = None
+_global_options['mesh_cache_size'] = '10GB'
+_global_options['binning_cache_size'] = '2GB'
+_global_options['paircount_chunks'] = 32
+_global_options['paircount_cache_dir'] = None
+_global_options['mpirng_mode'] = 'chunked'
+_global_options['sort_engine'] = 'mpsort'
+_global_options['sort_nranks'] = None
+_global_options['hod_engine'] = 'halotools'
 
 from contextlib import contextmanager
 import logging
@@ -226,6 +238,62 @@ class set_options(object):
     paint_chunk_size : int
         the number of objects to paint at the same time. This is independent
         from dask chunksize.
+    paint_memory_budget : int, str, None
+        the number of bytes of particle data held on each rank when
+        painting, e.g. '4GB'; chunks are sized to fit in the budget,
+        up to ``paint_chunk_size`` objects. The default (``None``)
+        sizes chunks by ``paint_chunk_size`` only.
+    paint_pipeline : bool
+        if True, evaluate the columns of the next chunk in a background
+        thread while the current chunk is exchanged and painted; this holds
+        the columns of two chunks in memory.
+    io_concurrency : int
+        the maximum number of files of a multi-file catalog read at the
+        same time, in threads, when a read spans several files
+    mesh_cache_dir : str, None
+        if set, the directory of a persistent cache of painted meshes;
+        painting the same catalog columns to the same mesh again
+        loads the field from the cache. The default (``None``) disables
+        the cache.
+    mesh_cache_size : int, str
+        the maximum size of the mesh cache on disk in bytes, e.g. '10GB';
+        the least recently used meshes are evicted first
+    binning_cache_size : int, str
+        the maximum size in bytes, per rank, of the binnings of the local
+        modes that :func:`~nbodykit.algorithms.fftpower.project_to_basis`
+        keeps for meshes of the same geometry; default is '2GB'. A binning
+        takes about 25 bytes per local mode, e.g. 1.7 GB for ``Nmesh=512``
+        on a single rank; raise the size for larger meshes per rank. The
+        least recently used binnings are evicted first; 0 disables the cache.
+    paircount_chunks : int
+        the number of chunks the objects of each rank are split into when
+        counting pairs with :mod:`Corrfunc`; ranks that run out of work
+        steal the remaining chunks of other ranks. Set to 1 to disable
+        the work stealing.
+    paircount_cache_dir : str, None
+        if set, the directory of a persistent cache of random-random pair
+        counts; the correlation function algorithms load the R1R2 counts
+        of the same randoms and binning from the cache instead of
+        counting them again. The default (``None``) disables the cache.
+    mpirng_mode : 'chunked', 'counter'
+        the default mode of :class:`~nbodykit.mpirng.MPIRandomState`.
+        'chunked' seeds a generator per chunk of items, and reproduces
+        earlier results for the same seed and chunk size; 'counter'
+        transforms a single Philox stream, which needs no padding of
+        arguments across ranks. Both are invariant under the number of ranks.
+    sort_engine : 'mpsort', 'samplesort'
+        the engine of the global sorts, see :func:`~nbodykit.utils.ParallelSort`.
+        'mpsort' shuffles the full items during the sort; 'samplesort' splits
+        the keys by a global histogram of sampled keys, moves only the keys
+        and 8-byte indices during the sort, and then each item once.
+    sort_nranks : int, None
+        the number of ranks holding the keys in the local sorts of the
+        'samplesort' engine; the default (``None``) uses all ranks
+    hod_engine : 'halotools', 'native'
+        the default engine of :func:`~nbodykit.source.catalog.halos.HaloCatalog.populate`.
+        'halotools' populates the mock of the :mod:`halotools` model on each
+        rank; 'native' draws the galaxies of the models in :mod:`nbodykit.hod`
+        from their mean occupations, re-using the halo columns when repopulating.
     """
     def __init__(self, **kwargs):
         self.old = _global_options.copy()
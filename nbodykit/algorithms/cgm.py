@@ -1,12 +1,11 @@
 import numpy
 import logging
 import kdcount
-import mpsort
-import pandas as pd
 from six import string_types
 import warnings
 
 from nbodykit import CurrentMPIComm
+from nbodykit.utils import ParallelSort
 from nbodykit.source.catalog import ArrayCatalog
 
 class CylindricalGroups(object):
@@ -248,15 +247,13 @@ def cgm(comm, data, domain, rperp, rpar, los, boxsize):
     pos2       = layout2.exchange(pos1)
     origind2   = layout2.exchange(origind1)
     sortindex2 = layout2.exchange(sortindex1)
-    startrank  = layout2.exchange(numpy.ones(len(pos1), dtype='i4')*comm.rank)
 
     # make the KD-tree
     tree1 = kdcount.KDTree(pos1, boxsize=boxsize).root
     tree2 = kdcount.KDTree(pos2, boxsize=boxsize).root
 
-    dataframe = []
-    j_gt_i = numpy.zeros(len(pos1), dtype='f4')
-    wrong_rank = numpy.zeros(len(pos1), dtype='f4')
+    # the pairs with a higher priority partner
+    pairs = _PairBuffer()
 
     def callback(r, i, j):
 
@@ -285,97 +282,57 @@ def cgm(comm, data, domain, rperp, rpar, los, boxsize):
 
         # save the valid pairs
         # To Be Valid: pairs must be within cylinder (compare rperp and rpar)
-        valid = (rsky2 <= rperp2)&(rlos2 <= rpar2)
-        i = i[valid]; j = j[valid];
+        # and j must have a higher priority (sorted index) than i
+        valid = (rsky2 <= rperp2)&(rlos2 <= rpar2)&(sortindex2[j] > sortindex1[i])
+        pairs.append(i[valid], j[valid])
 
-        # the correctly sorted indices of particles
-        sort_i = sortindex1[i]
-        sort_j = sortindex2[j]
-
-        # the rank where the j object lives
-        rank_j = startrank[j]
-
-        # track pairs where sorted j > sorted i
-        weights = numpy.where(sort_i < sort_j, 1, 0)
-        j_gt_i[:] += numpy.bincount(i, weights=weights, minlength=len(pos1))
-
-        # track pairs where j rank is wrong
-        weights *= numpy.where(rank_j != comm.rank, 1, 0)
-        wrong_rank[:] += numpy.bincount(i, weights=weights, minlength=len(pos1))
-
-        # save the valid pairs for final calculations
-        res = numpy.vstack([i, j, sort_i, sort_j]).T
-        dataframe.append(res)
-
-    # add all the valid pairs to a dataframe
+    # find all of the valid pairs
     tree1.enum(tree2, rmax, process=callback)
+    i, j = pairs.finalize()
 
-    # sorted indices of objects that are centrals
-    # (objects with no pairs with j > i)
-    centrals = set(sortindex1[(j_gt_i==0)])
-
-    # sorted indices of objects that might be centrals
-    # (pairs with j>i that live on other ranks)
-    maybes = set(sortindex1[(wrong_rank>0)])
-
-    # store the pairs in a pandas dataframe for fast groupby
-    dataframe = numpy.concatenate(dataframe, axis=0)
-    df = pd.DataFrame(dataframe, columns=['i', 'j', 'sort_i', 'sort_j'])
-
-    # we sort by the correct sorted index in descending order which puts
-    # highest priority objects first
-    df.sort_values("sort_i", ascending=False, inplace=True)
-
-    # index by the correct sorted order
-    df.set_index('sort_i', inplace=True)
+    # order the pairs by i, and by priority of j for each i
+    sort_j = sortindex2[j]
+    order = numpy.lexsort((sort_j, i))
+    i = i[order]; j = j[order]; sort_j = sort_j[order]
 
-    # to find centrals, considers objects that could be satellites of another
-    # (pairs with sort_j > sort_i)
-    possible_cens = df[(df['sort_j']>df.index.values)]
-    possible_cens = possible_cens.drop(centrals, errors='ignore')
-    _remove_objects_paired_with(possible_cens, centrals) # remove objs paired with cens
+    # the index of the partner on this rank; -1 for objects on other ranks
+    argsort1 = numpy.argsort(sortindex1)
+    k = numpy.searchsorted(sortindex1, sort_j, sorter=argsort1)
+    k = argsort1[k.clip(0, len(pos1)-1)]
+    k[sortindex1[k] != sort_j] = -1
 
-    # sorted indices of objects that have pairs on other ranks
-    # these objects are already "maybe" centrals
-    on_other_ranks = sortindex1[(wrong_rank>0)]
+    # find the centrals and satellites on this rank; objects with a
+    # higher priority partner on another rank might be either
+    status = numpy.empty(len(pos1) + 1, dtype='u1')
+    status[-1] = _MAYBE
+    _resolve_centrals(status, len(pos1), i, k)
 
-    # find the centrals and associated halo labels for each central
-    all_centrals, labels = _find_centrals(comm, possible_cens, on_other_ranks, centrals, maybes)
+    # the root resolves the remaining objects from all ranks
+    all_centrals = _find_centrals(comm, status[:-1], sortindex1, i, k, sort_j)
 
-    # reset the index and return
-    df.reset_index(inplace=True)
-
-    # add the halo labels for each pair in the dataframe
-    labels = pd.Series(labels, name='label_i', index=pd.Index(all_centrals, name='sort_i'))
-    df = df.join(labels, on='sort_i')
-    labels.name = 'label_j'; labels.index.name = 'sort_j'
-    df = df.join(labels, on='sort_j')
+    def label(sortindex):
+        # labels run over the centrals in descending order of priority
+        return len(all_centrals) - 1 - numpy.searchsorted(all_centrals, sortindex)
 
     # iniitalize the output arrays
     labels = numpy.zeros(len(pos1), dtype='i8') - 1 # indexed by i
     types = numpy.zeros(len(pos1), dtype='u4') # indexed by i
-    counts = numpy.zeros(len(pos2), dtype='i8') # indexed by j
 
     # assign labels of the centrals
-    cens = df.dropna(subset=['label_j']).drop_duplicates('i')
-    labels[cens['i'].values] = cens['label_i'].values
-
-    # objects on this rank that are satellites
-    # (no label for the 1st object in pair but a label for the 2nd object)
-    sats = (df['label_i'].isnull())&(~df['label_j'].isnull())
-    df = df[sats]
+    cens = _in_sorted(sortindex1, all_centrals)
+    labels[cens] = label(sortindex1[cens])
 
-    # find the corresponding central for each satellite
-    df = df.sort_values('sort_j', ascending=False)
-    df.set_index('sort_i', inplace=True)
-    sats_grouped = df.groupby('sort_i', sort=False, as_index=False)
-    centrals = sats_grouped.first() # these are the centrals for each satellite
+    # the satellites are paired with the central of highest priority,
+    # i.e. the last of the pairs of i with a central j
+    sats = _in_sorted(sort_j, all_centrals) & ~cens[i]
+    i = i[sats]; j = j[sats]; sort_j = sort_j[sats]
+    last = numpy.flatnonzero(numpy.append(i[1:] != i[:-1], True))[:len(i)]
+    i = i[last]; j = j[last]; sort_j = sort_j[last]
 
     # update the satellite info with its pair with the highest priority
-    cens_i = centrals['i'].values; cens_j = centrals['j'].values
-    counts += numpy.bincount(cens_j, minlength=len(pos2))
-    types[cens_i] = 1
-    labels[cens_i] = centrals['label_j'].values
+    counts = numpy.bincount(j, minlength=len(pos2)).astype('i8') # indexed by j
+    types[i] = 1
+    labels[i] = label(sort_j)
 
     # sum counts across ranks (take the sum of any repeated objects)
     counts = layout2.gather(counts, mode='sum')
@@ -395,36 +352,90 @@ def cgm(comm, data, domain, rperp, rpar, los, boxsize):
     out['cgm_type'] = layout1.gather(types, mode='any')
 
     # restore the original order
-    mpsort.sort(out, orderby='origind', comm=comm)
+    ParallelSort(out, orderby='origind', comm=comm)
 
     fields = ['cgm_type', 'cgm_haloid', 'num_cgm_sats']
     return out[fields]
 
 
-def _remove_objects_paired_with(df, bad_pairs):
-    """
-    Remove any objects that are paired with an object in ``bad_pairs``
+# the status of objects when finding centrals
+_UNKNOWN, _CENTRAL, _SATELLITE, _MAYBE = 0, 1, 2, 3
 
-    This is done in place
+class _PairBuffer(object):
+    """
+    The indices of pairs, appended to arrays that grow geometrically.
     """
-    assert df.index.name == 'sort_i'
+    def __init__(self, size=1024):
+        self.i = numpy.empty(size, dtype='intp')
+        self.j = numpy.empty(size, dtype='intp')
+        self.size = 0
+
+    def append(self, i, j):
+        """
+        Append the pairs ``(i, j)``.
+        """
+        n = self.size + len(i)
+        if n > len(self.i):
+            newsize = max(n, 2 * len(self.i))
+            self.i = numpy.resize(self.i, newsize)
+            self.j = numpy.resize(self.j, newsize)
+        self.i[self.size:n] = i
+        self.j[self.size:n] = j
+        self.size = n
+
+    def finalize(self):
+        """
+        Return the arrays of ``i`` and ``j`` indices.
+        """
+        return self.i[:self.size], self.j[:self.size]
 
-    df.reset_index(inplace=True)
-    df.set_index('sort_j', inplace=True)
 
-    # exception could be raised if no pairs need to be dropped
-    # so just reset index and return
-    try:
-        bad_pair_index = df.index.intersection(bad_pairs).unique()
-        to_drop = df.loc[bad_pair_index]['sort_i'].values
-        df.reset_index(inplace=True)
-        df.set_index('sort_i', inplace=True)
-        df.drop(to_drop,inplace=True)
-    except:
-        df.set_index('sort_i', inplace=True)
+def _resolve_centrals(status, N, i, k):
+    """
+    Find the centrals and satellites among ``N`` objects, given for each
+    object ``i`` the indices ``k`` of its partners of higher priority.
 
+    An object is a satellite if any of its partners is a central,
+    and a central if none of its partners is a central or might be one.
+    Objects with partners that might be centrals are marked as such.
+    This sets the first ``N`` values of ``status`` in place; the
+    values beyond ``N`` are fixed statuses that partners can refer to.
 
-def _find_centrals(comm, df, on_other_ranks, centrals, maybes):
+    Parameters
+    ----------
+    status : array_like
+        the status of the objects, followed by the fixed statuses
+    N : int
+        the number of objects
+    i : array_like
+        the index of the object for each pair, in ascending order
+    k : array_like
+        the index in ``status`` of the partner for each pair
+    """
+    # objects with no pairs are centrals
+    status[:N] = _CENTRAL
+    status[i] = _UNKNOWN
+
+    while len(i):
+        # each pass resolves at least the unknown object of highest
+        # priority, since all of its partners are resolved
+        starts = numpy.flatnonzero(numpy.append(True, i[1:] != i[:-1]))
+        partners = status[k]
+        any_central = numpy.logical_or.reduceat(partners == _CENTRAL, starts)
+        any_unknown = numpy.logical_or.reduceat(partners == _UNKNOWN, starts)
+        any_maybe = numpy.logical_or.reduceat(partners == _MAYBE, starts)
+
+        new = numpy.where(any_maybe, _MAYBE, _CENTRAL)
+        new[any_unknown] = _UNKNOWN
+        new[any_central] = _SATELLITE
+        status[i[starts]] = new
+
+        # only keep the pairs of objects still unknown
+        keep = status[i] == _UNKNOWN
+        i = i[keep]; k = k[keep]
+
+
+def _find_centrals(comm, status, sortindex, i, k, sort_j):
     """
     Find the sorted index values of all of the centrals
 
@@ -434,82 +445,63 @@ def _find_centrals(comm, df, on_other_ranks, centrals, maybes):
 
     Returns
     -------
-    all_centrals : list
-        the sorted index values of all centrals
-    labels : list
-        corresponding labels; ranging from ``0`` to ``len(all_centrals)``
+    all_centrals : array_like
+        the sorted index values of all centrals, in ascending order
     """
-    def find_local_centrals(grp):
-
-        cenid = grp.index.values[0]
-
-        # group number of the centrals that could host this object
-        maybe_grp_nums = grp['sort_j'].values
-
-        # this object is a satellite
-        if any(num in centrals for num in maybe_grp_nums):
-            return
-
-        # this object could be a satellite
-        if any(num in maybes for num in maybe_grp_nums):
-            maybes.add(cenid)
-            return
+    from nbodykit.utils import GatherArray
 
-        # if we get here, this object is definitely a central
-        centrals.add(cenid)
+    # the pairs of objects that might be centrals, with partners that are not satellites
+    maybe = status == _MAYBE
+    keep = maybe[i] & ((k < 0) | (status[k] != _SATELLITE))
+    sort_i = sortindex[i[keep]]
+    maybe_j = sort_j[keep]
 
-    # only need to examine objects that have all higher priority pairs
-    # on the same rank --> if they have pairs on other ranks, then they are already
-    # marked as "maybes" centrals
-    same_rank_df = df.drop(on_other_ranks, errors='ignore')
-
-    # group by centrals and find the local centrals
-    # these are objects with no higher priority pairs
-    cens_grouped = same_rank_df.groupby('sort_i', sort=False)
-    cens_grouped.apply(find_local_centrals)
-
-    # the pairs associated with objects that might be satellites
-    maybe_index = df.index.intersection(list(maybes)).unique()
-    maybe_cen_groups = df.loc[maybe_index]
-
-    # gather data on maybes
-    maybes_data = comm.gather(maybe_cen_groups)
-    all_centrals = numpy.concatenate(comm.allgather(list(centrals)), axis=0)
+    # gather the maybes, their pairs and all centrals
+    centrals = GatherArray(sortindex[status == _CENTRAL], comm, root=Ellipsis)
+    maybes = GatherArray(sortindex[maybe], comm, root=0)
+    sort_i = GatherArray(sort_i, comm, root=0)
+    maybe_j = GatherArray(maybe_j, comm, root=0)
 
     # root identifies the remaining centrals
     if comm.rank == 0:
 
-        # keep track of new centrals
-        new_centrals = set()
-        all_maybes = pd.concat(maybes_data)
-
-        # remove objects paired with a central
-        _remove_objects_paired_with(all_maybes, all_centrals)
+        # the maybes in ascending order, followed by a central
+        # and a satellite, for partners that are not maybes
+        maybes.sort()
+        centrals.sort()
+        N = len(maybes)
+        status = numpy.empty(N + 2, dtype='u1')
+        status[N], status[N+1] = _CENTRAL, _SATELLITE
 
-        # consider objects in sorted order
-        all_maybes.sort_index(ascending=False, inplace=True)
-
-        def finalize(grp):
-            grp_nums = grp['sort_j'].values
-            if not any(num in new_centrals for num in grp_nums):
-                new_centrals.add(grp.index.values[0])
+        # the index of the pairs in the maybes, and the statuses of the partners
+        ii = numpy.searchsorted(maybes, sort_i)
+        kk = numpy.searchsorted(maybes, maybe_j)
+        kk[~_in_sorted(maybe_j, maybes)] = N + 1
+        kk[_in_sorted(maybe_j, centrals)] = N
 
         # find out which of the maybes are actually centrals
-        maybes_grouped = all_maybes.groupby('sort_i', sort=False)
-        maybes_grouped.apply(finalize)
-
+        order = numpy.argsort(ii, kind='mergesort')
+        _resolve_centrals(status, N, ii[order], kk[order])
+        new_centrals = maybes[status[:N] == _CENTRAL]
     else:
-        new_centrals = None
+        new_centrals = numpy.zeros(0, dtype=sortindex.dtype)
 
     # get the list of all centrals on all ranks
-    new_centrals = comm.bcast(new_centrals)
-    all_centrals = numpy.append(all_centrals, list(new_centrals))
+    new_centrals = GatherArray(new_centrals, comm, root=Ellipsis)
+    all_centrals = numpy.concatenate([centrals, new_centrals])
+    all_centrals.sort()
 
-    # sort and create unique halo labels
-    all_centrals[::-1].sort()
-    labels = numpy.arange(0, len(all_centrals), dtype='i4')
+    return all_centrals
 
-    return all_centrals, labels
+def _in_sorted(values, sorted_values):
+    """
+    Whether each of ``values`` is in the array ``sorted_values``,
+    sorted in ascending order.
+    """
+    if not len(sorted_values):
+        return numpy.zeros(len(values), dtype='?')
+    ind = numpy.searchsorted(sorted_values, values).clip(0, len(sorted_values)-1)
+    return sorted_values[ind] == values
 
 def data_to_sort_key(data):
     """
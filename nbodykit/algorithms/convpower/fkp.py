@@ -24,53 +24,17 @@ def get_real_Ylm(l, m):
     Returns
     -------
     Ylm : callable
-        a function that takes 4 arguments: (xhat, yhat, zhat)
+        a function that takes 3 arguments: (xhat, yhat, zhat)
         unit-normalized Cartesian coordinates and returns the
-        specified Ylm
+        specified Ylm; the kernel is shared by all callers in
+        the process
 
     References
     ----------
     https://en.wikipedia.org/wiki/Spherical_harmonics#Real_form
     """
-    import sympy as sp
-
-    # make sure l,m are integers
-    l = int(l); m = int(m)
-
-    # the relevant cartesian and spherical symbols
-    x, y, z, r = sp.symbols('x y z r', real=True, positive=True)
-    xhat, yhat, zhat = sp.symbols('xhat yhat zhat', real=True, positive=True)
-    phi, theta = sp.symbols('phi theta')
-    defs = [(sp.sin(phi), y/sp.sqrt(x**2+y**2)),
-            (sp.cos(phi), x/sp.sqrt(x**2+y**2)),
-            (sp.cos(theta), z/sp.sqrt(x**2 + y**2+z**2))]
-
-    # the normalization factors
-    if m == 0:
-        amp = sp.sqrt((2*l+1) / (4*numpy.pi))
-    else:
-        amp = sp.sqrt(2*(2*l+1) / (4*numpy.pi) * sp.factorial(l-abs(m)) / sp.factorial(l+abs(m)))
-
-    # the cos(theta) dependence encoded by the associated Legendre poly
-    expr = (-1)**m * sp.assoc_legendre(l, abs(m), sp.cos(theta))
-
-    # the phi dependence
-    if m < 0:
-        expr *= sp.expand_trig(sp.sin(abs(m)*phi))
-    elif m > 0:
-        expr *= sp.expand_trig(sp.cos(m*phi))
-
-    # simplify
-    expr = sp.together(expr.subs(defs)).subs(x**2 + y**2 + z**2, r**2)
-    expr = amp * expr.expand().subs([(x/r, xhat), (y/r, yhat), (z/r, zhat)])
-    Ylm = sp.lambdify((xhat,yhat,zhat), expr, 'numexpr')
-
-    # attach some meta-data
-    Ylm.expr = expr
-    Ylm.l    = l
-    Ylm.m    = m
-
-    return Ylm
+    from nbodykit.ylm import get_real_Ylm as get_kernel
+    return get_kernel(l, m)
 
 class ConvolvedFFTPower(object):
     """
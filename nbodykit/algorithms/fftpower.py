@@ -1,10 +1,10 @@
 import os
 import numpy
 import logging
+from collections import OrderedDict
 
-from nbodykit import CurrentMPIComm
+from nbodykit import CurrentMPIComm, _global_options
 from nbodykit.binned_statistic import BinnedStatistic
-from nbodykit.meshtools import SlabIterator
 from nbodykit.base.catalog import CatalogSourceBase
 from nbodykit.base.mesh import MeshSource
 
@@ -567,14 +567,12 @@ def project_to_basis(y3d, edges, los=[0, 0, 1], poles=[]):
             the number of values averaged in each 1D bin
     """
     comm = y3d.pm.comm
-    x3d = y3d.x
     hermitian_symmetric = numpy.iscomplexobj(y3d)
 
     from scipy.special import legendre
 
     # setup the bin edges and number of bins
     xedges, muedges = edges
-    x2edges = xedges**2
     Nx = len(xedges) - 1
     Nmu = len(muedges) - 1
 
@@ -590,52 +588,37 @@ def project_to_basis(y3d, edges, los=[0, 0, 1], poles=[]):
     if any(ell < 0 for ell in _poles):
         raise ValueError("in `project_to_basis`, multipole numbers must be non-negative integers")
 
+    # the bin index, mu and Hermitian weights of the local modes are
+    # computed once and reused for later calls with the same binning
+    binning = _get_projection_binning(y3d, edges, los)
+
     # initialize the binning arrays
     musum = numpy.zeros((Nx+2, Nmu+2))
     xsum = numpy.zeros((Nx+2, Nmu+2))
     ysum = numpy.zeros((Nell, Nx+2, Nmu+2), dtype=y3d.dtype) # extra dimension for multipoles
     Nsum = numpy.zeros((Nx+2, Nmu+2), dtype='i8')
 
-    # if input array is Hermitian symmetric, only half of the last
-    # axis is stored in `y3d`
-    symmetry_axis = -1 if hermitian_symmetric else None
-
-    # iterate over y-z planes of the coordinate mesh
-    for slab in SlabIterator(x3d, axis=0, symmetry_axis=symmetry_axis):
-
-        # the square of coordinate mesh norm
-        # (either Fourier space k or configuraton space x)
-        xslab = slab.norm2()
-
-        # if empty, do nothing
-        if len(xslab.flat) == 0: continue
-
-        # get the bin indices for x on the slab
-        dig_x = numpy.digitize(xslab.flat, x2edges)
+    # the rows of the batched histogram: x, N, mu and then
+    # the real (and imaginary) part of each multipole
+    Nrow = 3 + Nell * (2 if numpy.iscomplexobj(ysum) else 1)
 
-        # make xslab just x
-        xslab **= 0.5
+    y = numpy.asarray(y3d).reshape(-1)
+    for sl in binning.chunks():
 
-        # get the bin indices for mu on the slab
-        mu = slab.mu(los) # defined with respect to specified LOS
-        dig_mu = numpy.digitize(abs(mu).flat, muedges)
+        index = binning.index[sl]
+        mu = binning.mu[sl]
+        w = binning.weights(sl)
 
-        # make the multi-index
-        multi_index = numpy.ravel_multi_index([dig_x, dig_mu], (Nx+2,Nmu+2))
+        rows = numpy.empty((Nrow, len(index)))
+        rows[0] = binning.x[sl] * w
+        rows[1] = w
+        rows[2] = abs(mu) * w
 
-        # sum up x in each bin (accounting for negative freqs)
-        xslab[:] *= slab.hermitian_weights
-        xsum.flat += numpy.bincount(multi_index, weights=xslab.flat, minlength=xsum.size)
-
-        # count number of modes in each bin (accounting for negative freqs)
-        Nslab = numpy.ones_like(xslab) * slab.hermitian_weights
-        Nsum.flat += numpy.bincount(multi_index, weights=Nslab.flat, minlength=Nsum.size)
-
-        # compute multipoles by weighting by Legendre(ell, mu)
+        irow = 3
         for iell, ell in enumerate(_poles):
 
             # weight the input 3D array by the appropriate Legendre polynomial
-            weighted_y3d = legpoly[iell](mu) * y3d[slab.index]
+            weighted_y3d = legpoly[iell](mu) * y[sl]
 
             # add conjugate for this kx, ky, kz, corresponding to
             # the (-kx, -ky, -kz) --> need to make mu negative for conjugate
@@ -646,23 +629,37 @@ def project_to_basis(y3d, edges, los=[0, 0, 1], poles=[]):
             # weighted_y3d[:, nonsingular] += (-1)**ell * weighted_y3d[:, nonsingular].conj()
             # but numerically more accurate.
             if hermitian_symmetric:
+                nonsingular = binning.nonsingular[sl]
 
                 if ell % 2: # odd, real part cancels
-                    weighted_y3d.real[slab.nonsingular] = 0.
-                    weighted_y3d.imag[slab.nonsingular] *= 2.
+                    weighted_y3d.real[nonsingular] = 0.
+                    weighted_y3d.imag[nonsingular] *= 2.
                 else:  # even, imag part cancels
-                    weighted_y3d.real[slab.nonsingular] *= 2.
-                    weighted_y3d.imag[slab.nonsingular] = 0.
+                    weighted_y3d.real[nonsingular] *= 2.
+                    weighted_y3d.imag[nonsingular] = 0.
 
             # sum up the weighted y in each bin
             weighted_y3d *= (2.*ell + 1.)
-            ysum[iell,...].real.flat += numpy.bincount(multi_index, weights=weighted_y3d.real.flat, minlength=Nsum.size)
+            rows[irow] = weighted_y3d.real
+            irow += 1
             if numpy.iscomplexobj(ysum):
-                ysum[iell,...].imag.flat += numpy.bincount(multi_index, weights=weighted_y3d.imag.flat, minlength=Nsum.size)
+                rows[irow] = weighted_y3d.imag
+                irow += 1
+
+        # one weighted histogram for all of the rows
+        hist = _bincount_rows(index, rows, Nsum.size)
 
-        # sum up the absolute mag of mu in each bin (accounting for negative freqs)
-        mu[:] *= slab.hermitian_weights
-        musum.flat += numpy.bincount(multi_index, weights=abs(mu).flat, minlength=musum.size)
+        xsum.flat += hist[0]
+        Nsum.flat += numpy.int64(numpy.rint(hist[1]))
+        musum.flat += hist[2]
+
+        irow = 3
+        for iell in range(Nell):
+            ysum[iell,...].real.flat += hist[irow]
+            irow += 1
+            if numpy.iscomplexobj(ysum):
+                ysum[iell,...].imag.flat += hist[irow]
+                irow += 1
 
     # sum binning arrays across all ranks
     xsum  = comm.allreduce(xsum)
@@ -699,6 +696,142 @@ def project_to_basis(y3d, edges, los=[0, 0, 1], poles=[]):
     pole_result = (xmean_1d, poles, N_1d) if do_poles else None
     return result, pole_result
 
+class _ProjectionBinning(object):
+    """
+    The bin index, `x`, `mu` and Hermitian symmetry flag of each local
+    mode of a mesh, for a given set of (`x`, `mu`) edges and line-of-sight.
+
+    These depend only on the mesh and the binning, thus they are computed
+    once per rank and reused by :func:`project_to_basis`.
+
+    Parameters
+    ----------
+    x3d : list of arrays
+        the coordinate arrays of the mesh, with shapes that broadcast
+        to the local shape of the mesh
+    edges : list of arrays, (2,)
+        the edges of the `x` bins and `mu` bins
+    los : array_like
+        the line-of-sight direction that `mu` is defined with respect to
+    hermitian_symmetric : bool
+        whether the last axis of the mesh has been compressed due to
+        Hermitian symmetry
+    chunksize : int, optional
+        the number of modes to histogram at the same time
+    """
+    def __init__(self, x3d, edges, los, hermitian_symmetric, chunksize=1024*1024):
+
+        xedges, muedges = edges
+        Nx = len(xedges) - 1
+        Nmu = len(muedges) - 1
+
+        shape = numpy.broadcast(*x3d).shape
+        self.size = int(numpy.prod(shape))
+        self.chunksize = chunksize
+
+        # the square of coordinate mesh norm
+        # (either Fourier space k or configuraton space x)
+        x2 = numpy.broadcast_to(sum(xi**2 for xi in x3d), shape).reshape(-1)
+        dig_x = numpy.digitize(x2, xedges**2)
+
+        # defined with respect to specified LOS
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            mu = sum(xi * los[i] for i, xi in enumerate(x3d)) / sum(xi**2 for xi in x3d)**0.5
+        self.mu = numpy.broadcast_to(mu, shape).reshape(-1).copy()
+        dig_mu = numpy.digitize(abs(self.mu), muedges)
+
+        # the multi-index of the 2D bins
+        self.index = numpy.ravel_multi_index([dig_x, dig_mu], (Nx+2, Nmu+2))
+        self.x = x2 ** 0.5
+
+        # the positive frequencies along the symmetry axis are double-counted
+        if hermitian_symmetric:
+            self.nonsingular = numpy.broadcast_to(x3d[-1] > 0., shape).reshape(-1).copy()
+        else:
+            self.nonsingular = None
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes held by the binning.
+        """
+        nbytes = self.index.nbytes + self.mu.nbytes + self.x.nbytes
+        if self.nonsingular is not None:
+            nbytes += self.nonsingular.nbytes
+        return nbytes
+
+    def chunks(self):
+        """
+        Iterate over slices of the local modes, each with at most
+        :attr:`chunksize` modes.
+        """
+        for i in range(0, self.size, self.chunksize):
+            yield slice(i, i + self.chunksize)
+
+    def weights(self, sl):
+        """
+        The Hermitian weights of the modes in the slice ``sl``; 2 for the
+        nonsingular modes of a Hermitian-symmetric mesh, 1 otherwise.
+        """
+        if self.nonsingular is None:
+            return numpy.ones(len(self.index[sl]))
+        return 1. + self.nonsingular[sl]
+
+# the most recently used binnings, keyed by the local mesh geometry and the binning;
+# the total size is bounded by the ``binning_cache_size`` option
+_projection_binning_cache = OrderedDict()
+
+def _get_projection_binning(y3d, edges, los):
+    """
+    Return the :class:`_ProjectionBinning` of the field ``y3d``, reusing
+    a cached binning with the same mesh, edges and line-of-sight.
+
+    The coordinates of the local modes only depend on the type of
+    the field, ``Nmesh``, ``BoxSize`` and the local slab of the mesh,
+    so fields painted by different meshes of the same geometry share
+    the binning.
+
+    The binnings are kept up to a total of ``binning_cache_size`` bytes;
+    see :class:`~nbodykit.set_options`.
+    """
+    from nbodykit.utils import parse_bytes
+
+    hermitian_symmetric = numpy.iscomplexobj(y3d)
+    key = (type(y3d).__name__,
+           tuple(numpy.asarray(y3d.Nmesh).tolist()),
+           tuple(numpy.asarray(y3d.BoxSize, dtype='f8').tolist()),
+           tuple(numpy.asarray(y3d.start).tolist()),
+           tuple(y3d.shape),
+           tuple(numpy.asarray(edges[0], dtype='f8').tolist()),
+           tuple(numpy.asarray(edges[1], dtype='f8').tolist()),
+           tuple(numpy.asarray(los, dtype='f8').tolist()))
+
+    try:
+        binning = _projection_binning_cache.pop(key)
+    except KeyError:
+        binning = _ProjectionBinning(y3d.x, edges, los, hermitian_symmetric)
+
+    # most recently used is the last; evict the least recently used
+    _projection_binning_cache[key] = binning
+    available = parse_bytes(_global_options['binning_cache_size'])
+    while sum(b.nbytes for b in _projection_binning_cache.values()) > available:
+        _projection_binning_cache.popitem(last=False)
+
+    return binning
+
+def _bincount_rows(index, rows, minlength):
+    """
+    Weighted histogram of several rows of weights sharing the same
+    bin index, computed with a single call to :func:`numpy.bincount`.
+
+    Returns an array of shape ``(len(rows), minlength)``.
+    """
+    Nrow = len(rows)
+    offset = numpy.arange(Nrow, dtype='intp')[:, None] * minlength
+    index = (index[None, :] + offset).reshape(-1)
+    hist = numpy.bincount(index, weights=rows.reshape(-1), minlength=Nrow * minlength)
+    return hist.reshape(Nrow, minlength)
+
 def _cast_source(source, BoxSize, Nmesh):
     """
     Cast an object to a MeshSource. BoxSize and Nmesh is used
@@ -133,10 +133,19 @@ class FFTRecon(MeshSource):
 
     def run(self):
 
-        s_d, s_r = self._compute_s()
-        return self._helper_paint(s_d, s_r)
-
-    def work_with(self, cat, s):
+        s = self._compute_s()
+        return self._helper_paint(s)
+
+    def work_with(self, cat, s, factor=1.0, name=None):
+        """
+        Paint the catalog ``cat``, shifted by the displacement ``s``
+        times ``factor``, or unshifted if ``s`` is None.
+
+        The displacement of each chunk of objects is read out from
+        the three components of ``s``, such that the displacements of
+        the whole catalog are never held in memory. If ``name`` is
+        given, the rms of the displacements is logged under it.
+        """
         pm = self.pm
         delta = pm.create(mode='real', value=0)
 
@@ -148,17 +157,30 @@ class FFTRecon(MeshSource):
 
         chunksize = _global_options['paint_chunk_size']
 
+        s2 = numpy.zeros(3)
         for i in range(0, Nlocalmax, chunksize):
             sl = slice(i, i + chunksize)
 
+            dpos = (cat[self.position].astype('f4')[sl]).compute()
+
             if s is not None:
-                dpos = (cat[self.position].astype('f4')[sl] - s[sl]).compute()
-            else:
-                dpos = (cat[self.position].astype('f4')[sl]).compute()
+                # read out the displacement and shift
+                layout = self.pm.decompose(dpos)
+                si = numpy.zeros_like(dpos, dtype='f4')
+                for d in range(3):
+                    s[d].readout(dpos, layout=layout, out=si[..., d])
+                s2 += (si ** 2).sum(axis=0)
+
+                dpos -= si * factor
 
             layout = self.pm.decompose(dpos)
             self.pm.paint(dpos, layout=layout, out=delta, hold=True)
 
+        if s is not None and name is not None:
+            s_std = (self.comm.allreduce(s2) / cat.csize) ** 0.5
+            if self.comm.rank == 0:
+                self.logger.info("Solved displacements of %s, std(s) = %s" % (name, str(s_std)))
+
         delta[...] /= nbar
 
         return delta
@@ -169,18 +191,27 @@ class FFTRecon(MeshSource):
             self.logger.info("painted %s, mean=%g" % (name, cmean))
 
 
-    def _helper_paint(self, s_d, s_r):
+    def _helper_paint(self, s):
         """ Convert the displacements of data and random to a single reconstruction mesh object. """
 
+        # convention 1: shifting data only
+        f_d = 1 + self.attrs['los'] * self.attrs['f']
+        f_r = 1.0
+
+        # convention 2: shifting data and randoms
+        if self.attrs['revert_rsd_random']:
+            f_r = f_d
+
         def LGS(delta_s_r):
-            delta_s_d = self.work_with(self.data, s_d)
+            delta_s_d = self.work_with(self.data, s, f_d, name='data')
             self._summary_field(delta_s_d, "delta_s_d (shifted)")
 
             delta_s_d[...] -= delta_s_r
             return delta_s_d
 
         def LRR(delta_s_r):
-            delta_s_nr = self.work_with(self.ran, -s_r)
+            # same readout as delta_s_r, whose displacements are already logged
+            delta_s_nr = self.work_with(self.ran, s, -f_r)
             self._summary_field(delta_s_nr, "delta_s_nr (reverse shifted)")
 
             delta_d = self.work_with(self.data, None)
@@ -199,7 +230,7 @@ class FFTRecon(MeshSource):
             lgs[...] += lrr
             return lgs
 
-        delta_s_r = self.work_with(self.ran, s_r)
+        delta_s_r = self.work_with(self.ran, s, f_r, name='randoms')
         self._summary_field(delta_s_r, "delta_s_r (shifted)")
 
         if self.attrs['scheme'] == 'LGS':
@@ -215,7 +246,7 @@ class FFTRecon(MeshSource):
         return delta_recon
 
     def _compute_s(self):
-        """ Computing the reconstruction displacement of data and random """
+        """ Computing the reconstruction displacement field, as three RealFields """
 
         def kernel(d):
             def kernel(k, v):
@@ -238,32 +269,7 @@ class FFTRecon(MeshSource):
         self._summary_field(delta_d, "delta_d (unshifted)")
         delta_d = delta_d.r2c(out=Ellipsis)
 
-        def solve_displacement(cat, delta_d):
-            dpos = cat[self.position].astype('f4').compute()
-            layout = self.pm.decompose(dpos)
-            s_d = numpy.zeros_like(dpos, dtype='f4')
-
-            for d in range(3):
-                delta_d.apply(kernel(d)).c2r(out=Ellipsis) \
-                       .readout(dpos, layout=layout, out=s_d[..., d])
-            return s_d
-
-        s_d = solve_displacement(self.data, delta_d)
-        s_d_std = (self.comm.allreduce((s_d ** 2).sum(axis=0)) / self.data.csize) ** 0.5
-        if self.comm.rank == 0:
-            self.logger.info("Solved displacements of data, std(s_d) = %s" % str(s_d_std))
-
-        s_r = solve_displacement(self.ran, delta_d)
-        s_r_std = (self.comm.allreduce((s_r ** 2).sum(axis=0)) / self.ran.csize) ** 0.5
-        if self.comm.rank == 0:
-            self.logger.info("Solved displacements of randoms, std(s_r) = %s" % str(s_r_std))
-
-        # convention 1: shifting data only
-        s_d[...] *= (1 + self.attrs['los'] * self.attrs['f'])
-
-        # convention 2: shifting data only
-        if self.attrs['revert_rsd_random']:
-            s_r[...] *= (1 + self.attrs['los'] * self.attrs['f'])
-        
-        return s_d, s_r
-
+        # the three components of the displacement, read out as the
+        # catalogs are painted
+        s = [delta_d.apply(kernel(d)).c2r(out=Ellipsis) for d in range(3)]
+        return s
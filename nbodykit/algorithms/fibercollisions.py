@@ -147,7 +147,7 @@ class FiberCollisions(object):
         across ranks and assign fibers, such that the minimum
         number of objects are collided out of the survey
         """
-        import mpsort
+        from nbodykit.utils import ParallelSort
         from mpi4py import MPI
 
         mask = Label != 0
@@ -182,7 +182,7 @@ class FiberCollisions(object):
 
         # sort by rank and then label
         PIG2 = numpy.empty(Nlocal, PIG.dtype)
-        mpsort.sort(PIG, orderby='Rank', out=PIG2, comm=self.comm)
+        ParallelSort(PIG, orderby='Rank', out=PIG2, comm=self.comm)
         assert (PIG2['Rank'] == self.comm.rank).all()
         PIG2.sort(order=['Label'])
 
@@ -190,35 +190,32 @@ class FiberCollisions(object):
             self.logger.info('total number of collision groups = %d', Nhalo-1)
             self.logger.info("Started fiber assignment")
 
-        # loop over unique group ids
-        for group_id in numpy.unique(PIG2['Label']):
-            start = PIG2['Label'].searchsorted(group_id, side='left')
-            end = PIG2['Label'].searchsorted(group_id, side='right')
-            N = end-start
-            assert(PIG2['Label'][start:end] == group_id).all()
+        # objects are not collided, and have no neighbor, unless assigned below
+        PIG2['Collided'] = 0
+        PIG2['NeighborID'] = -1
 
-            # pairs (random selection)
-            if N == 2:
+        # the start and size of each group
+        Label = PIG2['Label']
+        start = numpy.flatnonzero(numpy.append(True, Label[1:] != Label[:-1]))[:len(Label)]
+        N = numpy.diff(numpy.append(start, len(Label)))
 
-                # randomly choose, with fixed local seed
-                which = numpy.random.choice([0,1])
+        # pairs (random selection, with fixed local seed)
+        pairs = start[N == 2]
+        which = numpy.random.randint(2, size=len(pairs))
+        collided = pairs + which
+        PIG2['Collided'][collided] = 1
+        PIG2['NeighborID'][collided] = PIG2['Index'][pairs + (which^1)]
 
-                indices = [start+which, start+(which^1)]
-                PIG2['Collided'][indices] = [1, 0]
-                PIG2['NeighborID'][indices] = [PIG2['Index'][start+(which^1)], -1]
-            # multiplets (minimize collidedness)
-            elif N > 2:
-
-                collided, nearest = self._assign_multiplets(PIG2['Position'][start:end])
-                PIG2['Collided'][start:end] = collided[:]
-                PIG2['NeighborID'][start:end] = -1
-                if len(nearest):
-                    PIG2['NeighborID'][start:end][collided] = PIG2['Index'][start+nearest][:]
+        # multiplets (minimize collidedness)
+        members = numpy.flatnonzero(numpy.repeat(N > 2, N))
+        collided, nearest = self._assign_multiplets(PIG2['Position'][members], Label[members])
+        PIG2['Collided'][members[collided]] = 1
+        PIG2['NeighborID'][members[collided]] = PIG2['Index'][members[nearest]]
 
         if self.comm.rank == 0: self.logger.info("Finished fiber assignment")
 
         # return to the order specified by the global unique index
-        mpsort.sort(PIG2, orderby='Index', out=PIG, comm=self.comm)
+        ParallelSort(PIG2, orderby='Index', out=PIG, comm=self.comm)
 
         # return arrays including the objects not in any groups
         collided = numpy.zeros(size[self.comm.rank], dtype='i4')
@@ -229,60 +226,80 @@ class FiberCollisions(object):
         del PIG
         return collided, neighbors
 
-    def _assign_multiplets(self, Position):
+    def _assign_multiplets(self, Position, Label):
         """
         Internal function to assign the maximal amount of fibers
         in collision groups of size N > 2
-        """
-        from scipy.spatial.distance import pdist, squareform
 
-        def count(slice, n):
-            return n[numpy.nonzero(slice)[0]].sum()
+        All groups are handled at once, from the sparse graph of the
+        collisions between their members. The objects must be sorted
+        by ``Label``.
+
+        Returns
+        -------
+        collided : array_like
+            whether each object is collided
+        nearest : array_like
+            for each collided object, the index of the nearest
+            uncollided object in the same group
+        """
+        from scipy.spatial import cKDTree
+        from scipy.sparse import coo_matrix
 
-        # first shuffle the member ids, so we select random element when tied
         N = len(Position)
-        group_ids = list(range(N))
-
-        collided_ids = []
-        while len(group_ids) > 1:
-
-            # compute dists and find where dists < collision radius
-            dists = squareform(pdist(Position[group_ids], metric='euclidean'))
-            numpy.fill_diagonal(dists, numpy.inf) # ignore self-pairs
-            collisions = dists <= self._collision_radius_rad
+        if not N:
+            return numpy.zeros(0, dtype=bool), numpy.zeros(0, dtype='intp')
+        Position = Position.astype('f8')
+
+        # the group number of each object
+        group = numpy.cumsum(numpy.append(0, Label[1:] != Label[:-1]))[:N]
+        start = numpy.flatnonzero(numpy.append(True, Label[1:] != Label[:-1]))[:N]
+
+        # the graph of collisions between members of the same group
+        pairs = cKDTree(Position).query_pairs(self._collision_radius_rad, output_type='ndarray')
+        pairs = pairs[group[pairs[:,0]] == group[pairs[:,1]]]
+        i = numpy.concatenate([pairs[:,0], pairs[:,1]])
+        j = numpy.concatenate([pairs[:,1], pairs[:,0]])
+        collisions = coo_matrix((numpy.ones(len(i), dtype='i8'), (i, j)), shape=(N, N)).tocsr()
+
+        # remove the objects with the most collisions from each group, one at
+        # a time, until the remaining objects do not collide
+        remaining = numpy.ones(N, dtype='i8')
+        collided = numpy.zeros(N, dtype=bool)
+        while True:
 
-            # total # of collisions for each group member
-            n_collisions = numpy.sum(collisions, axis=0)
+            # total # of collisions for each remaining group member
+            n_collisions = collisions.dot(remaining) * remaining
+            n_max = numpy.maximum.reduceat(n_collisions, start)
+            if not n_max.any(): break
 
             # total # of collisions for those objects that collide with each group member
-            n_other = numpy.apply_along_axis(count, 0, collisions, n_collisions)
+            n_other = collisions.dot(n_collisions)
 
             # remove object that has most # of collisions
             # and those colliding objects have least # of collisions
-            idx = numpy.where(n_collisions == n_collisions.max())[0]
-
-            # choose randomly, with a fixed local seed
-            ii = numpy.random.choice(numpy.where(n_other[idx] == n_other[idx].min())[0])
-            collided_index = idx[ii]
-
-            # make the collided galaxy and remove from group
-            collided_id = group_ids.pop(collided_index)
-
-            # only make this a collided object if its n_collisions > 0
-            # if n_collisions = 0, then the object can get a fiber for free
-            if n_collisions[collided_index] > 0:
-                collided_ids.append(collided_id)
-
-        # compute the nearest neighbors
-        neighbor_ids = []
-        group_indices = list(range(N))
-        dists = squareform(pdist(Position, metric='euclidean'))
-        uncollided = [i for i in group_indices if i not in collided_ids]
-
-        for i in sorted(collided_ids):
-            neighbor = uncollided[dists[i][uncollided].argmin()]
-            neighbor_ids.append(neighbor)
-
-        collided = numpy.zeros(N, dtype=bool)
-        collided[collided_ids] = True
-        return collided, neighbor_ids
+            # choose randomly when tied, with a fixed local seed
+            idx = numpy.flatnonzero((n_collisions == n_max[group]) & (n_max[group] > 0))
+            tiebreak = numpy.random.random(size=len(idx))
+            idx = idx[numpy.lexsort((tiebreak, n_other[idx], group[idx]))]
+            idx = idx[numpy.append(True, group[idx][1:] != group[idx][:-1])]
+
+            collided[idx] = True
+            remaining[idx] = 0
+
+        # compute the nearest neighbors, among the uncollided
+        # objects of the same group
+        cids = numpy.flatnonzero(collided)
+        uids = numpy.flatnonzero(~collided)
+        ustart = numpy.searchsorted(group[uids], group[cids], side='left')
+        nu = numpy.searchsorted(group[uids], group[cids], side='right') - ustart
+
+        offset = numpy.cumsum(nu) - nu
+        ci = numpy.repeat(cids, nu)
+        ui = uids[numpy.repeat(ustart - offset, nu) + numpy.arange(nu.sum())]
+        dist2 = ((Position[ci] - Position[ui])**2).sum(axis=-1)
+
+        order = numpy.lexsort((ui, dist2, ci))
+        nearest = ui[order][offset]
+
+        return collided, nearest
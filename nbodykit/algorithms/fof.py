@@ -5,7 +5,7 @@ import logging
 from mpi4py import MPI
 from nbodykit.source.catalog import ArrayCatalog
 from nbodykit.utils import split_size_3d
-from nbodykit.utils import DistributedArray
+from nbodykit.utils import ExchangeArrays, AlltoallvArray
 
 class FOF(object):
     """
@@ -40,10 +40,17 @@ class FOF(object):
     absolute : bool, optional
         If `True`, the linking length is in absolute units, otherwise it is
         relative to the mean particle separation; default is `False`
+    keep_decomposition : bool, optional
+        If `True`, keep the particles on the domain of each rank, including
+        the ghosts, and their KD-tree after the run, for
+        :func:`spherical_overdensity` and :func:`find_subhalos`. This holds
+        several times the memory of the positions of the source until
+        :func:`release_decomposition` is called; default is `False`
     """
     logger = logging.getLogger('FOF')
 
-    def __init__(self, source, linking_length, nmin, absolute=False, periodic=True, domain_factor=1):
+    def __init__(self, source, linking_length, nmin, absolute=False, periodic=True, domain_factor=1,
+                 keep_decomposition=False):
 
         self.comm = source.comm
         self._source = source
@@ -57,6 +64,7 @@ class FOF(object):
         self.attrs['absolute'] = absolute
         self.attrs['periodic'] = periodic
         self.attrs['domain_factor'] = domain_factor
+        self.keep_decomposition = keep_decomposition
 
         if periodic and 'BoxSize' not in source.attrs:
             raise ValueError("Periodic FOF requires BoxSize in .attrs['BoxSize']")
@@ -81,6 +89,10 @@ class FOF(object):
         .. note::
             The :attr:`labels` array is scattered evenly across all ranks.
 
+        With ``keep_decomposition=True``, the particles on the domain of
+        each rank, and their KD-tree, are kept for
+        :func:`spherical_overdensity` and :func:`find_subhalos`.
+
         Attributes
         ----------
         labels : array_like, length: :attr:`size`
@@ -91,7 +103,8 @@ class FOF(object):
             number of FOF halos found
         """
         # run the FOF
-        minid = fof(self._source, self._linking_length, self.comm, self.attrs['periodic'], self.attrs['domain_factor'], self.logger)
+        minid, local = _fof(self._source, self._linking_length, self.comm, self.attrs['periodic'], self.attrs['domain_factor'], self.logger)
+        self._local = local if self.keep_decomposition else None
 
         # the sorted labels
         self.labels = _assign_labels(minid, comm=self.comm, thresh=self.attrs['nmin'])
@@ -121,6 +134,228 @@ class FOF(object):
         attrs.update(self.attrs)
         return ArrayCatalog(halos, comm=self.comm, **attrs)
 
+    def release_decomposition(self):
+        """
+        Release the particles on the domain of each rank, kept with
+        ``keep_decomposition=True``.
+        """
+        self._local = None
+
+    def _local_labels(self):
+        """
+        The labels of the particles on the domain of this rank, and
+        whether the particles are in the primary region of the domain.
+        """
+        local = self._local
+        if local is None:
+            raise ValueError("the domain decomposition is not kept; "
+                             "run FOF with keep_decomposition=True")
+        if 'labels' not in local:
+            local['labels'] = local['layout'].exchange(self.labels)
+            local['primary'] = _primary_copies(local['layout'], local['domain'],
+                                               local['Position'], self.comm)
+        return local['labels'], local['primary']
+
+    def spherical_overdensity(self, halos, particle_mass, cosmo, redshift,
+                                mdef='200c', position='CMPosition', nbins=128):
+        """
+        Compute the spherical overdensity (SO) mass and radius of each
+        halo from its particles, e.g., M200c or Mvir.
+
+        This reuses the particles on the domains of the FOF run, without
+        a new domain decomposition; the FOF must be run with
+        ``keep_decomposition=True``. Each rank bins the distances of its
+        particles to the center of their halo, in units of the radius
+        enclosing the halo mass at the density threshold. The bins are summed
+        on the rank holding the halo, which finds the outermost radius where
+        the mean enclosed density is above the threshold.
+
+        Parameters
+        ----------
+        halos : CatalogSource
+            the halos returned by :func:`find_features`
+        particle_mass : float
+            the particle mass, which is used to convert the number of
+            particles in each halo to a mass
+        cosmo : :class:`nbodykit.cosmology.core.Cosmology`
+            the cosmology of the catalog
+        redshift : float
+            the redshift of the catalog
+        mdef : str, optional
+            string specifying the mass definition; should be 'vir' or
+            'XXXc' or 'XXXm' where 'XXX' is an int specifying the overdensity
+        position : str, optional
+            the column of ``halos`` giving the center of the halos
+        nbins : int, optional
+            the number of radial bins for each halo
+
+        Returns
+        -------
+        :class:`~nbodykit.source.catalog.array.ArrayCatalog` :
+            a source holding the SO mass ``'M' + mdef`` and the comoving
+            SO radius ``'R' + mdef`` (in the units of ``Position``) of each
+            halo, distributed as ``halos``
+        """
+        from halotools.empirical_models import density_threshold
+
+        comm = self.comm
+        label, primary = self._local_labels()
+        boxsize = self._local['BoxSize']
+
+        offsets = _halo_offsets(halos.csize, comm)
+        start = offsets[comm.rank]
+        if halos.size != offsets[comm.rank + 1] - start:
+            raise ValueError("``halos`` should be the catalog returned by find_features")
+
+        # the comoving density threshold
+        rho = density_threshold(cosmology=cosmo.to_astropy(), redshift=redshift, mdef=mdef)
+        rho /= (1. + redshift) ** 3
+
+        center, length = halos.compute(halos[position], halos['Length'])
+        length = numpy.asarray(length, dtype='f8')
+        rmax = (3 * particle_mass * length / (4 * numpy.pi * rho)) ** (1. / 3)
+
+        # the particles in halos on the primary region of this rank
+        sel = primary & (label > 0)
+        pos = self._local['Position'][sel]
+        hlabel, inverse = numpy.unique(label[sel], return_inverse=True)
+        inverse = inverse.reshape(-1)
+        hcenter, hrmax = _halo_lookup(hlabel, offsets, comm, center, rmax)
+
+        dpos = pos - hcenter[inverse]
+        if boxsize is not None:
+            for i in range(dpos.shape[-1]):
+                bhalf = boxsize[i] * 0.5
+                dpos[..., i][dpos[..., i] < -bhalf] += boxsize[i]
+                dpos[..., i][dpos[..., i] >= bhalf] -= boxsize[i]
+
+        # the partial radial histograms of the halos
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            x = numpy.einsum('ij,ij->i', dpos, dpos) ** 0.5 / hrmax[inverse]
+        inside = x < 1
+        key = inverse[inside] * nbins + (x[inside] * nbins).astype('i8')
+        key, N = numpy.unique(key, return_counts=True)
+
+        partial = numpy.empty(len(key), dtype=[('Label', 'i8'), ('bin', 'i8'), ('N', 'i8')])
+        partial['Label'] = hlabel[key // nbins]
+        partial['bin'] = key % nbins
+        partial['N'] = N
+        partial = AlltoallvArray(partial, offsets.searchsorted(partial['Label'], side='right') - 1, comm)
+
+        hist = numpy.zeros((halos.size, nbins), dtype='i8')
+        numpy.add.at(hist, (partial['Label'] - start, partial['bin']), partial['N'])
+        cumcount = hist.cumsum(axis=1)
+
+        # the ratio of the mean enclosed density to the threshold at the bin edges
+        xedges = numpy.arange(1, nbins + 1) / float(nbins)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            ratio = cumcount / (length[:, None] * xedges ** 3)
+        above = ratio >= 1
+        found = above.any(axis=1)
+
+        # interpolate between the outermost edge above and the next edge
+        i = numpy.arange(halos.size)
+        k = nbins - 1 - above[:, ::-1].argmax(axis=1)
+        k1 = numpy.minimum(k + 1, nbins - 1)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            t = numpy.log(ratio[i, k]) / numpy.log(ratio[i, k] / ratio[i, k1])
+        t[k1 == k] = 0
+        x = xedges[k] * (xedges[k1] / xedges[k]) ** t
+        x[~found] = 0
+
+        attrs = self._source.attrs.copy()
+        attrs.update(self.attrs)
+        attrs['particle_mass'] = particle_mass
+        attrs['mdef'] = mdef
+
+        data = numpy.empty(halos.size, dtype=[('M' + mdef, 'f8'), ('R' + mdef, 'f8')])
+        data['M' + mdef] = particle_mass * length * x ** 3
+        data['R' + mdef] = rmax * x
+        return ArrayCatalog(data, comm=comm, **attrs)
+
+    def find_subhalos(self, peakcolumn=None, nmin=None):
+        """
+        Find the subhalos of the FOF halos, from the density sorted
+        particles of each halo.
+
+        Each particle points to the densest of its friends, the particles
+        of its halo within the linking length; following the pointers leads
+        to a density peak, which identifies the subhalo of the particle.
+
+        This reuses the particles on the domains of the FOF run and their
+        KD-tree, without a new domain decomposition; the FOF must be run
+        with ``keep_decomposition=True``.
+
+        Parameters
+        ----------
+        peakcolumn : str, optional
+            the column of the source giving the density of the particles;
+            by default, the number of particles within the linking length
+        nmin : int, optional
+            subhalos with fewer particles are ignored; by default, the
+            ``nmin`` of the halos
+
+        Returns
+        -------
+        labels : array_like, length: :attr:`size`
+            the label of the subhalo of each particle, ordered by the size
+            of the subhalos; 0 for the particles that are in no subhalo
+        """
+        comm = self.comm
+        label, primary = self._local_labels()
+        local = self._local
+        layout = local['layout']
+        tree = local['dataset'].tree.root
+        PID = local['PID']
+        ll = self._linking_length
+
+        if nmin is None:
+            nmin = self.attrs['nmin']
+
+        if peakcolumn is None:
+            # the neighbours of the primary particles are all on this rank
+            density = numpy.zeros(len(PID), dtype='i8')
+            def callback(r, i, j):
+                numpy.add.at(density, i, 1)
+                numpy.add.at(density, j, 1)
+            tree.enum(tree, ll, process=callback)
+            density[~primary] = 0
+            density = layout.exchange(layout.gather(density, mode='sum'))
+        else:
+            density = layout.exchange(self._source.compute(self._source[peakcolumn]))
+
+        # the order of the particles by density, the same for all copies
+        order = numpy.lexsort((PID, density))
+        rank = numpy.empty(len(order), dtype='intp')
+        rank[order] = numpy.arange(len(order))
+
+        # the densest friend of the primary particles
+        best = rank.copy()
+        def callback(r, i, j):
+            friends = (label[i] == label[j]) & (label[i] > 0)
+            i, j = i[friends], j[friends]
+            numpy.maximum.at(best, i[primary[i]], rank[j[primary[i]]])
+            numpy.maximum.at(best, j[primary[j]], rank[i[primary[j]]])
+        tree.enum(tree, ll, process=callback)
+        parent = PID[order[best]]
+
+        # follow the pointers to the peaks across all ranks
+        root = _pointer_jump(PID[primary], parent[primary], comm)
+
+        # send the peaks to the original particles
+        N = len(self.labels)
+        offsets = numpy.zeros(comm.size + 1, dtype='i8')
+        offsets[1:] = numpy.cumsum(comm.allgather(N))
+        result = numpy.empty(primary.sum(), dtype=[('PID', 'i8'), ('root', 'i8')])
+        result['PID'] = PID[primary]
+        result['root'] = root
+        result = AlltoallvArray(result, offsets.searchsorted(result['PID'], side='right') - 1, comm)
+
+        minid = numpy.empty(N, dtype='i8')
+        minid[result['PID'] - offsets[comm.rank]] = result['root']
+
+        return _assign_labels(minid, comm=comm, thresh=nmin)
+
     def to_halos(self, particle_mass, cosmo, redshift, mdef='vir',
                     posdef='cm', peakcolumn='Density'):
         """
@@ -196,6 +431,12 @@ def _assign_labels(minid, comm, thresh):
     the same minid.
     Halos with less than thresh particles are reclassified to 0.
 
+    The size of each group is counted on the rank owning the group, the
+    rank holding the particle ``minid``, such that each rank owns a
+    contiguous range of minid. The owners assign the labels in the order
+    of decreasing size with a prefix sum over ranks, and send the labels
+    back; the particles are never sorted globally.
+
     Parameters
     ----------
     minid : array_like, ('i8')
@@ -212,75 +453,187 @@ def _assign_labels(minid, comm, thresh):
         The new labels of particles. Note that this is ordered
         by the size of halo, with the exception 0 represents all
         particles that are in halos that contain less than thresh particles.
+        Halos of the same size are ordered by minid.
 
     """
-    from mpi4py import MPI
-
-    dtype = numpy.dtype([
-            ('origind', 'u8'),
-            ('fofid', 'u8'),
-            ])
-    data = numpy.empty(len(minid), dtype=dtype)
-    # assign origind for recovery of ordering, since
-    # we need to work in sorted fofid
-    data['fofid'] = minid
-    data['origind'] = numpy.arange(len(data), dtype='u4')
-    data['origind'] += numpy.sum(comm.allgather(len(data))[:comm.rank], dtype='intp') \
-
-    data = DistributedArray(data, comm)
+    # the local part of the groups
+    fofid, inverse, N = numpy.unique(minid, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+
+    # the owner of each group holds the particle minid
+    offsets = numpy.zeros(comm.size + 1, dtype='i8')
+    offsets[1:] = numpy.cumsum(comm.allgather(len(minid)))
+    owner = offsets.searchsorted(fofid, side='right') - 1
+
+    # send the partial sizes to the owner of each group
+    tosend = numpy.empty(len(fofid), dtype=[('fofid', 'i8'), ('N', 'i8'), ('rank', 'intp')])
+    tosend['fofid'] = fofid
+    tosend['N'] = N
+    tosend['rank'] = comm.rank
+    recv = AlltoallvArray(tosend, owner, comm)
+    del tosend
+
+    groups, ginverse = numpy.unique(recv['fofid'], return_inverse=True)
+    ginverse = ginverse.reshape(-1)
+    size = numpy.zeros(len(groups), dtype='i8')
+    numpy.add.at(size, ginverse, recv['N'])
 
-    # first attempt is to assign fofid for each group
-    data.sort('fofid')
-    label = data['fofid'].unique_labels()
+    # now eliminate those with less than thresh particles
+    halos = numpy.flatnonzero(size > thresh)
+    halos = halos[numpy.lexsort((groups[halos], -size[halos]))]
+    hsize = size[halos]
+
+    # the number of halos of each size, on each rank
+    sizes = numpy.unique(numpy.concatenate(comm.allgather(numpy.unique(hsize))))
+    k = sizes.searchsorted(hsize)
+    counts = numpy.bincount(k, minlength=len(sizes))
+    allcounts = numpy.array(comm.allgather(counts), dtype='i8').reshape(comm.size, len(sizes))
+    total = allcounts.sum(axis=0)
+
+    # halos with larger sizes, halos of the same size on earlier ranks
+    # (with smaller minid), and earlier halos of the same size on this
+    # rank come first
+    larger = total[::-1].cumsum()[::-1] - total
+    before = allcounts[:comm.rank].sum(axis=0)
+    local = counts[::-1].cumsum()[::-1] - counts
+    within = numpy.arange(len(halos)) - local[k]
+
+    Nhalo0 = total.sum() + 1
+    if Nhalo0 > 2**31:
+        dtype = 'i8'
+    else:
+        dtype = 'i4'
 
-    N = label.bincount()
+    glabel = numpy.zeros(len(groups), dtype=dtype)
+    glabel[halos] = 1 + larger[k] + before[k] + within
 
-    # now eliminate those with less than thresh particles
-    small = N.local <= thresh
+    # send the labels back to the ranks of the particles
+    reply = numpy.empty(len(recv), dtype=[('fofid', 'i8'), ('label', dtype)])
+    reply['fofid'] = recv['fofid']
+    reply['label'] = glabel[ginverse]
+    reply = AlltoallvArray(reply, recv['rank'], comm)
+    del recv
 
-    Nlocal = label.bincount(local=True)
-    # mask == True for particles in small halos
-    mask = numpy.repeat(small, Nlocal)
+    label = numpy.empty(len(fofid), dtype=dtype)
+    label[fofid.searchsorted(reply['fofid'])] = reply['label']
 
-    # globally shift halo id by one
-    label.local += 1
-    label.local[mask] = 0
+    return label[inverse]
 
-    data['fofid'].local[:] = label.local[:]
-    del label
+def _primary_copies(layout, domain, pos, comm):
+    """
+    Select exactly one copy of each particle on the domains of ``layout``.
 
-    data.sort('fofid')
+    This is the copy in the primary region of a rank, such that all of
+    its neighbours within the smoothing are on the rank. Particles in no
+    primary region (e.g., at the upper edge of a non-periodic domain) use
+    their first copy in the layout.
+    """
+    N = len(pos)
+    offset = numpy.sum(comm.allgather(N)[:comm.rank], dtype='i8')
+    total = comm.allreduce(N)
 
-    data['fofid'].local[:] = data['fofid'].unique_labels().local[:]
+    # a unique key of each copy, lower for the copies in a primary region
+    key = offset + numpy.arange(N, dtype='i8')
+    key[~domain.isprimary(pos)] += total
 
-    data.sort('origind')
+    minkey = layout.exchange(layout.gather(key, mode=numpy.fmin))
+    return minkey == key
 
-    label = data['fofid'].local.view('i8').copy()
+def _halo_offsets(Nhalo, comm):
+    """
+    The first label of the halos on each rank, when ``Nhalo`` halos
+    are scattered evenly across ranks, as in :func:`ScatterArray`.
+    """
+    counts = numpy.array([Nhalo // comm.size + (rank < Nhalo % comm.size)
+                          for rank in range(comm.size)], dtype='i8')
+    offsets = numpy.zeros(comm.size + 1, dtype='i8')
+    offsets[1:] = counts.cumsum()
+    return offsets
 
-    del data
+def _halo_lookup(labels, offsets, comm, *arrays):
+    """
+    Return the items ``labels`` of the halo properties ``arrays``,
+    which are scattered across ranks with the first labels ``offsets``.
+    """
+    request = numpy.empty(len(labels), dtype=[('Label', 'i8'), ('rank', 'intp'), ('index', 'intp')])
+    request['Label'] = labels
+    request['rank'] = comm.rank
+    request['index'] = numpy.arange(len(labels))
+    request = AlltoallvArray(request, offsets.searchsorted(labels, side='right') - 1, comm)
+
+    i = request['Label'] - offsets[comm.rank]
+    reply = numpy.empty(len(request), dtype=[('index', 'intp')] +
+                [('f%d' % n, a.dtype, a.shape[1:]) for n, a in enumerate(arrays)])
+    reply['index'] = request['index']
+    for n, a in enumerate(arrays):
+        reply['f%d' % n] = a[i]
+    reply = AlltoallvArray(reply, request['rank'], comm)
+
+    toret = []
+    for n, a in enumerate(arrays):
+        r = numpy.empty((len(labels),) + a.shape[1:], dtype=a.dtype)
+        r[reply['index']] = reply['f%d' % n]
+        toret.append(r)
+    return toret
+
+def _pointer_jump(pid, parent, comm):
+    """
+    Follow the pointers from the items ``pid`` to their ``parent`` until
+    the roots, the items pointing to themselves, by pointer jumping.
 
-    Nhalo0 = max(comm.allgather(label.max())) + 1
-    Nlocal = numpy.bincount(label, minlength=Nhalo0)
-    comm.Allreduce(MPI.IN_PLACE, Nlocal, op=MPI.SUM)
+    The items are stored on the rank ``pid % comm.size``; each iteration
+    replaces the parent by the parent of the parent, for the items whose
+    parent is not a root. Returns the root of each item.
+    """
+    table = numpy.empty(len(pid), dtype=[('pid', 'i8'), ('parent', 'i8'), ('rank', 'intp'), ('index', 'intp')])
+    table['pid'] = pid
+    table['parent'] = parent
+    table['rank'] = comm.rank
+    table['index'] = numpy.arange(len(pid))
+    table = AlltoallvArray(table, pid % comm.size, comm)
+    table.sort(order='pid')
+
+    active = numpy.arange(len(table))
+    while True:
+        # ask the owners of the parents for the grandparents
+        request = numpy.empty(len(active), dtype=[('parent', 'i8'), ('rank', 'intp'), ('index', 'intp')])
+        request['parent'] = table['parent'][active]
+        request['rank'] = comm.rank
+        request['index'] = active
+        request = AlltoallvArray(request, request['parent'] % comm.size, comm)
+
+        reply = numpy.empty(len(request), dtype=[('parent', 'i8'), ('index', 'intp')])
+        reply['parent'] = table['parent'][table['pid'].searchsorted(request['parent'])]
+        reply['index'] = request['index']
+        reply = AlltoallvArray(reply, request['rank'], comm)
+
+        changed = table['parent'][reply['index']] != reply['parent']
+        table['parent'][reply['index']] = reply['parent']
+        active = reply['index'][changed]
+
+        if comm.allreduce(len(active)) == 0:
+            break
 
-    # sort the labels by halo size
-    arg = Nlocal[1:].argsort()[::-1] + 1
-    if Nhalo0 > 2**31:
-        dtype = 'i8'
-    else:
-        dtype = 'i4'
-    P = numpy.arange(Nhalo0, dtype=dtype)
-    P[arg] = numpy.arange(len(arg), dtype=dtype) + 1
-    label = P[label]
+    # return the roots to the items
+    result = numpy.empty(len(table), dtype=[('parent', 'i8'), ('index', 'intp')])
+    result['parent'] = table['parent']
+    result['index'] = table['index']
+    result = AlltoallvArray(result, table['rank'], comm)
 
-    return label
+    root = numpy.empty(len(pid), dtype='i8')
+    root[result['index']] = result['parent']
+    return root
 
 def _fof_local(layout, pos, boxsize, ll, comm):
     from kdcount import cluster
 
     N = len(pos)
 
-    pos = layout.exchange(pos)
+    PID = numpy.arange(N, dtype='intp')
+    PID += numpy.sum(comm.allgather(N)[:comm.rank], dtype='intp')
+
+    # exchange the positions and the particle ids together
+    pos, PID = ExchangeArrays(layout, pos, PID)
     if boxsize is not None:
         pos %= boxsize
     data = cluster.dataset(pos, boxsize=boxsize)
@@ -288,40 +641,122 @@ def _fof_local(layout, pos, boxsize, ll, comm):
     labels = fof.labels
     del fof
 
-    PID = numpy.arange(N, dtype='intp')
-    PID += numpy.sum(comm.allgather(N)[:comm.rank], dtype='intp')
-
-    PID = layout.exchange(PID)
     # initialize global labels
     minid = equiv_class(labels, PID, op=numpy.fmin)[labels]
 
-    return minid
+    return minid, PID, pos, data
 
-def _fof_merge(layout, minid, comm):
-    # generate global halo id
+def _union_equal(parent, value):
+    """
+    Join the trees of a union-find forest whose roots have the same
+    value, and compress the paths, such that ``parent`` points to
+    the root of each item.
+    """
+    roots = numpy.flatnonzero(parent == numpy.arange(len(parent)))
+    roots = roots[value[roots].argsort(kind='mergesort')]
+    v = value[roots]
+    start = numpy.flatnonzero(numpy.append(True, v[1:] != v[:-1]))
+    N = numpy.diff(numpy.append(start, len(roots)))
+    parent[roots] = numpy.repeat(roots[start], N)
 
     while True:
-        # merge, if a particle belongs to several ranks
-        # use the global label of the minimal
-        minid_new = layout.gather(minid, mode=numpy.fmin)
-        minid_new = layout.exchange(minid_new)
+        up = parent[parent]
+        if (up == parent).all(): break
+        parent[...] = up
+
+def _fof_merge(layout, minid, PID, N, comm):
+    """
+    Merge the local groups that span several ranks, such that all copies
+    of a particle have the same label, the minimum particle id of the group.
+
+    Only the particles with copies on several ranks (the frontier) are
+    communicated. In each iteration, the ranks send the labels of their
+    copies that changed to the rank that held the particle before the
+    decomposition, which sends any smaller label back to all ranks holding
+    a copy. The labels are applied to the local groups as a union-find
+    forest on minid. The iterations stop once no labels change.
+
+    ``N`` is the number of particles on this rank before the decomposition.
+    """
+    # the rank holding each particle before the decomposition
+    offsets = numpy.zeros(comm.size + 1, dtype='i8')
+    offsets[1:] = numpy.cumsum(comm.allgather(N))
 
-        # on my rank, these particles have been merged
-        merged = minid_new != minid
-        # if no rank has merged any, we are done
-        # gl is the global label (albeit with some holes)
-        total = comm.allreduce(merged.sum())
+    # the local groups, joined when their labels are the same
+    value, group = numpy.unique(minid, return_inverse=True)
+    parent = numpy.arange(len(value))
+
+    # the frontier; and the owner of each particle learns the holders of its copies
+    ncopies = layout.exchange(layout.gather(numpy.ones(len(minid), dtype='i4'), mode='sum'))
+    shared = numpy.flatnonzero(ncopies > 1)
+    del ncopies
+
+    spid = PID[shared]
+    sgroup = group[shared]
+    owner = offsets.searchsorted(spid, side='right') - 1
+
+    holders = numpy.empty(len(shared), dtype=[('PID', 'i8'), ('rank', 'intp')])
+    holders['PID'] = spid
+    holders['rank'] = comm.rank
+    holders = AlltoallvArray(holders, owner, comm)
+    opid = numpy.unique(holders['PID'])
+    hindex = opid.searchsorted(holders['PID'])
+
+    best = numpy.empty(len(opid), dtype='i8')
+    best[...] = numpy.iinfo('i8').max
+
+    # the labels known to the owners
+    sent = numpy.empty(len(shared), dtype='i8')
+    sent[...] = -1
+
+    message = numpy.dtype([('PID', 'i8'), ('minid', 'i8'), ('rank', 'intp')])
+
+    while True:
+        # send the changed labels of the frontier to the owners
+        current = value[parent[sgroup]]
+        changed = current != sent
+        total = comm.allreduce(changed.sum())
 
         if total == 0:
-            del minid_new
             break
-        old = minid[merged]
-        new = minid_new[merged]
-        arg = old.argsort()
-        new = new[arg]
-        old = old[arg]
-        replacesorted(minid, old, new, out=minid)
 
+        sent[changed] = current[changed]
+        tosend = numpy.empty(changed.sum(), dtype=message)
+        tosend['PID'] = spid[changed]
+        tosend['minid'] = current[changed]
+        tosend['rank'] = comm.rank
+        recv = AlltoallvArray(tosend, owner[changed], comm)
+
+        # the owners reduce the labels
+        i = opid.searchsorted(recv['PID'])
+        newbest = best.copy()
+        numpy.minimum.at(newbest, i, recv['minid'])
+        improved = newbest < best
+        best = newbest
+
+        # send the smaller labels to all holders, and to the senders of larger labels
+        toholders = improved[hindex]
+        stale = recv['minid'] > best[i]
+        reply = numpy.empty(toholders.sum() + stale.sum(), dtype=message)
+        reply['PID'] = numpy.concatenate([holders['PID'][toholders], recv['PID'][stale]])
+        reply['minid'] = numpy.concatenate([best[hindex[toholders]], best[i[stale]]])
+        reply['rank'] = numpy.concatenate([holders['rank'][toholders], recv['rank'][stale]])
+        reply = AlltoallvArray(reply, reply['rank'], comm)
+
+        # apply the labels to the local groups of the copies
+        upid, inverse = numpy.unique(reply['PID'], return_inverse=True)
+        umin = numpy.empty(len(upid), dtype='i8')
+        umin[...] = numpy.iinfo('i8').max
+        numpy.minimum.at(umin, inverse, reply['minid'])
+
+        j = upid.searchsorted(spid).clip(0, max(len(upid) - 1, 0))
+        found = numpy.flatnonzero(upid[j] == spid) if len(upid) > 0 else j[:0]
+        numpy.minimum.at(value, parent[sgroup[found]], umin[j[found]])
+        sent[found] = numpy.minimum(sent[found], umin[j[found]])
+
+        _union_equal(parent, value)
+
+    minid = value[parent[group]]
     minid = layout.gather(minid, mode=numpy.fmin)
     return minid
 
@@ -353,6 +788,22 @@ def fof(source, linking_length, comm, periodic, domain_factor, logger):
     minid: array_like
         A unique label of each position. The label is not ranged from 0.
     """
+    return _fof(source, linking_length, comm, periodic, domain_factor, logger)[0]
+
+def _fof(source, linking_length, comm, periodic, domain_factor, logger):
+    """
+    Run Friends-of-friends halo finder, as :func:`fof`.
+
+    Returns
+    -------
+    minid: array_like
+        A unique label of each position. The label is not ranged from 0.
+    local: dict
+        the state of the decomposition: the ``domain`` and ``layout``,
+        and the ``Position``, particle id ``PID`` and the :mod:`kdcount`
+        ``dataset`` of the particles on the domain of this rank,
+        including the ghosts
+    """
     from pmesh.domain import GridND
 
     np = split_size_3d(comm.size)
@@ -394,12 +845,14 @@ def fof(source, linking_length, comm, periodic, domain_factor, logger):
         logger.info("Number of particles max/min = %d / %d after spatial decomposition" % (max(np), min(np)))
 
     comm.barrier()
-    minid = _fof_local(layout, Position, BoxSize, linking_length, comm)
+    minid, PID, xpos, data = _fof_local(layout, Position, BoxSize, linking_length, comm)
 
     comm.barrier()
-    minid = _fof_merge(layout, minid, comm)
+    minid = _fof_merge(layout, minid, PID, len(Position), comm)
 
-    return minid
+    local = dict(domain=domain, layout=layout, BoxSize=BoxSize,
+                 Position=xpos, PID=PID, dataset=data)
+    return minid, local
 
 def fof_find_peaks(source, label, comm,
                 position='Position', column='Density'):
@@ -420,7 +873,9 @@ def fof_catalog(source, label, comm,
     Catalog of FOF groups based on label from a parent source
 
     This is a collective operation -- the returned halo catalog will be
-    equally distributed across all ranks
+    equally distributed across all ranks. The particles of each halo are
+    sent to the rank holding the halo, which reduces them locally, such
+    that no rank holds arrays of the size of the total number of halos.
 
     Notes
     -----
@@ -457,15 +912,12 @@ def fof_catalog(source, label, comm,
         sorted such that the most massive halo is first. ``catalog[0]``
         does not correspond to any halo.
     """
-    from nbodykit.utils import ScatterArray
-
     # make sure all of the columns are there
     for col in [position, velocity]:
         if col not in source:
             raise ValueError("the column '%s' is missing from parent source; cannot compute halos" %col)
 
     dtype=[('CMPosition', ('f4', 3)),('CMVelocity', ('f4', 3)),('Length', 'i4')]
-    N = count(label, comm=comm)
 
     if periodic:
         # make sure BoxSize is there
@@ -475,51 +927,81 @@ def fof_catalog(source, label, comm,
     else:
         boxsize = None
 
-    # center of mass position
-    hpos = centerofmass(label, source.compute(source[position]), boxsize=boxsize, comm=comm)
-
-    # center of mass velocity
-    hvel = centerofmass(label, source.compute(source[velocity]), boxsize=None, comm=comm)
-
-    # center of mass initial position
+    # the columns of the particles, computed at once
+    columns = [position, velocity]
     if initposition in source:
         dtype.append(('InitialPosition', ('f4', 3)))
-        hpos_init = centerofmass(label, source.compute(source[initposition]), boxsize=boxsize, comm=comm)
+        columns.append(initposition)
 
     if peakcolumn is not None:
         assert peakcolumn in source
 
         dtype.append(('PeakPosition', ('f4', 3)))
         dtype.append(('PeakVelocity', ('f4', 3)))
+        columns.append(peakcolumn)
+
+    data = source.compute(*[source[col] for col in columns])
+    data = dict(zip(columns, data))
 
-        density = source[peakcolumn].compute()
-        dmax = equiv_class(label, density, op=numpy.fmax, dense_labels=True, minlength=len(N), identity=-numpy.inf)
-        comm.Allreduce(MPI.IN_PLACE, dmax, op=MPI.MAX)
-        # remove any non-peak particle from the labels
-        label1 = label * (density >= dmax[label])
+    # the halos are scattered evenly across ranks, in the order of labels
+    Nhalo = comm.allreduce(label.max() if len(label) > 0 else 0, op=MPI.MAX) + 1
+    offsets = _halo_offsets(Nhalo, comm)
+    start, nlocal = offsets[comm.rank], offsets[comm.rank + 1] - offsets[comm.rank]
 
-        # compute the center of mass on the new labels
-        ppos = centerofmass(label1, source.compute(source[position]), boxsize=boxsize, comm=comm)
-        pvel = centerofmass(label1, source.compute(source[velocity]), boxsize=None, comm=comm)
+    # route the particles in halos to the rank holding the halo
+    inhalo = label > 0
+    particles = numpy.empty(inhalo.sum(), dtype=[('Label', 'i8')] +
+                [(col, data[col].dtype, data[col].shape[1:]) for col in columns])
+    particles['Label'] = label[inhalo]
+    for col in columns:
+        particles[col] = data[col][inhalo]
+
+    particles = AlltoallvArray(particles, offsets.searchsorted(particles['Label'], side='right') - 1, comm)
+    hlabel = particles['Label'] - start
+
+    # the particles not in any halo are the 0-th item of the catalog,
+    # reduced over all ranks
+    label0 = numpy.zeros((~inhalo).sum(), dtype='intp')
 
     dtype = numpy.dtype(dtype)
-    if comm.rank == 0:
-        catalog = numpy.empty(shape=len(N), dtype=dtype)
+    catalog = numpy.empty(nlocal, dtype=dtype)
 
-        catalog['CMPosition'] = hpos
-        catalog['CMVelocity'] = hvel
-        catalog['Length'] = N
-        catalog['Length'][0] = 0
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        catalog['Length'] = count(hlabel, comm=MPI.COMM_SELF, minlength=nlocal)
+        catalog['CMPosition'] = centerofmass(hlabel, particles[position], boxsize=boxsize, comm=MPI.COMM_SELF, minlength=nlocal)
+        catalog['CMVelocity'] = centerofmass(hlabel, particles[velocity], boxsize=None, comm=MPI.COMM_SELF, minlength=nlocal)
         if 'InitialPosition' in dtype.names:
-            catalog['InitialPosition'] = hpos_init
+            catalog['InitialPosition'] = centerofmass(hlabel, particles[initposition], boxsize=boxsize, comm=MPI.COMM_SELF, minlength=nlocal)
 
-        if peakcolumn is not None:
-            catalog['PeakPosition'] = ppos
-            catalog['PeakVelocity'] = pvel
-    else:
-        catalog = None
+    cm0 = {}
+    cm0['CMPosition'] = centerofmass(label0, data[position][~inhalo], boxsize=boxsize, comm=comm, minlength=1)
+    cm0['CMVelocity'] = centerofmass(label0, data[velocity][~inhalo], boxsize=None, comm=comm, minlength=1)
+    if 'InitialPosition' in dtype.names:
+        cm0['InitialPosition'] = centerofmass(label0, data[initposition][~inhalo], boxsize=boxsize, comm=comm, minlength=1)
+
+    if peakcolumn is not None:
+        density = particles[peakcolumn]
+        dmax = equiv_class(hlabel, density, op=numpy.fmax, dense_labels=True, minlength=nlocal, identity=-numpy.inf)
+        peak = density >= dmax[hlabel]
+
+        # compute the center of mass of the particles at the peak
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            catalog['PeakPosition'] = centerofmass(hlabel[peak], particles[position][peak], boxsize=boxsize, comm=MPI.COMM_SELF, minlength=nlocal)
+            catalog['PeakVelocity'] = centerofmass(hlabel[peak], particles[velocity][peak], boxsize=None, comm=MPI.COMM_SELF, minlength=nlocal)
+
+        # particles not at the peak of a halo are counted in the 0-th item
+        label0 = numpy.zeros(len(label0) + (~peak).sum(), dtype='intp')
+        ppos = numpy.concatenate([data[position][~inhalo], particles[position][~peak]], axis=0)
+        pvel = numpy.concatenate([data[velocity][~inhalo], particles[velocity][~peak]], axis=0)
+        cm0['PeakPosition'] = centerofmass(label0, ppos, boxsize=boxsize, comm=comm, minlength=1)
+        cm0['PeakVelocity'] = centerofmass(label0, pvel, boxsize=None, comm=comm, minlength=1)
+
+    if nlocal > 0 and start == 0:
+        for name in cm0:
+            catalog[name][0] = cm0[name][0]
+        catalog['Length'][0] = 0
 
-    return ScatterArray(catalog, comm, root=0)
+    return catalog
 
 # -----------------------
 # Helpers
@@ -633,7 +1115,7 @@ def replacesorted(arr, sorted, b, out=None):
     return out
 
 
-def centerofmass(label, pos, boxsize, comm=MPI.COMM_WORLD):
+def centerofmass(label, pos, boxsize, comm=MPI.COMM_WORLD, minlength=None):
     """
     Calulate the center of mass of particles of the same label.
 
@@ -653,6 +1135,8 @@ def centerofmass(label, pos, boxsize, comm=MPI.COMM_WORLD):
         size of the periodic box, or None if no periodic boundary is assumed.
     comm : :py:class:`MPI.Comm`
         communicator for the collective operation.
+    minlength : int, optional
+        the number of halos; by default, the maximum label plus one
 
     Returns
     -------
@@ -660,7 +1144,10 @@ def centerofmass(label, pos, boxsize, comm=MPI.COMM_WORLD):
         the center of mass position of the halos.
 
     """
-    Nhalo0 = max(comm.allgather(label.max())) + 1
+    if minlength is None:
+        Nhalo0 = max(comm.allgather(label.max())) + 1
+    else:
+        Nhalo0 = minlength
 
     N = numpy.bincount(label, minlength=Nhalo0)
     comm.Allreduce(MPI.IN_PLACE, N, op=MPI.SUM)
@@ -688,7 +1175,7 @@ def centerofmass(label, pos, boxsize, comm=MPI.COMM_WORLD):
         hpos = dpos
     return hpos
 
-def count(label, comm=MPI.COMM_WORLD):
+def count(label, comm=MPI.COMM_WORLD, minlength=None):
     """
     Count the number of particles of the same label.
 
@@ -701,6 +1188,8 @@ def count(label, comm=MPI.COMM_WORLD):
         Halo label of particles, >=0
     comm : :py:class:`MPI.Comm`
         communicator for the collective operation.
+    minlength : int, optional
+        the number of halos; by default, the maximum label plus one
 
     Returns
     -------
@@ -708,7 +1197,10 @@ def count(label, comm=MPI.COMM_WORLD):
         the count of number of particles in each halo
 
     """
-    Nhalo0 = max(comm.allgather(label.max())) + 1
+    if minlength is None:
+        Nhalo0 = max(comm.allgather(label.max())) + 1
+    else:
+        Nhalo0 = minlength
 
     N = numpy.bincount(label, minlength=Nhalo0)
     comm.Allreduce(MPI.IN_PLACE, N, op=MPI.SUM)
@@ -1,6 +1,9 @@
 import numpy
 import logging
-from nbodykit import CurrentMPIComm
+import time
+from contextlib import contextmanager
+from mpi4py import MPI
+from nbodykit import CurrentMPIComm, _global_options
 from nbodykit.binned_statistic import BinnedStatistic
 
 class MissingCorrfuncError(Exception):
@@ -83,6 +86,9 @@ class MPICorrfuncCallable(object):
     - If ``show_progress`` is ``True``, execute the function in chunks,
       logging to screen the progress along the way. This is useful for
       potentially long running pair counting jobs.
+    - Execute the function in chunks of the primaries, such that ranks
+      which run out of work steal the remaining chunks of the other ranks;
+      see the ``paircount_chunks`` option of :class:`~nbodykit.set_options`.
     - When calling the function, capture stdout/stderr and C-level output
       and if an error occurs, raise an exception with all generated output for
       the user.
@@ -138,18 +144,31 @@ class MPICorrfuncCallable(object):
             self.logger.info("calling function '%s'" % name)
 
         # number of iterations
-        N = 10 if self.show_progress else 1
+        N = _global_options['paircount_chunks']
+        steal = self.comm.size > 1 and N > 1 and callback is not None
+        if not steal:
+            N = 10 if self.show_progress else 1
+        N = max(1, min(N, loads[self.comm.rank]))
+
+        # the iterations after which the progress is logged
+        if self.comm.rank == largest_load and self.show_progress:
+            milestones = [i for i in range(N) if 10*(i+1)//N > 10*i//N]
+        else:
+            milestones = []
 
-        # run in chunks
-        pc = None
         chunks = numpy.array_split(numpy.arange(loads[self.comm.rank],dtype='intp'), N, axis=0)
-        for i, chunk in enumerate(chunks):
-            this_pc = run(chunk)
-            if self.comm.rank == largest_load and self.show_progress:
-                self.logger.info("%d%% done" % (N*(i+1)))
-
-            # sum up the results
-            pc = this_pc if pc is None else pc + this_pc
+        if steal:
+            pc = self._steal(chunks, loads, kwargs, callback, milestones)
+        else:
+            # run in chunks
+            pc = None
+            for i, chunk in enumerate(chunks):
+                this_pc = run(chunk)
+                if i in milestones:
+                    self.logger.info("%d%% done" % (100*(i+1)//N))
+
+                # sum up the results
+                pc = this_pc if pc is None else pc + this_pc
 
         # convert flattened 1D results to 2D array
         if len(self.edges) > 1:
@@ -178,17 +197,124 @@ class MPICorrfuncCallable(object):
         # return the BinnedStatistic
         return BinnedStatistic(dims, self.edges, data, fields_to_sum=['npairs', 'wnpairs'])
 
-    def _run(self, func, kws):
+    def _steal(self, chunks, loads, kwargs, callback, milestones):
         """
-        Internal function to run the wrapped :mod:`Corrfunc` function
-        :attr:`func`, passing in the keywords specified by ``kws``.
+        Run the function on the ``chunks`` of the primaries of this rank,
+        serving the requests of idle ranks for the remaining chunks between
+        iterations. Once all chunks are done, steal chunks from the other
+        ranks, starting with the rank with the largest remaining load.
 
-        .. note::
-            This hides all output from the Corrfunc function (stdout, stderr,
-            and C-level output), unless an exception occurs.
+        A stolen chunk is sent with the arguments set by ``callback``;
+        the remaining arguments, which hold the secondaries, are only sent
+        with the first chunk stolen from a given rank.
+
+        Returns
+        -------
+        pc : CorrfuncResult
+            the sum of the results of this rank, including stolen chunks
         """
-        from nbodykit.utils import captured_output
+        REQUEST, WORK, NOWORK, DONE = 1, 2, 3, 4
+        comm = self.comm.Dup()
+
+        pending = list(enumerate(chunks))
+        sent = set() # ranks holding our secondaries
+        secondaries = {} # the secondaries of other ranks
+        finished = set() # ranks that sent DONE
+        requests = []
+        status = MPI.Status()
+        nstolen = 0
+        pc = None
 
+        def answer(source, tag, msg):
+            if tag == REQUEST:
+                # give away the last chunk, unless it is the only one left
+                if len(pending) > 1:
+                    i, chunk = pending.pop()
+                    kws = {}
+                    callback(kws, chunk)
+                    if source in sent:
+                        base = None
+                    else:
+                        base = {k: v for k, v in kwargs.items() if k not in kws}
+                        sent.add(source)
+                    requests.append(comm.isend((kws, base, len(pending)), dest=source, tag=WORK))
+                else:
+                    requests.append(comm.isend(None, dest=source, tag=NOWORK))
+            elif tag == DONE:
+                finished.add(source)
+
+        def serve():
+            while comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status):
+                source, tag = status.Get_source(), status.Get_tag()
+                answer(source, tag, comm.recv(source=source, tag=tag))
+
+        def wait():
+            # poll rather than block in MPI, which may spin and take
+            # the cores of the ranks doing the work
+            while not comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status):
+                time.sleep(1e-3)
+            source, tag = status.Get_source(), status.Get_tag()
+            return source, tag, comm.recv(source=source, tag=tag)
+
+        # our own chunks, serving requests in between; the output is
+        # captured once per logged progress, rather than once per chunk
+        while pending:
+            with self._captured(self.callable):
+                while pending:
+                    serve()
+                    i, chunk = pending.pop(0)
+                    callback(kwargs, chunk)
+                    this_pc = self._call(self.callable, kwargs)
+                    pc = this_pc if pc is None else pc + this_pc
+                    if i in milestones: break
+            if i in milestones:
+                self.logger.info("%d%% done" % (100*(i+1)//len(chunks)))
+
+        with self._captured(self.callable):
+
+            # steal from the other ranks, most loaded first; a rank
+            # that has no work left never gets new work
+            remaining = dict((r, loads[r]) for r in range(comm.size) if r != comm.rank)
+            while remaining:
+                victim = max(remaining, key=remaining.get)
+                requests.append(comm.isend(None, dest=victim, tag=REQUEST))
+                while True:
+                    source, tag, msg = wait()
+                    if tag in (WORK, NOWORK): break
+                    answer(source, tag, msg)
+
+                if tag == NOWORK:
+                    remaining.pop(victim)
+                    continue
+
+                kws, base, remaining[victim] = msg
+                if base is not None:
+                    secondaries[victim] = base
+                kws.update(secondaries[victim])
+                pc = pc + self._call(self.callable, kws)
+                nstolen += 1
+
+            # answer requests until all ranks are done
+            for r in range(comm.size):
+                if r != comm.rank:
+                    requests.append(comm.isend(None, dest=r, tag=DONE))
+            while len(finished) < comm.size - 1:
+                answer(*wait())
+
+            MPI.Request.waitall(requests)
+            comm.Free()
+
+        nstolen = self.comm.allreduce(nstolen)
+        if self.comm.rank == 0:
+            self.logger.info("%d chunks of objects were stolen by idle ranks" % nstolen)
+
+        return pc
+
+    def _call(self, func, kws):
+        """
+        Internal function to call the wrapped :mod:`Corrfunc` function
+        :attr:`func`, passing in the keywords specified by ``kws``.
+        """
         kws = kws.copy()
 
         # cast the array items to the native endianness
@@ -199,10 +325,21 @@ class MPICorrfuncCallable(object):
             if isinstance(value, numpy.ndarray):
                 kws[key] = tonativeendian(value)
 
+        return CorrfuncResult(func(**kws))
+
+    @contextmanager
+    def _captured(self, func):
+        """
+        Internal context manager hiding all output from the :mod:`Corrfunc`
+        function :attr:`func` (stdout, stderr, and C-level output), unless
+        an exception occurs.
+        """
+        from nbodykit.utils import captured_output
+
         try:
             # record progress capture output for everything but root
             with captured_output(self.comm, root=None) as (out, err):
-                result = func(**kws)
+                yield
 
         except Exception as e:
             # get the values Corrfunc logged to stdout and stderr
@@ -218,4 +355,14 @@ class MPICorrfuncCallable(object):
             msg += "stderr: %s" % stderr
             raise RuntimeError(msg)
 
-        return CorrfuncResult(result)
+    def _run(self, func, kws):
+        """
+        Internal function to run the wrapped :mod:`Corrfunc` function
+        :attr:`func`, passing in the keywords specified by ``kws``.
+
+        .. note::
+            This hides all output from the Corrfunc function (stdout, stderr,
+            and C-level output), unless an exception occurs.
+        """
+        with self._captured(func):
+            return self._call(func, kws)
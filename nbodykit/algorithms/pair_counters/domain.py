@@ -1,5 +1,5 @@
 from pmesh.domain import GridND
-from nbodykit.utils import split_size_3d
+from nbodykit.utils import split_size_3d, ExchangeArrays
 import numpy
 
 def log_decomposition(comm, logger, N1, N2, pos1, pos2):
@@ -44,19 +44,97 @@ def log_decomposition(comm, logger, N1, N2, pos1, pos2):
         args = (N1//comm.size, N2)
         logger.info("(even distribution would result in %d x %d)" % args)
 
-def decompose_box_data(first, second, attrs, logger, smoothing):
+def balanced_box_edges(comm, pos1, pos2, BoxSize, shape, smoothing, nbins=64):
+    """
+    Return the edges of a grid of ``shape`` domains spanning a box, such
+    that the estimated pair counting work is evenly split along each
+    dimension.
+
+    The work is estimated on a coarse histogram of the objects. The work
+    in a cell with :math:`N_1` primaries and :math:`N_2` secondaries of
+    volume :math:`V_c` is modeled as :math:`N_1 (1 + N_2 V_s / V_c)`,
+    where :math:`V_s` is the volume of the sphere of radius ``smoothing``;
+    this is dominated by :math:`n^2 V_s` in dense regions.
+
+    Parameters
+    ----------
+    comm :
+        the MPI communicator
+    pos1 : array_like
+        the local positions of the first source
+    pos2 : array_like
+        the local positions of the second source
+    BoxSize : array_like
+        the size of the box
+    shape : list of int
+        the number of domains in each dimension
+    smoothing : float
+        the maximum Cartesian separation implied by the user's binning
+    nbins : int, optional
+        the maximum number of histogram cells in each dimension
+
+    Returns
+    -------
+    grid : list of array_like
+        the edges of the domains in each dimension
+    """
+    BoxSize = numpy.ones(3) * BoxSize
+
+    # the coarse histogram, resolving each domain by a few cells
+    bins = [min(nbins, 8 * shape[i]) for i in range(3)]
+    limits = [(0, BoxSize[i]) for i in range(3)]
+    N1 = numpy.histogramdd(pos1[:, :3], bins=bins, range=limits)[0]
+    N1 = comm.allreduce(N1)
+    if pos2 is pos1:
+        N2 = N1
+    else:
+        N2 = numpy.histogramdd(pos2[:, :3], bins=bins, range=limits)[0]
+        N2 = comm.allreduce(N2)
+
+    cost = pair_count_cost(N1, N2, numpy.prod(BoxSize / bins), smoothing, BoxSize)
+
+    grid = []
+    for i in range(3):
+        marginal = cost.sum(axis=tuple(j for j in range(3) if j != i))
+
+        # a uniform floor, such that the edges are strictly increasing
+        marginal = marginal + 1e-3 * marginal.mean() + 1e-10
+
+        cumulative = numpy.concatenate([[0.], numpy.cumsum(marginal)])
+        cumulative /= cumulative[-1]
+        cells = numpy.linspace(0, BoxSize[i], bins[i] + 1, endpoint=True)
+        edges = numpy.interp(numpy.linspace(0, 1, shape[i] + 1), cumulative, cells)
+        edges[0], edges[-1] = 0, BoxSize[i]
+        grid.append(edges)
+
+    return grid
+
+def pair_count_cost(N1, N2, volume, smoothing, BoxSize):
+    """
+    The estimated pair counting work in regions with ``N1`` primaries,
+    ``N2`` secondaries, and volume ``volume``.
+
+    See :func:`balanced_box_edges` for the model.
+    """
+    Vs = min(4. / 3 * numpy.pi * smoothing**3, numpy.prod(BoxSize))
+    return N1 * (1. + N2 * (Vs / volume))
+
+def decompose_box_data(first, second, attrs, logger, smoothing, domain_factor=1):
     """
     Perform a domain decomposition on simulation box data, returning the
     domain-demposed position and weight arrays for each object in the
     correlating pair.
 
-    No load balancing is required since the particles in are assumed to
-    be in a box.
+    Load balancing is required since clustered objects are not uniformly
+    distributed in the box, and the pair counting work scales as the
+    square of the local density. The edges of the domains are chosen
+    such that the estimated work is evenly split along each dimension;
+    see :func:`balanced_box_edges`.
 
     The implementation follows:
 
     1. Decompose the first source such that the objects are spatially
-       tight on a given rank.
+       tight on a given rank, and the estimated work is balanced.
     2. Decompose the second source, ensuring a given rank holds all
        particles within the desired maximum separation.
 
@@ -72,6 +150,10 @@ def decompose_box_data(first, second, attrs, logger, smoothing):
         the current active logger
     smoothing :
         the maximum Cartesian separation implied by the user's binning
+    domain_factor : int, optional
+        the factor by which we over-sample the mesh with domains in a given
+        direction; if larger than 1, the domains are assigned to the ranks
+        such that the estimated work is balanced
 
     Returns
     -------
@@ -104,18 +186,24 @@ def decompose_box_data(first, second, attrs, logger, smoothing):
         w2 = w1
         N2 = N1
 
-    # domain decomposition
-    grid = [
-        numpy.linspace(0, attrs['BoxSize'][0], np[0] + 1, endpoint=True),
-        numpy.linspace(0, attrs['BoxSize'][1], np[1] + 1, endpoint=True),
-        numpy.linspace(0, attrs['BoxSize'][2], np[2] + 1, endpoint=True),
-    ]
+    # domain decomposition, with edges balancing the estimated work
+    shape = [domain_factor * np[i] for i in range(3)]
+    grid = balanced_box_edges(comm, pos1, pos2, attrs['BoxSize'], shape, smoothing)
     domain = GridND(grid, comm=comm)
 
+    # assign the over-decomposed domains to ranks
+    if domain_factor > 1:
+        volume = numpy.einsum('i,j,k->ijk', *[numpy.diff(g) for g in grid]).ravel()
+        load1 = domain.load(pos1, gamma=1)
+        load2 = load1 if pos2 is pos1 else domain.load(pos2, gamma=1)
+        domain.loadbalance(pair_count_cost(load1, load2, volume, smoothing, attrs['BoxSize']))
+
+        if comm.rank == 0:
+            logger.info("Load balance done")
+
     # exchange first particles
     layout = domain.decompose(pos1, smoothing=0)
-    pos1 = layout.exchange(pos1)
-    w1 = layout.exchange(w1)
+    pos1, w1 = ExchangeArrays(layout, pos1, w1)
 
     # exchange second particles
     if smoothing > attrs['BoxSize'].max() * 0.25:
@@ -123,8 +211,7 @@ def decompose_box_data(first, second, attrs, logger, smoothing):
         w2   = numpy.concatenate(comm.allgather(w2), axis=0)
     else:
         layout  = domain.decompose(pos2, smoothing=smoothing)
-        pos2 = layout.exchange(pos2)
-        w2   = layout.exchange(w2)
+        pos2, w2 = ExchangeArrays(layout, pos2, w2)
 
     # log the decomposition breakdown
     log_decomposition(comm, logger, N1, N2, pos1, pos2)
@@ -265,8 +352,7 @@ def decompose_survey_data(first, second, attrs, logger, smoothing, domain_factor
 
     # decompose based on cartesian positions
     layout = domain.decompose(cpos1, smoothing=0)
-    pos1   = layout.exchange(pos1)
-    w1     = layout.exchange(w1)
+    pos1, w1 = ExchangeArrays(layout, pos1, w1)
 
     # get the position/weight of the secondaries
     if smoothing > boxsize.max() * 0.25:
@@ -274,8 +360,7 @@ def decompose_survey_data(first, second, attrs, logger, smoothing, domain_factor
         w2   = numpy.concatenate(comm.allgather(w2), axis=0)
     else:
         layout  = domain.decompose(cpos2, smoothing=smoothing)
-        pos2 = layout.exchange(pos2)
-        w2   = layout.exchange(w2)
+        pos2, w2 = ExchangeArrays(layout, pos2, w2)
 
     # log the decomposition breakdown
     log_decomposition(comm, logger, N1, N2, pos1, pos2)
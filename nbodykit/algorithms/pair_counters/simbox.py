@@ -64,6 +64,10 @@ class SimulationBoxPairCount(PairCountBase):
         if ``True``, perform the pair counting calculation in 10 iterations,
         logging the progress after each iteration; this is useful for
         understanding the scaling of the code
+    domain_factor : int, optional
+        the integer value by which to oversubscribe the domain decomposition
+        mesh before balancing loads; values larger than 1 can improve the
+        balance of the pair counting work for clustered objects
     **config : key/value pairs
         additional keywords to pass to the :mod:`Corrfunc` function
 
@@ -88,7 +92,8 @@ class SimulationBoxPairCount(PairCountBase):
 
     def __init__(self, mode, first, edges, BoxSize=None, periodic=True,
                     second=None, los='z', Nmu=None, pimax=None,
-                    weight='Weight', position='Position', show_progress=False, **config):
+                    weight='Weight', position='Position', show_progress=False,
+                    domain_factor=1, **config):
 
         # check input 'los'
         if isinstance(los, string_types):
@@ -116,6 +121,7 @@ class SimulationBoxPairCount(PairCountBase):
         self.attrs['position'] = position
         self.attrs['config'] = config
         self.attrs['los'] = los
+        self.attrs['domain_factor'] = domain_factor
 
         # test maximum separation and periodic boundary conditions
         if periodic and mode != 'angular':
@@ -172,7 +178,8 @@ class SimulationBoxPairCount(PairCountBase):
 
             # domain decompose the data
             (pos1, w1), (pos2, w2) = decompose_box_data(first, second, attrs,
-                                                        self.logger, smoothing)
+                                                        self.logger, smoothing,
+                                                        domain_factor=attrs['domain_factor'])
 
             # reorder to make LOS last column
             pos1 = pos1[:,axes_order]
@@ -75,6 +75,31 @@ def test_sim_periodic_auto(comm):
 
     if comm.rank == 0: os.remove('paircount-test.json')
 
+@MPITest([1, 4])
+def test_sim_periodic_clustered(comm):
+
+    # a clustered source of particles, in a few gaussian blobs
+    rng = numpy.random.RandomState(42)
+    centers = rng.uniform(0, 512., size=(4, 3))
+    pos = (centers[rng.randint(4, size=2000)] + rng.normal(scale=20., size=(2000, 3))) % 512.
+    pos = pos[comm.rank::comm.size]
+    source = ArrayCatalog({'Position': pos}, BoxSize=512., comm=comm)
+
+    # make the bin edges
+    redges = numpy.linspace(1, 40, 10)
+
+    # do the paircount, with and without balancing the over-decomposed domains
+    r1 = SimulationBoxPairCount('1d', source, redges, periodic=True)
+    r2 = SimulationBoxPairCount('1d', source, redges, periodic=True, domain_factor=2)
+
+    pos = gather_data(source, "Position")
+
+    # verify with kdcount
+    npairs, ravg, wsum = reference_paircount(pos, None, redges, source.attrs['BoxSize'])
+    for r in [r1, r2]:
+        assert_allclose(ravg, r.pairs['r'])
+        assert_allclose(npairs, r.pairs['npairs'])
+
 @MPITest([1, 3])
 def test_sim_nonperiodic_auto(comm):
 
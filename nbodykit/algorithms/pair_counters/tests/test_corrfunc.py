@@ -0,0 +1,52 @@
+from runtests.mpi import MPITest
+from nbodykit.algorithms.pair_counters.corrfunc.base import MPICorrfuncCallable
+from nbodykit import set_options
+from numpy.testing import assert_array_equal, assert_allclose
+import numpy
+import time
+
+def count_pairs(X1, weights1, X2, sleep=0):
+    """A mock Corrfunc function, counting the pairs in a single bin"""
+    data = numpy.zeros(1, dtype=[('npairs', 'u8'), ('ravg', 'f8'), ('weightavg', 'f8')])
+    data['npairs'] = len(X1) * len(X2)
+    if len(X1) and len(X2):
+        data['ravg'] = X1.mean() + X2.mean()
+        data['weightavg'] = weights1.mean()
+    time.sleep(sleep * len(X1))
+    return data
+
+class MockCallable(MPICorrfuncCallable):
+    binning_dims = ['r']
+    edges = [numpy.array([0., 1.])]
+
+    def __call__(self, pos1, w1, pos2, sleep=0):
+        kws = {'X2': pos2, 'sleep': sleep}
+
+        def callback(kws, chunk):
+            kws['X1'] = pos1[chunk]
+            kws['weights1'] = w1[chunk]
+
+        sizes = self.comm.allgather(len(pos1))
+        return MPICorrfuncCallable.__call__(self, sizes, kws, callback=callback)
+
+@MPITest([1, 4])
+def test_work_stealing(comm):
+
+    # all of the primaries on the first rank
+    rng = numpy.random.RandomState(42)
+    pos1 = rng.uniform(size=1000) if comm.rank == 0 else numpy.empty(0)
+    w1 = numpy.ones_like(pos1)
+    pos2 = rng.uniform(size=100) + comm.rank
+
+    func = MockCallable(count_pairs, comm, show_progress=True)
+
+    with set_options(paircount_chunks=1):
+        r1 = func(pos1, w1, pos2, sleep=1e-4)
+    with set_options(paircount_chunks=20):
+        r2 = func(pos1, w1, pos2, sleep=1e-4)
+
+    # the primaries are only correlated with the secondaries of their rank
+    assert r1['npairs'][0] == 1000 * 100
+    assert_array_equal(r1['npairs'], r2['npairs'])
+    assert_allclose(r1['r'], r2['r'])
+    assert_allclose(r1['wnpairs'], r2['wnpairs'])
@@ -0,0 +1,43 @@
+from runtests.mpi import MPITest
+from nbodykit.algorithms.pair_counters.domain import balanced_box_edges, pair_count_cost
+from numpy.testing import assert_allclose
+import numpy
+
+@MPITest([1, 4])
+def test_balanced_box_edges(comm):
+
+    # a dense clump in a uniform background
+    rng = numpy.random.RandomState(42)
+    uniform = rng.uniform(0, 100., size=(1000, 3))
+    clump = (rng.normal(loc=20., scale=2., size=(1000, 3))) % 100.
+    pos = numpy.concatenate([uniform, clump], axis=0)[comm.rank::comm.size]
+
+    grid = balanced_box_edges(comm, pos, pos, 100., [4, 4, 4], 5.)
+
+    for edges in grid:
+        assert_allclose(edges[[0, -1]], [0, 100.])
+        assert (numpy.diff(edges) > 0).all()
+
+        # the domains are narrower around the clump
+        widths = numpy.diff(edges)
+        i = numpy.searchsorted(edges, 20.) - 1
+        assert widths[i] < 25.
+
+    # the maximum work in a slab is smaller than with uniform edges
+    pos = numpy.concatenate(comm.allgather(pos), axis=0)
+    N = numpy.histogram(pos[:, 0], bins=grid[0])[0]
+    cost = pair_count_cost(N, N, numpy.diff(grid[0]) * 100.**2, 5., 100.)
+    N0 = numpy.histogram(pos[:, 0], bins=numpy.linspace(0, 100., 5))[0]
+    cost0 = pair_count_cost(N0, N0, 25. * 100.**2, 5., 100.)
+    assert cost.max() < cost0.max()
+
+@MPITest([1])
+def test_balanced_box_edges_empty(comm):
+
+    pos = numpy.empty((0, 3))
+    grid = balanced_box_edges(comm, pos, pos, [100., 50., 50.], [2, 1, 2], 5.)
+
+    # no objects gives uniform edges
+    assert_allclose(grid[0], [0, 50., 100.])
+    assert_allclose(grid[1], [0, 50.])
+    assert_allclose(grid[2], [0, 25., 50.])
@@ -0,0 +1,115 @@
+import os
+import logging
+import numpy
+
+class PairCountCache(object):
+    """
+    A persistent, on-disk cache of pair counting results, stored as the
+    JSON files written by the ``save`` method of the pair counting
+    algorithms in a directory.
+
+    All methods are collective over ``comm``; the file system operations
+    are done on the root rank.
+
+    Parameters
+    ----------
+    path : str
+        the directory holding the cached pair counts
+    comm : MPI communicator
+        the MPI communicator
+    """
+    logger = logging.getLogger('PairCountCache')
+
+    def __init__(self, path, comm):
+
+        self.path = path
+        self.comm = comm
+
+        if self.comm.rank == 0 and not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(self.path): raise
+        self.comm.barrier()
+
+    def filename(self, key):
+        """
+        The name of the file storing the entry ``key``.
+        """
+        return os.path.join(self.path, key + '.json')
+
+    def get(self, key, pair_counter):
+        """
+        Return the result of ``pair_counter`` stored as ``key``, or
+        ``None`` if the cache has no such entry.
+        """
+        filename = self.filename(key)
+        exists = None
+        if self.comm.rank == 0:
+            exists = os.path.exists(filename)
+        if not self.comm.bcast(exists):
+            return None
+
+        toret = pair_counter.load(filename, comm=self.comm)
+        toret.pairs.attrs['total_wnpairs'] = toret.attrs['total_wnpairs']
+
+        if self.comm.rank == 0:
+            self.logger.info("loaded pair counts from cache %s" % filename)
+
+        return toret
+
+    def put(self, key, result):
+        """
+        Store the pair counting result ``result`` as the entry ``key``.
+        """
+        # write to a temporary file first, such that readers never see a partial entry
+        filename = self.filename(key)
+        tmpname = None
+        if self.comm.rank == 0:
+            tmpname = filename + '.tmp-%d-%d' % (os.getpid(), numpy.random.randint(2**31))
+        tmpname = self.comm.bcast(tmpname)
+
+        result.save(tmpname)
+
+        self.comm.barrier()
+        if self.comm.rank == 0:
+            os.rename(tmpname, filename)
+            self.logger.info("saved pair counts to cache %s" % filename)
+        self.comm.barrier()
+
+
+def cache_key(pair_counter, randoms1, randoms2, split, **kwargs):
+    """
+    The key of the random-random pair counts of ``randoms1`` and
+    ``randoms2`` in the pair count cache.
+
+    This hashes the tokens of the position and weight columns of the
+    randoms, which identify the files (with their modification times) or
+    the values of the columns, see :func:`CatalogSource._column_token`;
+    and the binning, cosmology and other parameters of the pair counting.
+    The key does not depend on the number of ranks.
+    """
+    from nbodykit.cosmology import Cosmology
+    from dask.base import tokenize
+
+    if 'position' in kwargs:
+        names = [kwargs['position']]
+    else:
+        names = [kwargs['ra'], kwargs['dec'], kwargs['redshift']]
+    names.append(kwargs['weight'])
+
+    tokens = [[randoms._column_token(randoms[name]) for name in names]
+                for randoms in [randoms1, randoms2]]
+
+    # parameters that do not change the result
+    params = {}
+    for k in kwargs:
+        if k == 'show_progress': continue
+        v = kwargs[k]
+        if isinstance(v, Cosmology):
+            v = v.pars
+        params[k] = v
+
+    return tokenize(tokens, randoms2 is randoms1,
+                    pair_counter.__name__, split, params)
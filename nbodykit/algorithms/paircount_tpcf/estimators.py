@@ -1,4 +1,6 @@
 from nbodykit.binned_statistic import BinnedStatistic
+from nbodykit import _global_options
+from .cache import PairCountCache, cache_key
 import numpy
 import warnings
 
@@ -139,11 +141,16 @@ class AnalyticUniformRandoms(object):
 
         return R1R2
 
-def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=None, logger=None, **kwargs):
+def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=None, R1R2_split=1, logger=None, **kwargs):
     """
     Compute the correlation function from data/randoms using the
     Landy - Szalay estimator to compute the correlation function.
 
+    If the ``paircount_cache_dir`` option is set, the random-random pair
+    counts are loaded from the cache when the same randoms have been
+    counted with the same parameters before, and stored in the cache
+    otherwise; see :class:`nbodykit.set_options`.
+
     Parameters
     ----------
     pair_counter : SimulationBoxPairCount, SurveyDataPairCount
@@ -158,6 +165,11 @@ def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=No
         the second randoms catalog; can be None for auto-correlations
     R1R2 : SimulationBoxPairCount, SurveyDataPairCount, optional
         if provided, random pairs R1R2 are not recalculated
+    R1R2_split : int, 'auto', optional
+        the number of disjoint subsets of the randoms whose pairs are
+        summed to estimate R1R2, instead of counting all random pairs;
+        'auto' uses subsets about the size of ``data1``. This reduces the
+        cost of R1R2 from quadratic to linear in the number of randoms
     **kwargs :
         the parameters passed to the ``pair_counter`` class to count pairs
 
@@ -180,7 +192,19 @@ def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=No
     if logger is not None and comm.rank == 0:
         logger.info("computing randoms1 - randoms2 pair counts")
     if not R1R2:
-        R1R2 = pair_counter(first=randoms1, second=randoms2, **kwargs)
+        if R1R2_split == 'auto':
+            R1R2_split = max(1, int(round(1. * randoms1.csize / data1.csize)))
+
+        if _global_options['paircount_cache_dir'] is not None:
+            cache = PairCountCache(_global_options['paircount_cache_dir'], comm)
+            key = cache_key(pair_counter, randoms1, randoms2, R1R2_split, **kwargs)
+
+            R1R2 = cache.get(key, pair_counter)
+            if R1R2 is None:
+                R1R2 = _count_random_pairs(pair_counter, randoms1, randoms2, R1R2_split, **kwargs)
+                cache.put(key, R1R2)
+        else:
+            R1R2 = _count_random_pairs(pair_counter, randoms1, randoms2, R1R2_split, **kwargs)
 
     # data1 x data2
     if logger is not None and comm.rank == 0:
@@ -231,6 +255,48 @@ def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=No
     CF = _create_tpcf_result(D1D2.pairs, CF)
     return D1D2.pairs, D1R2.pairs, D2R1.pairs, R1R2.pairs, CF
 
+def _count_random_pairs(pair_counter, randoms1, randoms2, split, **kwargs):
+    """
+    Internal function to count the random-random pairs, as the sum of
+    the pairs within ``split`` disjoint subsets of the randoms.
+
+    The subsets are selected by the ``Index`` of the randoms modulo
+    ``split``; the estimator only uses the ratio of the pairs to the
+    ``total_wnpairs``, which are summed over the subsets in the same way.
+    """
+    if split == 1:
+        return pair_counter(first=randoms1, second=randoms2, **kwargs)
+
+    results = []
+    for i in range(split):
+        first = randoms1[randoms1.Index % split == i]
+        if randoms2 is randoms1:
+            second = first
+        else:
+            second = randoms2[randoms2.Index % split == i]
+        results.append(pair_counter(first=first, second=second, **kwargs))
+
+    # the separations are averaged, weighted by the number of pairs
+    pairs = results[0].pairs.copy()
+    x = pairs.dims[0]
+    npairs = numpy.sum([r.pairs['npairs'] for r in results], axis=0)
+    sep = numpy.sum([r.pairs[x] * r.pairs['npairs'] for r in results], axis=0)
+    pairs[x] = numpy.where(npairs > 0, sep / numpy.where(npairs > 0, npairs, 1), 0.)
+    pairs['npairs'] = npairs
+    pairs['wnpairs'] = numpy.sum([r.pairs['wnpairs'] for r in results], axis=0)
+
+    # keep the first result, with the attributes of the full randoms
+    toret = results[0]
+    toret.first, toret.second = randoms1, randoms2
+    toret.attrs['N1'] = randoms1.csize
+    toret.attrs['N2'] = randoms2.csize
+    toret.attrs['total_wnpairs'] = sum(r.attrs['total_wnpairs'] for r in results)
+    toret.attrs['R1R2_split'] = split
+    pairs.attrs['total_wnpairs'] = toret.attrs['total_wnpairs']
+    toret.pairs = pairs
+
+    return toret
+
 def NaturalEstimator(D1D2):
     """
     Internal function to computing the correlation function using
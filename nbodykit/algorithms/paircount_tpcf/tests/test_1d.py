@@ -225,3 +225,68 @@ def test_low_nbar_randoms(comm):
     # compute 2PCF
     with pytest.warns(UserWarning):
         r = SimulationBox2PCF('1d', source, redges, periodic=False, randoms1=randoms)
+
+@MPITest([1, 4])
+def test_survey_R1R2_cache(comm):
+    import tempfile
+    import shutil
+    cosmo = cosmology.Planck15
+
+    # data and randoms
+    data1, randoms = generate_survey_data(seed=42, comm=comm)
+    data2, _ = generate_survey_data(seed=84, comm=comm)
+
+    # make the bin edges
+    redges = numpy.linspace(1.0, 10, 5)
+
+    r1 = SurveyData2PCF('1d', data1, randoms, redges, cosmo=cosmo)
+
+    tmpdir = comm.bcast(tempfile.mkdtemp() if comm.rank == 0 else None)
+    with set_options(paircount_cache_dir=tmpdir):
+
+        # count R1R2 and save to the cache
+        r2 = SurveyData2PCF('1d', data1, randoms, redges, cosmo=cosmo)
+        assert len(os.listdir(tmpdir)) == 1
+
+        # a different data realization with the same randoms reuses R1R2
+        r3 = SurveyData2PCF('1d', data2, randoms, redges, cosmo=cosmo)
+        assert len(os.listdir(tmpdir)) == 1
+
+        # different binning is a new entry
+        r4 = SurveyData2PCF('1d', data1, randoms, redges[1:], cosmo=cosmo)
+        assert len(os.listdir(tmpdir)) == 2
+
+    assert_allclose(r1.R1R2['npairs'], r2.R1R2['npairs'])
+    assert_allclose(r1.R1R2['npairs'], r3.R1R2['npairs'])
+    assert_allclose(r1.R1R2['npairs'][1:], r4.R1R2['npairs'])
+    assert_allclose(r1.corr['corr'], r2.corr['corr'])
+
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(tmpdir)
+
+@MPITest([1, 4])
+def test_sim_R1R2_split(comm):
+
+    # uniform source of particles
+    data = generate_sim_data(seed=42, comm=comm)
+    randoms = UniformCatalog(nbar=6e-4, BoxSize=512., seed=84, comm=comm)
+
+    # make the bin edges
+    redges = numpy.linspace(0.01, 10.0, 5)
+
+    # R1R2 from two subsets of the randoms
+    r = SimulationBox2PCF('1d', data, redges, periodic=False, randoms1=randoms, R1R2_split=2)
+
+    # the pairs are the sum of the pairs in each subset
+    pairs = []
+    for i in range(2):
+        subset = randoms[randoms['Index'] % 2 == i]
+        pairs.append(SimulationBoxPairCount('1d', subset, redges, periodic=False))
+
+    assert_allclose(r.R1R2['npairs'], pairs[0].pairs['npairs'] + pairs[1].pairs['npairs'])
+    assert_allclose(r.R1R2.attrs['total_wnpairs'], pairs[0].attrs['total_wnpairs'] + pairs[1].attrs['total_wnpairs'])
+
+    # compared to the full R1R2
+    r2 = SimulationBox2PCF('1d', data, redges, periodic=False, randoms1=randoms)
+    assert_allclose(r.corr['corr'], r2.corr['corr'], atol=0.1)
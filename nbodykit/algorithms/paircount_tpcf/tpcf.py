@@ -36,20 +36,24 @@ class BasePairCount2PCF(object):
         the second data catalog to cross-correlate; must have a 'Position' column
     R1R2 : SimulationBoxPairCount, SurveyDataPairCount, optional
         if provided, random pairs R1R2 are not recalculated in the Landy-Szalay estimator
+    R1R2_split : int, 'auto', optional
+        the number of disjoint subsets of the randoms whose pairs are summed
+        to estimate R1R2 in the Landy-Szalay estimator; 'auto' uses subsets
+        about the size of ``data1``
     **kws :
         additional keyword arguments passed to the appropriate pair counting class
     """
 
     def __init__(self, mode, data1, edges,
                     Nmu=None, pimax=None,
-                    randoms1=None, randoms2=None, data2=None, R1R2=None, **kws):
+                    randoms1=None, randoms2=None, data2=None, R1R2=None, R1R2_split=1, **kws):
 
         self.comm = data1.comm
 
         edges = numpy.array(edges)
 
         # store the attributes
-        self.attrs = {'mode':mode, 'edges':edges, 'Nmu':Nmu, 'pimax':pimax}
+        self.attrs = {'mode':mode, 'edges':edges, 'Nmu':Nmu, 'pimax':pimax, 'R1R2_split':R1R2_split}
         self.attrs.update(kws)
 
         # store the catalogs
@@ -72,6 +76,10 @@ class BasePairCount2PCF(object):
         2. If randoms were provided, the Landy-Szalay estimator is used:
            :math:`(D_1 D_2 - D_1 R_2 - D_2 R_1 + R_1 R_2) / R_1 R_2`
 
+        In the second case, the random-random pairs are loaded from
+        the cache if the ``paircount_cache_dir`` option is set and they
+        have been counted before; see :class:`nbodykit.set_options`.
+
         Raises
         ------
         ValueError :
@@ -84,6 +92,7 @@ class BasePairCount2PCF(object):
         # get the config
         attrs = self.attrs.copy()
         config = attrs.pop('config')
+        split = attrs.pop('R1R2_split')
         attrs.update(config)
 
         # whether we are doing sim volume or mock survey
@@ -126,7 +135,7 @@ class BasePairCount2PCF(object):
             # use the Landy-Szalay estimator
             result = LandySzalayEstimator(pair_counter, self.data1, self.data2,
                                             self.randoms1, self.randoms2, R1R2=self.R1R2,
-                                            logger=self.logger, **attrs)
+                                            R1R2_split=split, logger=self.logger, **attrs)
             self.D1D2, self.D1R2, self.D2R1, self.R1R2, self.corr = result
 
     def __getstate__(self):
@@ -239,6 +248,11 @@ class SimulationBox2PCF(BasePairCount2PCF):
         if not provided, analytic randoms will be used
     R1R2 : SimulationBoxPairCount, optional
         if provided, random pairs R1R2 are not recalculated in the Landy-Szalay estimator
+    R1R2_split : int, 'auto', optional
+        if larger than 1, R1R2 is estimated from the pairs within this many
+        disjoint subsets of the randoms, such that its cost is linear,
+        rather than quadratic, in the number of randoms; 'auto' uses
+        subsets about the size of ``data1``
     periodic : bool, optional
         whether to use periodic boundary conditions
     BoxSize : float, 3-vector, optional
@@ -278,7 +292,7 @@ class SimulationBox2PCF(BasePairCount2PCF):
     logger = logging.getLogger('SimulationBox2PCF')
 
     def __init__(self, mode, data1, edges, Nmu=None, pimax=None,
-                    data2=None, randoms1=None, randoms2=None, R1R2=None,
+                    data2=None, randoms1=None, randoms2=None, R1R2=None, R1R2_split=1,
                     periodic=True, BoxSize=None, los='z',
                     weight='Weight', position='Position', show_progress=False, **config):
 
@@ -377,6 +391,11 @@ class SurveyData2PCF(BasePairCount2PCF):
         for both.
     R1R2 : SurveyDataPairCount, optional
         if provided, random pairs R1R2 are not recalculated in the Landy-Szalay estimator
+    R1R2_split : int, 'auto', optional
+        if larger than 1, R1R2 is estimated from the pairs within this many
+        disjoint subsets of the randoms, such that its cost is linear,
+        rather than quadratic, in the number of randoms; 'auto' uses
+        subsets about the size of ``data1``
     ra : str, optional
         the name of the column in the source specifying the
         right ascension coordinates in units of degrees; default is 'RA'
@@ -414,7 +433,7 @@ class SurveyData2PCF(BasePairCount2PCF):
     logger = logging.getLogger('SurveyData2PCF')
 
     def __init__(self, mode, data1, randoms1, edges, cosmo=None,
-                    Nmu=None, pimax=None, data2=None, randoms2=None, R1R2=None,
+                    Nmu=None, pimax=None, data2=None, randoms2=None, R1R2=None, R1R2_split=1,
                     ra='RA', dec='DEC', redshift='Redshift', weight='Weight',
                     show_progress=False, **config):
 
@@ -115,6 +115,48 @@ def test_nonperiodic_cgm(comm):
     assert_array_equal(cgm_gal_type, cgm_gal_type2)
 
 
+@MPITest([1, 4])
+def test_cgm_chain(comm):
+
+    # a chain of objects of decreasing mass along the diagonal of the box,
+    # where each object is only grouped with its neighbors in the chain;
+    # it crosses the domains of the ranks
+    N = 41
+    if comm.rank == 0:
+        pos = 10. + 6. * numpy.arange(N)[:, None] * numpy.ones(3) / 3**0.5
+        mass = 100. - numpy.arange(N)
+    else:
+        pos = numpy.zeros((0, 3))
+        mass = numpy.zeros(0)
+    source = ArrayCatalog({'Position':pos, 'Mass':mass}, BoxSize=256., comm=comm)
+
+    rperp = 6.0
+    rpar = 5.0
+    r = CylindricalGroups(source, rankby='Mass', rperp=rperp, rpar=rpar, periodic=False, flat_sky_los=[0,0,1])
+
+    cgm_type = numpy.concatenate(comm.allgather(r.groups['cgm_type']), axis=0)
+    cen_id = numpy.concatenate(comm.allgather(r.groups['cgm_haloid']), axis=0)
+    N_cgm = numpy.concatenate(comm.allgather(r.groups['num_cgm_sats']), axis=0)
+
+    # the satellite of a central is not a central, so the next object is:
+    # the objects alternate between centrals and their satellites
+    index = numpy.arange(N)
+    assert_array_equal(cgm_type, index % 2)
+    assert_array_equal(cen_id, index // 2)
+    num_sats = 1 - index % 2
+    num_sats[-1] = 0 # the last central has no satellite
+    assert_array_equal(N_cgm, num_sats)
+
+    # compare to the direct results
+    pos = numpy.concatenate(comm.allgather(pos), axis=0)
+    mass = numpy.concatenate(comm.allgather(mass), axis=0)
+    N_cgm2, cgm_type2, cen_id2 = direct_cgm(pos, mass, numpy.zeros(N), rperp, rpar, periodic=False)
+
+    assert_array_equal(N_cgm, N_cgm2)
+    assert_array_equal(cen_id, cen_id2)
+    assert_array_equal(cgm_type, cgm_type2)
+
+
 def direct_cgm(pos, mass, gal_type, rperp, rpar, periodic=False, BoxSize=None):
     """
     Given the position of particles, and the mass and galaxy type data
@@ -1,6 +1,6 @@
 from runtests.mpi import MPITest
 from nbodykit.lab import *
-from nbodykit import setup_logging
+from nbodykit import setup_logging, set_options
 from numpy.testing import assert_array_equal, assert_allclose
 import pytest
 
@@ -57,6 +57,35 @@ def test_fftpower_poles(comm):
     assert_array_equal(modes_1d, r.poles['modes'])
     assert_allclose(mono_from_pkmu, mono)
 
+@MPITest([1, 4])
+def test_fftpower_binning_reuse(comm):
+    from nbodykit.algorithms.fftpower import _projection_binning_cache
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+
+    r1 = FFTPower(source, mode='2d', Nmesh=32, poles=[0,2,4])
+    binnings = list(_projection_binning_cache.values())
+
+    # a second mesh with the same geometry reuses the binning of the modes
+    r2 = FFTPower(source, mode='2d', Nmesh=32, poles=[0,2,4])
+    assert list(_projection_binning_cache.values())[-1] is binnings[-1]
+
+    assert_array_equal(r1.power['modes'], r2.power['modes'])
+    assert_allclose(r1.power['power'], r2.power['power'])
+    assert_allclose(r1.poles['power_2'], r2.poles['power_2'])
+
+    # at the default size, the cache holds the binning of Nmesh=512 on one rank
+    from nbodykit import _global_options
+    from nbodykit.utils import parse_bytes
+    per_mode = binnings[-1].nbytes / float(binnings[-1].size)
+    assert per_mode * 512**2 * 257 <= parse_bytes(_global_options['binning_cache_size'])
+
+    # the binnings are not kept beyond the size of the cache
+    with set_options(binning_cache_size=0):
+        r3 = FFTPower(source, mode='2d', Nmesh=32, poles=[0,2,4])
+        assert len(_projection_binning_cache) == 0
+    assert_allclose(r1.power['power'], r3.power['power'])
+
 @MPITest([1])
 def test_fftpower_unique(comm):
 
@@ -1,6 +1,6 @@
 from runtests.mpi import MPITest
 from nbodykit.lab import *
-from nbodykit import setup_logging
+from nbodykit import setup_logging, set_options
 from numpy.testing import assert_array_equal, assert_allclose
 import pytest
 
@@ -30,3 +30,20 @@ def test_fftrecon(comm):
     # reconstruction shouldn't have matter much on large scale.
     assert_allclose(r1.power['power'][:5], r2.power['power'][:5], rtol=0.05)
 
+
+@MPITest([1, 4])
+def test_fftrecon_chunks(comm):
+    # about 4000 objects each, read out in several chunks below
+    data = UniformCatalog(nbar=3e-5, BoxSize=512., seed=42, comm=comm)
+    ran = UniformCatalog(nbar=3e-5, BoxSize=512., seed=84, comm=comm)
+
+    for scheme in ['LGS', 'LRR', 'LF2']:
+        mesh = FFTRecon(data=data, ran=ran, bias=2, f=0.5, Nmesh=32, R=20, scheme=scheme)
+
+        with set_options(paint_chunk_size=500):
+            r1 = mesh.to_real_field()
+        with set_options(paint_chunk_size=1024 * 1024 * 8):
+            r2 = mesh.to_real_field()
+
+        # streaming the displacements in chunks only reorders the sums
+        assert_allclose(r1.value, r2.value, rtol=1e-4, atol=1e-4)
@@ -2,6 +2,7 @@ from runtests.mpi import MPITest
 from nbodykit.lab import *
 from nbodykit import setup_logging
 from nbodykit.utils import ScatterArray, GatherArray
+from numpy.testing import assert_array_equal
 
 # debug logging
 setup_logging("debug")
@@ -49,3 +50,50 @@ def test_fibercolls(comm):
         ncolls_per = (dists[idx] <= rad).sum(axis=-1)
         assert (ncolls_per >= 1).all(), "objects in 'collided' sample that do not collide with any objects!"
 
+
+@MPITest([1, 4])
+def test_fibercolls_known_groups(comm):
+
+    # offsets in degrees, on the equator; the collision radius is 62 arcsec
+    # a pair, a chain of three, a triangle and an isolated object
+    ra = numpy.array([10., 10.010,
+                      20., 20.012, 20.022,
+                      40., 40.008, 40.004,
+                      60.])
+    dec = numpy.array([0., 0.,
+                       0., 0., 0.,
+                       0., 0., 0.006,
+                       0.])
+
+    if comm.rank != 0:
+        ra = None
+        dec = None
+    ra = ScatterArray(ra, comm)
+    dec = ScatterArray(dec, comm)
+
+    r = FiberCollisions(ra, dec, degrees=True, seed=42, comm=comm)
+
+    collided = GatherArray(r.labels['Collided'].compute(), comm, root=0)
+    neighbors = GatherArray(r.labels['NeighborID'].compute(), comm, root=0)
+
+    if comm.rank == 0:
+
+        # the pair: one is collided, with the other as neighbor
+        assert collided[:2].sum() == 1
+        i = numpy.flatnonzero(collided[:2])[0]
+        assert neighbors[i] == 1 - i
+        assert neighbors[1 - i] == -1
+
+        # the chain: the middle object is collided, the nearest is the last
+        assert_array_equal(collided[2:5], [0, 1, 0])
+        assert_array_equal(neighbors[2:5], [-1, 4, -1])
+
+        # the triangle: two are collided, with the remaining one as neighbor
+        assert collided[5:8].sum() == 2
+        clean = 5 + numpy.flatnonzero(collided[5:8] == 0)[0]
+        assert neighbors[clean] == -1
+        assert (neighbors[5:8][collided[5:8] == 1] == clean).all()
+
+        # the isolated object
+        assert collided[8] == 0
+        assert neighbors[8] == -1
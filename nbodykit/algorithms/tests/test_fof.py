@@ -1,12 +1,21 @@
 from runtests.mpi import MPITest
 from nbodykit.lab import *
 from nbodykit import setup_logging
+import pytest
 
-from numpy.testing import assert_allclose
+from numpy.testing import assert_allclose, assert_array_equal
 
 # debug logging
 setup_logging("debug")
 
+def lognormal_source(comm):
+    """
+    The lognormal particles of the FOF tests.
+    """
+    cosmo = cosmology.Planck15
+    Plin = cosmology.LinearPower(cosmo, redshift=0.55, transfer='EisensteinHu')
+    return LogNormalCatalog(Plin=Plin, nbar=3e-3, BoxSize=128., Nmesh=32, seed=42, comm=comm)
+
 @MPITest([1, 4])
 def test_fof(comm):
     cosmo = cosmology.Planck15
@@ -82,3 +91,138 @@ def test_fof_nonperiodic(comm):
     assert_allclose(peaks1['CMVelocity'], peaks2['CMVelocity'], rtol=1e-6)
     assert_allclose(peaks1['PeakPosition'] + 200.0, peaks2['PeakPosition'], rtol=1e-6)
     assert_allclose(peaks1['PeakVelocity'], peaks2['PeakVelocity'], rtol=1e-6)
+
+@MPITest([1, 4])
+def test_fof_catalog_length(comm):
+    source = lognormal_source(comm)
+
+    fof = FOF(source, linking_length=0.2, nmin=20)
+    halos = fof.find_features()
+
+    # the halos are distributed in the order of labels
+    labels = numpy.concatenate(comm.allgather(fof.labels), axis=0)
+    N = numpy.bincount(labels)
+    N[0] = 0
+    assert_array_equal(numpy.concatenate(comm.allgather(halos['Length'].compute())), N)
+    assert halos.size == len(N) // comm.size + (comm.rank < len(N) % comm.size)
+
+@MPITest([1, 4])
+def test_fof_labels_size_ordered(comm):
+    source = lognormal_source(comm)
+
+    fof = FOF(source, linking_length=0.2, nmin=20)
+
+    # dense labels, ordered by decreasing size; small halos are in 0
+    labels = numpy.concatenate(comm.allgather(fof.labels), axis=0)
+    N = numpy.bincount(labels)
+    assert (N[1:] > 20).all()
+    assert (numpy.diff(N[1:]) <= 0).all()
+
+@MPITest([1, 4])
+def test_fof_labels_equal_size(comm):
+    # 60 clumps of 25 particles, on a grid of spacing 10, in a random order;
+    # the particles of each clump are consecutive in the catalog
+    rng = numpy.random.RandomState(42)
+    grid = numpy.indices((4, 4, 4)).reshape(3, -1).T[rng.permutation(64)[:60]]
+    pos = (10. * grid + 5.)[:, None, :] + rng.uniform(-0.5, 0.5, size=(60, 25, 3))
+    pos = pos.reshape(-1, 3)
+    N = len(pos)
+    pos = pos[comm.rank * N // comm.size: (comm.rank + 1) * N // comm.size]
+
+    cat = ArrayCatalog({'Position': pos}, BoxSize=40., comm=comm)
+    fof = FOF(cat, linking_length=2.0, nmin=20, absolute=True)
+
+    # halos of the same size are labeled in the order of their
+    # first particle, independent of the number of ranks
+    labels = numpy.concatenate(comm.allgather(fof.labels), axis=0)
+    assert_array_equal(labels, numpy.repeat(numpy.arange(1, 61), 25))
+
+@MPITest([1, 4])
+def test_fof_spherical_overdensity(comm):
+    cosmo = cosmology.Planck15
+    source = lognormal_source(comm)
+
+    fof = FOF(source, linking_length=0.2, nmin=20, keep_decomposition=True)
+    halos = fof.find_features()
+    so = fof.spherical_overdensity(halos, 1e12, cosmo, 0.55, mdef='200c')
+
+    # the SO mass is at most the FOF mass
+    assert so.size == halos.size
+    M = so['M200c'].compute()
+    assert (M <= 1e12 * halos['Length'].compute() * (1 + 1e-6)).all()
+    assert (M >= 0).all()
+
+@MPITest([1, 4])
+def test_fof_spherical_overdensity_isothermal(comm):
+    from halotools.empirical_models import density_threshold
+
+    cosmo = cosmology.Planck15
+
+    # an isothermal sphere, with M(<r) proportional to r; the particle mass
+    # puts the mean density at the threshold at half the outer radius
+    N, Rout, BoxSize = 20000, 4., 32.
+    rng = numpy.random.RandomState(42)
+    r = rng.uniform(0, Rout, size=N)
+    mu = rng.uniform(-1, 1, size=N)
+    phi = rng.uniform(0, 2 * numpy.pi, size=N)
+    sin = (1 - mu**2) ** 0.5
+    pos = r[:, None] * numpy.array([sin * numpy.cos(phi), sin * numpy.sin(phi), mu]).T + BoxSize / 2
+    pos = pos[comm.rank * N // comm.size: (comm.rank + 1) * N // comm.size]
+
+    rho = density_threshold(cosmology=cosmo.to_astropy(), redshift=0., mdef='200c')
+    particle_mass = numpy.pi * Rout**3 * rho / (3 * N)
+
+    cat = ArrayCatalog({'Position': pos, 'Velocity': numpy.zeros_like(pos)}, BoxSize=[BoxSize] * 3, comm=comm)
+    fof = FOF(cat, linking_length=1.0, nmin=20, absolute=True, keep_decomposition=True)
+    halos = fof.find_features()
+    so = fof.spherical_overdensity(halos, particle_mass, cosmo, 0., mdef='200c')
+
+    M = numpy.concatenate(comm.allgather(so['M200c'].compute()))
+    R = numpy.concatenate(comm.allgather(so['R200c'].compute()))
+    assert_allclose(M[1], 0.5 * N * particle_mass, rtol=0.03)
+    assert_allclose(R[1], 0.5 * Rout, rtol=0.03)
+
+@MPITest([1, 4])
+def test_fof_subhalos(comm):
+    source = lognormal_source(comm)
+
+    fof = FOF(source, linking_length=0.2, nmin=20, keep_decomposition=True)
+    sub = fof.find_subhalos()
+    assert len(sub) == len(fof.labels)
+
+    # the decomposition is released
+    fof.release_decomposition()
+    with pytest.raises(ValueError):
+        fof.find_subhalos()
+
+    # subhalos are within halos, and ordered by size
+    labels = numpy.concatenate(comm.allgather(fof.labels), axis=0)
+    sub = numpy.concatenate(comm.allgather(sub), axis=0)
+    assert (labels[sub > 0] > 0).all()
+    N = numpy.bincount(sub)
+    assert (N[1:] > 20).all()
+    assert (numpy.diff(N[1:]) <= 0).all()
+    for s in range(1, len(N)):
+        assert len(numpy.unique(labels[sub == s])) == 1
+
+@MPITest([1, 4])
+def test_fof_subhalos_nonperiodic(comm):
+    source = lognormal_source(comm)
+    del source.attrs['BoxSize']
+
+    # the particles at the upper edge of the domain are in no primary region
+    subs = []
+    for shift in [-100., 200.]:
+        source['Position'] += shift
+        fof = FOF(source, linking_length=0.2, nmin=20, periodic=False, absolute=True,
+                  keep_decomposition=True)
+        sub = fof.find_subhalos()
+
+        labels = numpy.concatenate(comm.allgather(fof.labels), axis=0)
+        sub = numpy.concatenate(comm.allgather(sub), axis=0)
+        assert (labels[sub > 0] > 0).all()
+        N = numpy.bincount(sub)
+        assert (N[1:] > 20).all()
+        subs.append(sub)
+
+    assert_array_equal(subs[0], subs[1])
@@ -32,23 +32,24 @@ class Base3PCF(object):
             self.attrs['BoxSize'] = BoxSize
             self.attrs['periodic'] = periodic
 
-    def _run(self, pos, w, pos_sec, w_sec, boxsize=None, bunchsize=10000):
+    def _run(self, pos, w, pos_sec, w_sec, boxsize=None, bunchsize=10000,
+                blocksize=1024, pedantic=False):
         """
         Internal function to run the 3PCF algorithm on the input data and
         weights.
 
         The input data/weights have already been domain-decomposed, and
         the loads should be balanced on all ranks.
-        """
-        # maximum radius
-        rmax = numpy.max(self.attrs['edges'])
 
+        By default, the primaries are processed in spatially compact blocks
+        of at most ``blocksize`` objects; if ``pedantic`` is ``True``, the
+        primaries are processed one at a time, which is much slower but
+        useful for validation.
+        """
         # the array to hold output values
         nbins  = len(self.attrs['edges'])-1
         Nell   = len(self.attrs['poles'])
         zeta = numpy.zeros((Nell,nbins,nbins), dtype='f8')
-        alms = {}
-        walms = {}
 
         # compute the Ylm expressions we need
         if self.comm.rank == 0:
@@ -60,6 +61,43 @@ class Base3PCF(object):
         # make the KD-tree holding the secondaries
         tree_sec = kdcount.KDTree(pos_sec, boxsize=boxsize).root
 
+        if pedantic:
+            self._run_single(zeta, Ylm_cache, tree_sec, pos, w, pos_sec, w_sec, boxsize, bunchsize)
+        else:
+            self._run_batched(zeta, Ylm_cache, tree_sec, pos, w, pos_sec, w_sec, boxsize, bunchsize, blocksize)
+
+        # sum across all ranks
+        zeta = self.comm.allreduce(zeta)
+
+        # normalize according to Eq. 15 of Slepian et al. 2015
+        # differs by factor of (4 pi)^2 / (2l+1) from the C++ code
+        zeta /= (4*numpy.pi)
+
+        # make a BinnedStatistic
+        dtype = numpy.dtype([('corr_%d' % ell, zeta.dtype) for ell in self.attrs['poles']])
+        data = numpy.empty(zeta.shape[-2:], dtype=dtype)
+        for i, ell in enumerate(self.attrs['poles']):
+            data['corr_%d' % ell] = zeta[i]
+
+        # save the result
+        edges = self.attrs['edges']
+        poles = BinnedStatistic(['r1', 'r2'], [edges, edges], data)
+        return poles
+
+    def _run_single(self, zeta, Ylm_cache, tree_sec, pos, w, pos_sec, w_sec, boxsize, bunchsize):
+        """
+        Accumulate the multipoles into ``zeta``, one primary at a time.
+
+        This builds a KD-tree for each single primary and is only intended
+        for validating :func:`_run_batched`.
+        """
+        # maximum radius
+        rmax = numpy.max(self.attrs['edges'])
+        nbins  = len(self.attrs['edges'])-1
+
+        alms = {}
+        walms = {}
+
         def callback(r, i, j, iprim=None):
 
             # remove self pairs
@@ -106,7 +144,7 @@ class Base3PCF(object):
         # determine rank with largest load
         loads = self.comm.allgather(len(pos))
         largest_load = numpy.argmax(loads)
-        chunk_size = max(loads) // 10
+        chunk_size = max(max(loads) // 10, 1)
 
         # compute multipoles for each primary (s vector in the paper)
         for iprim in range(len(pos)):
@@ -131,23 +169,99 @@ class Base3PCF(object):
                 if m != 0: alm_w_alm += alm_w_alm.T # add in the -m contribution for m != 0
                 zeta[Ylm_cache.ell_to_iell[l], ...] += alm_w_alm.real
 
-        # sum across all ranks
-        zeta = self.comm.allreduce(zeta)
+    def _run_batched(self, zeta, Ylm_cache, tree_sec, pos, w, pos_sec, w_sec, boxsize, bunchsize, blocksize):
+        """
+        Accumulate the multipoles into ``zeta``, for blocks of primaries
+        at once.
+
+        A single KD-tree is built over all primaries; its nodes are split
+        into spatially compact blocks of at most ``blocksize`` primaries.
+        The neighbours of all primaries in a block are enumerated in one
+        dual-tree walk, the :math:`a_{\ell m}` of each primary are
+        accumulated into ``(Nblock, nbins)`` arrays, and their outer
+        products are summed with a single matrix product per block.
+        """
+        # maximum radius
+        rmax = numpy.max(self.attrs['edges'])
+        nbins  = len(self.attrs['edges'])-1
 
-        # normalize according to Eq. 15 of Slepian et al. 2015
-        # differs by factor of (4 pi)^2 / (2l+1) from the C++ code
-        zeta /= (4*numpy.pi)
+        # a single tree over all primaries; blocks are its subtrees
+        if len(pos) > 0:
+            tree_prim = kdcount.KDTree(pos, boxsize=boxsize)
+            blocks = list(_split_tree(tree_prim.root, blocksize))
+        else:
+            blocks = []
 
-        # make a BinnedStatistic
-        dtype = numpy.dtype([('corr_%d' % ell, zeta.dtype) for ell in self.attrs['poles']])
-        data = numpy.empty(zeta.shape[-2:], dtype=dtype)
-        for i, ell in enumerate(self.attrs['poles']):
-            data['corr_%d' % ell] = zeta[i]
+        # the position of each primary in the ordering of the tree
+        order = numpy.empty(len(pos), dtype='intp')
+        if len(pos) > 0:
+            order[tree_prim.ind] = numpy.arange(len(pos))
 
-        # save the result
-        edges = self.attrs['edges']
-        poles = BinnedStatistic(['r1', 'r2'], [edges, edges], data)
-        return poles
+        alms = {}
+
+        def callback(r, i, j, start=None, Nblock=None):
+
+            # remove self pairs
+            valid = r > 0.
+            r = r[valid]; i = i[valid]; j = j[valid]
+
+            # normalized, re-centered position array (periodic)
+            dpos = (pos_sec[i] - pos[j])
+
+            # enforce periodicity in dpos
+            if boxsize is not None:
+                for axis, col in enumerate(dpos.T):
+                    col[col > boxsize[axis]*0.5] -= boxsize[axis]
+                    col[col <= -boxsize[axis]*0.5] += boxsize[axis]
+            recen_pos = dpos / r[:,numpy.newaxis]
+
+            # find the mapping of r to rbins; keep only r in (edges[0], edges[-1]]
+            dig = numpy.searchsorted(self.attrs['edges'], r, side='left')
+            inbin = (dig > 0) & (dig <= nbins)
+
+            # the index of (primary in block, radial bin)
+            index = (order[j] - start) * nbins + dig - 1
+            index = index[inbin]
+
+            # evaluate all Ylms
+            Ylms = Ylm_cache(recen_pos[:,0]+1j*recen_pos[:,1], recen_pos[:,2])
+
+            # loop over each (l,m) pair
+            for (l,m) in Ylms:
+
+                # the Ylm evaluated at galaxy positions
+                weights = (Ylms[(l,m)] * w_sec[i])[inbin]
+
+                # sum over for each primary and radial bin
+                alm = alms.setdefault((l, m), numpy.zeros((Nblock, nbins), dtype='c16'))
+                alm.real.flat += numpy.bincount(index, weights=weights.real, minlength=alm.size)
+                if m != 0:
+                    alm.imag.flat += numpy.bincount(index, weights=weights.imag, minlength=alm.size)
+
+        # determine rank with largest load
+        loads = self.comm.allgather(len(blocks))
+        largest_load = numpy.argmax(loads)
+        chunk_size = max(max(loads) // 10, 1)
+
+        for iblock, block in enumerate(blocks):
+            # alms must be clean for each primary particle; (s) in eq 15 and 8 of arXiv:1506.02040v2
+            alms.clear()
+            tree_sec.enum(block, rmax, process=callback, start=block.start,
+                            Nblock=block.size, bunch=bunchsize)
+
+            if self.comm.rank == largest_load and iblock % chunk_size == 0:
+                self.logger.info("%d%% done" % (10*iblock//chunk_size))
+
+            # sqrt of primary weights, in the ordering of the block
+            w0 = w[tree_prim.ind[block.start:block.start + block.size]]
+
+            # combine alms into zeta(s), summing over the primaries
+            # in the block: sum_p (w_p a_lm,p) outer conj(a_lm,p)
+            for (l, m) in alms:
+                alm = alms[(l, m)]
+                alm_w_alm = numpy.dot((w0[:, None] * alm).T, alm.conj())
+                if m != 0: alm_w_alm += alm_w_alm.T # add in the -m contribution for m != 0
+                zeta[Ylm_cache.ell_to_iell[l], ...] += alm_w_alm.real
 
     def __getstate__(self):
         return {'poles':self.poles.data, 'attrs':self.attrs}
@@ -224,6 +338,12 @@ class SimulationBox3PCF(Base3PCF):
         between objects
     weight : str, optional
         the name of the column in the source specifying the particle weights
+    position : str, optional
+        the name of the column in the source specifying the particle positions
+    domain_factor : int, optional
+        the integer value by which to oversubscribe the domain decomposition
+        mesh before balancing loads; values larger than 1 can improve the
+        balance of the work for clustered objects
 
     References
     ----------
@@ -231,7 +351,8 @@ class SimulationBox3PCF(Base3PCF):
     """
     logger = logging.getLogger("SimulationBox3PCF")
 
-    def __init__(self, source, poles, edges, BoxSize=None, periodic=True, weight='Weight', position='Position'):
+    def __init__(self, source, poles, edges, BoxSize=None, periodic=True, weight='Weight', position='Position',
+                    domain_factor=1):
 
         # initialize the base class
         required_cols = [position, weight]
@@ -241,6 +362,7 @@ class SimulationBox3PCF(Base3PCF):
         # save the weight column
         self.attrs['weight'] = weight
         self.attrs['position'] = position
+        self.attrs['domain_factor'] = domain_factor
 
         # check largest possible separation
         if periodic:
@@ -279,11 +401,12 @@ class SimulationBox3PCF(Base3PCF):
         # domain decompose the data
         smoothing = numpy.max(self.attrs['edges'])
         (pos, w), (pos_sec, w_sec) = decompose_box_data(self.source, None, self.attrs,
-                                                        self.logger, smoothing)
+                                                        self.logger, smoothing,
+                                                        domain_factor=self.attrs['domain_factor'])
 
         # run the algorithm
         if pedantic:
-            return self._run(pos, w, pos_sec, w_sec, boxsize=boxsize, bunchsize=1)
+            return self._run(pos, w, pos_sec, w_sec, boxsize=boxsize, bunchsize=1, pedantic=True)
         else:
             return self._run(pos, w, pos_sec, w_sec, boxsize=boxsize)
 
@@ -390,6 +513,24 @@ class SurveyData3PCF(Base3PCF):
         return self._run(pos, w, pos_sec, w_sec)
 
 
+def _split_tree(node, blocksize):
+    """
+    Split a KD-tree node into the nodes of its subtrees, each with at
+    most ``blocksize`` objects (or a leaf).
+
+    The objects of a node are ``tree.ind[node.start:node.start+node.size]``,
+    so the nodes are spatially compact blocks of the input.
+    """
+    stack = [node]
+    while len(stack):
+        node = stack.pop()
+        if node.size <= blocksize or node.less is None:
+            if node.size > 0:
+                yield node
+        else:
+            stack.append(node.greater)
+            stack.append(node.less)
+
 class YlmCache(object):
     """
     A class to compute spherical harmonics :math:`Y_{lm}` up
@@ -401,9 +542,7 @@ class YlmCache(object):
     """
     def __init__(self, ells, comm):
 
-        import sympy as sp
-        from sympy.utilities.lambdify import implemented_function
-        from sympy.parsing.sympy_parser import parse_expr
+        from nbodykit.ylm import get_complex_Ylm
 
         self.ells = numpy.asarray(ells).astype(int)
         self.max_ell = max(self.ells)
@@ -413,45 +552,11 @@ class YlmCache(object):
         for iell, ell in enumerate(self.ells):
             self.ell_to_iell[ell] = iell
 
-        lms = [(l,m) for l in ells for m in range(0, l+1)]
-
-        # compute the Ylm string expressions in parallel
-        exprs = []
-        for i in range(comm.rank, len(lms), comm.size):
-            lm = lms[i]
-            exprs.append((lm, str(self._get_Ylm(*lm))))
-        exprs = [x for sublist in comm.allgather(exprs) for x in sublist]
-
-        # determine the powers entering into each expression
-        args = {}
-        for lm, expr in exprs:
-            matches = []
-            for var in ['xpyhat', 'zhat']:
-                for e in range(2, max(ells)+1):
-                    name = var + '**' + str(e)
-                    if name in expr:
-                        matches.append((name, 'cached_'+var, str(e)))
-                args[lm] = matches
-
-
-        # define a function to return cached power
-        def from_cache(name, pow):
-            return self._cache[str(name)+str(pow)]
-        f = implemented_function(sp.Function('from_cache'), from_cache)
-
-        # arguments to the sympy functions
-        zhat   = sp.Symbol('zhat', real=True, positive=True)
-        xpyhat = sp.Symbol('xpyhat', complex=True)
-
-        self._cache = {}
-
-        # make the Ylm functions
+        # the Ylm kernels, from the process-wide registry
         self._Ylms = OrderedDict()
-        for lm, expr in exprs:
-            expr = parse_expr(expr, local_dict={'zhat':zhat, 'xpyhat':xpyhat})
-            for var in args[lm]:
-                expr = expr.replace(var[0], 'from_cache(%s, %s)' %var[1:])
-            self._Ylms[lm] = sp.lambdify((xpyhat, zhat), expr)
+        for l in self.ells:
+            for m in range(0, l+1):
+                self._Ylms[(l,m)] = get_complex_Ylm(l, m)
 
     def __call__(self, xpyhat, zhat):
         """
@@ -466,68 +571,14 @@ class YlmCache(object):
         zhat : array_like
             the third cartesian unit vector
         """
-        # fill the cache first
-        self._cache['cached_xpyhat2'] = xpyhat**2
-        self._cache['cached_zhat2'] = zhat**2
-        for name,x in zip(['cached_xpyhat', 'cached_zhat'], [xpyhat, zhat]):
-            for i in range(3, self.max_ell+1):
-                self._cache[name+str(i)] = self._cache[name+str(i-1)]*x
+        from nbodykit.ylm import power_table
+
+        # the powers of the unit vectors, shared by all of the harmonics
+        xpyhat_table = power_table(xpyhat, self.max_ell)
+        zhat_table = power_table(zhat, self.max_ell)
 
         # return a dictionary for each (l,m) tuple
         toret = {}
         for lm in self._Ylms:
-            toret[lm] = self._Ylms[lm](xpyhat, zhat)
+            toret[lm] = self._Ylms[lm].evaluate(xpyhat_table, zhat_table)
         return toret
-
-    def _get_Ylm(self, l, m):
-        """
-        Compute an expression for spherical harmonic of order (l,m)
-        in terms of Cartesian unit vectors, :math:`\hat{z}`
-        and :math:`\hat{x} + i \hat{y}`
-
-        Parameters
-        ----------
-        l : int
-            the degree of the harmonic
-        m : int
-            the order of the harmonic; |m| < l
-
-        Returns
-        -------
-        expr :
-            a sympy expression that corresponds to the
-            requested Ylm
-
-        References
-        ----------
-        https://en.wikipedia.org/wiki/Spherical_harmonics
-        """
-        import sympy as sp
-
-        # the relevant cartesian and spherical symbols
-        x, y, z, r = sp.symbols('x y z r', real=True, positive=True)
-        xhat, yhat, zhat = sp.symbols('xhat yhat zhat', real=True, positive=True)
-        xpyhat = sp.Symbol('xpyhat', complex=True)
-        phi, theta = sp.symbols('phi theta')
-        defs = [(sp.sin(phi), y/sp.sqrt(x**2+y**2)),
-                (sp.cos(phi), x/sp.sqrt(x**2+y**2)),
-                (sp.cos(theta), z/sp.sqrt(x**2 + y**2 + z**2))
-                ]
-
-        # the cos(theta) dependence encoded by the associated Legendre poly
-        expr = sp.assoc_legendre(l, m, sp.cos(theta))
-
-        # the exp(i*m*phi) dependence
-        expr *= sp.expand_trig(sp.cos(m*phi)) + sp.I*sp.expand_trig(sp.sin(m*phi))
-
-        # simplifying optimizations
-        expr = sp.together(expr.subs(defs)).subs(x**2 + y**2 + z**2, r**2)
-        expr = expr.expand().subs([(x/r, xhat), (y/r, yhat), (z/r, zhat)])
-        expr = expr.factor().factor(extension=[sp.I]).subs(xhat+sp.I*yhat, xpyhat)
-        expr = expr.subs(xhat**2 + yhat**2, 1-zhat**2).factor()
-
-        # and finally add the normalization
-        amp = sp.sqrt((2*l+1) / (4*numpy.pi) * sp.factorial(l-m) / sp.factorial(l+m))
-        expr *= amp
-
-        return expr
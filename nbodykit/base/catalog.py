@@ -527,6 +527,28 @@ class CatalogSourceBase(object):
         else:
             raise ValueError("no such hard-coded column %s" %col)
 
+    def _column_token(self, array):
+        """
+        A token identifying the values of ``array``, a column of this
+        catalog, which does not depend on the number of ranks.
+
+        This is a hash of the values, see :func:`~nbodykit.utils.HashArray`;
+        subclasses may identify their columns without computing them.
+        This is a collective operation.
+
+        .. note::
+            If the :attr:`base` attribute is set, ``_column_token()``
+            will called using :attr:`base` instead of ``self``.
+        """
+        from nbodykit.utils import HashArray
+
+        if self.base is not None: return self.base._column_token(array)
+
+        if array is None:
+            return None
+
+        return (HashArray(array, self.comm), str(array.dtype), array.shape[1:])
+
     def compute(self, *args, **kwargs):
         """
         Our version of :func:`dask.compute` that computes
@@ -1112,9 +1134,11 @@ class CatalogSource(CatalogSourceBase):
         ----------
         keys : list, tuple
             the names of columns to sort by. If multiple columns are provided,
-            the data is sorted consecutively in the order provided
+            the data is sorted by the first column, with ties broken by the
+            following columns in the order provided; remaining ties keep
+            the original order
         reverse : bool, optional
-            if ``True``, perform descending sort operations
+            if ``True``, sort in descending order by all keys
         usecols : list, optional
             the name of the columns to include in the returned CatalogSource
         """
@@ -1220,6 +1244,11 @@ def _sort_data(comm, cat, rankby, reverse=False, usecols=None):
     """
     Sort the input data by the specified columns
 
+    All columns are computed at once. The sort keys are packed into
+    a single composite key; only the key is sorted globally, with
+    :func:`~nbodykit.utils.SortPermutation`, and the data columns are
+    then moved to the sorted positions with one exchange.
+
     Parameters
     ----------
     comm :
@@ -1233,55 +1262,46 @@ def _sort_data(comm, cat, rankby, reverse=False, usecols=None):
     usecols : list, optional
         only sort these data columns
     """
-    import mpsort
+    from nbodykit.utils import SortPermutation, PermuteArray, _radix_key
 
     # determine which columns we need
     if usecols is None:
         usecols = cat.columns
 
-    # remove duplicates from usecols
-    usecols = list(set(usecols))
+    # remove duplicates from usecols; the order must be the same on all
+    # ranks, as the rows are exchanged as bytes
+    usecols = sorted(set(usecols))
+
+    # the columns we need in the sort steps, in one compute
+    columns = sorted(set(rankby)|set(usecols))
+    arrays = cat.compute(*[cat[col] for col in columns])
+    if len(columns) == 1: arrays = [arrays]
+    arrays = dict(zip(columns, arrays))
+
+    # the composite key; later words are more significant
+    key = numpy.empty((cat.size, len(rankby)), dtype='u8')
+    for i, col in enumerate(rankby):
+        try:
+            if arrays[col].ndim != 1: raise TypeError
+            key[:, -1-i] = _radix_key(arrays[col], reverse=reverse)
+        except TypeError:
+            args = (col, str(arrays[col].dtype))
+            raise ValueError("cannot sort by column '%s' with dtype '%s'; must be integer or floating type" %args)
 
-    # the columns we need in the sort steps
-    columns = list(set(rankby)|set(usecols))
+    # the single global sort, of the keys only
+    dest = SortPermutation(key, comm)
+    del key
 
     # make the data to sort
-    dtype = [('_sortkey', 'i8')]
-    for col in cat:
-        if col in columns:
-            dt = (cat[col].dtype.char,)
-            dt += cat[col].shape[1:]
-            if len(dt) == 1: dt = dt[0]
-            dtype.append((col, dt))
+    dtype = []
+    for col in usecols:
+        dtype.append((col, arrays[col].dtype, arrays[col].shape[1:]))
     dtype = numpy.dtype(dtype)
 
     data = numpy.empty(cat.size, dtype=dtype)
-    for col in columns:
-        data[col] = cat[col]
-
-    # sort the particles by the specified columns and store the
-    # corrected sorted index
-    for col in reversed(rankby):
-        dt = data.dtype[col]
-        rankby_name = col
-
-        # make an integer key for floating columns
-        # this assumes the lexial order of float as integer is consistant.
-        if issubclass(dt.type, numpy.float32):
-            data['_sortkey'] = numpy.frombuffer(data[col].tobytes(), dtype='i4')
-            if reverse:
-                data['_sortkey'] *= -1
-            rankby_name = '_sortkey'
-        elif issubclass(dt.type, numpy.float64):
-            data['_sortkey'] = numpy.frombuffer(data[col].tobytes(), dtype='i8')
-            if reverse:
-                data['_sortkey'] *= -1
-            rankby_name = '_sortkey'
-        elif not issubclass(dt.type, numpy.integer):
-            args = (col, str(dt))
-            raise ValueError("cannot sort by column '%s' with dtype '%s'; must be integer or floating type" %args)
-
-        # do the parallel sort
-        mpsort.sort(data, orderby=rankby_name, comm=comm)
+    for col in usecols:
+        data[col] = arrays[col]
+    del arrays
 
-    return data[usecols]
+    # move the data to the sorted positions
+    return PermuteArray(data, dest, comm)
@@ -468,3 +468,26 @@ def test_sort(comm):
 
     arr = numpy.concatenate(comm.allgather(s['ranks'].compute()))
     assert (numpy.diff(arr) > 0).all()
+
+@MPITest([1, 4])
+def test_sort_multikey(comm):
+    # the CatalogSource
+    source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+
+    source['key1'] = (source.Index % 7).astype('i4') - 3
+    source['key2'] = source['Position'][:, 0] - 256.
+    s = source.sort(['key1', 'key2'], usecols=['key1', 'key2', 'Position'])
+    r = source.sort(['key1', 'key2'], reverse=True, usecols=['key1', 'key2'])
+
+    key1 = numpy.concatenate(comm.allgather(source['key1'].compute()))
+    key2 = numpy.concatenate(comm.allgather(source['key2'].compute()))
+    pos = numpy.concatenate(comm.allgather(source['Position'].compute()))
+    order = numpy.lexsort((key2, key1))
+
+    assert_array_equal(numpy.concatenate(comm.allgather(s['key1'].compute())), key1[order])
+    assert_array_equal(numpy.concatenate(comm.allgather(s['key2'].compute())), key2[order])
+    assert_array_equal(numpy.concatenate(comm.allgather(s['Position'].compute())), pos[order])
+    assert_array_equal(numpy.concatenate(comm.allgather(r['key2'].compute())), key2[order][::-1])
+
+    # the local sizes are unchanged
+    assert s.size == source.size
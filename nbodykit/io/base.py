@@ -13,6 +13,13 @@ class FileType(object):
     """
     logger = logging.getLogger("FileType")
 
+    def __new__(cls, *args, **kwargs):
+        obj = object.__new__(cls)
+
+        # the reader configuration, for :func:`__dask_tokenize__`
+        obj._init_args = (args, kwargs)
+        return obj
+
     @abstractmethod
     def read(self, columns, start, stop, step=1):
         """
@@ -119,6 +126,54 @@ class FileType(object):
         args = (self.__class__.__name__, self.path, self.dataset if hasattr(self, 'dataset') else "None", self.ncol, self.shape)
         return "%s(path=%s, dataset=%s, ncolumns=%d, shape=%s>" % args
 
+    def __dask_tokenize__(self):
+        """
+        A deterministic token for :mod:`dask`, from the path(s) of the
+        file(s), their modification times and the arguments the
+        file(s) were initialized with, such that dask arrays reading
+        the same data have the same name.
+
+        The token of a file is computed once per instance; views of a
+        file add the selected columns to the token of the file.
+        """
+        import os
+        import uuid
+
+        # views of a file
+        base = getattr(self, 'base', None)
+        if base is not None:
+            return (base.__dask_tokenize__(), list(self.columns), str(self.dtype), self.shape)
+
+        # stacks of files
+        files = getattr(self, 'files', None)
+        if files is not None:
+            return [f.__dask_tokenize__() for f in files]
+
+        token = getattr(self, '_dask_token', None)
+        if token is not None:
+            return token
+
+        path = getattr(self, 'path', None)
+        if not isinstance(path, string_types) or not os.path.exists(path):
+            token = uuid.uuid4().hex
+        else:
+            # directories, e.g. bigfile, change with the files inside them
+            mtime = os.path.getmtime(path)
+            if os.path.isdir(path):
+                for root, dirs, names in os.walk(path):
+                    for name in names:
+                        mtime = max(mtime, os.path.getmtime(os.path.join(root, name)))
+
+            # the reader configuration, e.g. header sizes or parser options
+            args, kwargs = getattr(self, '_init_args', ((), {}))
+            config = repr((args[1:], sorted((k, v) for k, v in kwargs.items() if k != 'path')))
+
+            token = (self.__class__.__name__, os.path.abspath(path), mtime, config,
+                     getattr(self, 'dataset', None), str(self.dtype), self.size)
+
+        self._dask_token = token
+        return token
+
     def __contains__(self, col):
         return col in self.columns
 
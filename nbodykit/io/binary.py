@@ -1,8 +1,11 @@
 import numpy
 import os
+import mmap
+from contextlib import contextmanager
 
 from .base import FileType
 from . import tools
+from nbodykit import _global_options
 from six import string_types
 
 def getsize(filename, header_size, rowsize):
@@ -66,11 +69,17 @@ class BinaryFile(FileType):
     size : int, optional
         the number of objects in the binary file; if not provided, the value
         is inferred from the dtype and the total size of the file in bytes
+    mmap : bool, optional
+        if ``True``, read the columns through memory-mapped views of the
+        file; :func:`get_dask` then returns dask arrays that slice the
+        memory maps directly, without intermediate copies
     """
-    def __init__(self, path, dtype, offsets=None, header_size=0, size=None):
+    def __init__(self, path, dtype, offsets=None, header_size=0, size=None, mmap=False):
 
         self.path = path
         self.dataset = "*"
+        self.mmap = mmap
+        self._map = None
 
         # set the data type
         self.dtype = dtype
@@ -102,6 +111,73 @@ class BinaryFile(FileType):
             for col in self:
                 self.offsets[col] = self._default_byte_offset(col, header_size=header_size)
 
+    def __getstate__(self):
+        # do not pickle the memory map
+        state = self.__dict__.copy()
+        state['_map'] = None
+        return state
+
+    def _can_memmap(self, col):
+        """
+        Whether the column ``col`` is stored in the file with its dtype,
+        such that it can be read from a memory map
+        """
+        return col in self.offsets
+
+    def _open_map(self):
+        """
+        Return a read-only memory map of the full file
+
+        Where supported (Python >= 3.13), the map does not keep
+        a duplicate of the file descriptor open.
+        """
+        with open(self.path, 'rb') as ff:
+            try:
+                return mmap.mmap(ff.fileno(), 0, access=mmap.ACCESS_READ, trackfd=False)
+            except TypeError:
+                return mmap.mmap(ff.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @contextmanager
+    def _read_map(self):
+        """
+        Yield the memory map to serve an eager read from, or ``None``
+        if the file is not memory-mapped
+
+        Unless the file is already mapped for :func:`get_dask`, the map
+        is closed after the read, such that reading many files
+        does not leave a memory map (and file descriptor) per file open.
+        """
+        if not self.mmap or self._map is not None or self.size == 0:
+            yield self._map
+            return
+
+        m = self._open_map()
+        try:
+            yield m
+        finally:
+            m.close()
+
+    def _memmap(self, col, buffer=None):
+        """
+        Return a read-only memory-mapped view of the column ``col``,
+        of shape ``(size,) + dtype[col].shape``
+
+        The views of all columns share a single map of the file, which is
+        kept for the lifetime of the object, unless the map is given
+        as ``buffer``.
+        """
+        dtype = self.dtype[col]
+        if self.size == 0:
+            # cannot map an empty range
+            return numpy.empty(0, dtype=dtype)
+
+        if buffer is None:
+            if self._map is None:
+                self._map = self._open_map()
+            buffer = self._map
+        return numpy.ndarray(shape=(self.size,), dtype=dtype, buffer=buffer,
+                             offset=self.offsets[col])
+
     def _default_byte_offset(self, col, header_size=0):
         """
         Internal function to return the offset in bytes
@@ -149,6 +225,13 @@ class BinaryFile(FileType):
         dt = [(col, self.dtype[col]) for col in columns]
         toret = numpy.empty(tools.get_slice_size(start, stop, step), dtype=dt)
 
+        # copy only the requested rows from the memory maps
+        if self.mmap:
+            with self._read_map() as buf:
+                for col in columns:
+                    toret[col][:] = self._memmap(col, buf)[start:stop:step]
+            return toret
+
         with open(self.path, 'rb') as ff:
 
             for col in columns:
@@ -159,3 +242,44 @@ class BinaryFile(FileType):
                 toret[col][:] = numpy.fromfile(ff, count=stop-start, dtype=dtype)[::step]
 
         return toret
+
+    def get_dask(self, column, blocksize=None):
+        """
+        Return the specified column as a dask array, which
+        delays the explicit reading of the data until
+        :meth:`dask.compute` is called
+
+        If the file is memory-mapped, the chunks of the dask array are
+        views of the memory map, such that no data is copied until it
+        is used; repeated reads are served from the page cache.
+
+        Parameters
+        ----------
+        column : str
+            the name of the column to return
+        blocksize : int, optional
+            the size of the chunks in the dask array
+
+        Returns
+        -------
+        :class:`dask.array.Array` :
+            the dask array holding the column
+        """
+        # the owner of the underlying memory
+        memown = getattr(self, 'base', None)
+        if memown is None:
+            memown = self
+
+        if not getattr(memown, 'mmap', False) or column not in self or not memown._can_memmap(column):
+            return FileType.get_dask(self, column, blocksize=blocksize)
+
+        if blocksize is None:
+            blocksize = _global_options['dask_chunk_size']
+
+        import dask.array as da
+        from dask.base import tokenize
+
+        # avoid hashing the data of the memory map to name the array
+        mtime = os.path.getmtime(memown.path)
+        name = 'memmap-' + tokenize(memown.path, mtime, memown.offsets[column], memown.dtype[column], memown.size)
+        return da.from_array(memown._memmap(column), chunks=blocksize, name=name)
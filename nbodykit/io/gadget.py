@@ -60,13 +60,16 @@ class Gadget1File(BinaryFile):
         type of particle of interest.
     hdtype : list, dtype
         dtype of the header; must define Massarr and Npart
+    mmap : bool, optional
+        if ``True``, read the columns through memory-mapped views of
+        the file; see :class:`~nbodykit.io.binary.BinaryFile`
 
     References
     ----------
     https://wwwmpa.mpa-garching.mpg.de/gadget/users-guide.pdf
     """
     def __init__(self, path, columndefs=DefaultColumnDefs,
-                hdtype=DefaultHeaderDtype, ptype=1):
+                hdtype=DefaultHeaderDtype, ptype=1, mmap=False):
 
         if ptype not in [0, 1, 2, 3, 4, 5]:
             raise ValueError("ptype shall be 0 ~ 5.")
@@ -169,9 +172,15 @@ class Gadget1File(BinaryFile):
 
         self.defs = defs
 
-        BinaryFile.__init__(self, path, dtype=dtype, header_size=256+4+4, offsets=offsets, size=int(header['Npart'][ptype]))
+        BinaryFile.__init__(self, path, dtype=dtype, header_size=256+4+4, offsets=offsets, size=int(header['Npart'][ptype]), mmap=mmap)
         self.dataset = str(ptype)
 
+    def _can_memmap(self, col):
+        # the mass is given by the header
+        if col == 'Mass' and self.header_mass != 0:
+            return False
+        return BinaryFile._can_memmap(self, col)
+
     def read(self, columns, start, stop, step=1):
         """
         Read the specified column(s) over the given range
@@ -205,13 +214,15 @@ class Gadget1File(BinaryFile):
         dt = [(col, self.dtype[col]) for col in columns]
         toret = numpy.empty(tools.get_slice_size(start, stop, step), dtype=dt)
 
-        with open(self.path, 'rb') as ff:
+        with open(self.path, 'rb') as ff, self._read_map() as buf:
 
             for col in columns:
                 offset = self.offsets[col]
                 dtype = self.dtype[col]
                 if col == 'Mass' and self.header_mass != 0:
                     toret[col][:] = self.header_mass
+                elif self.mmap:
+                    toret[col][:] = self._memmap(col, buf)[start:stop:step]
                 else:
                     ff.seek(offset, 0)
                     ff.seek(start * dtype.itemsize, 1)
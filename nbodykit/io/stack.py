@@ -1,5 +1,6 @@
 from .base import FileType
 from . import tools
+from nbodykit import _global_options
 from six import string_types
 import numpy
 import os
@@ -14,6 +15,9 @@ class FileStack(FileType):
     a single file object. The "stack" is a concatenation
     of one file to the end of the previous file.
 
+    Reads that span several files fetch up to ``io_concurrency``
+    files at once in threads; see :class:`nbodykit.set_options`.
+
     Parameters
     ----------
     filetype : subclass of :class:`~nbodykit.io.base.FileType`
@@ -36,7 +40,42 @@ class FileStack(FileType):
 
         self.path = path
 
-        # save the list of relevant files
+        # initialize the relevant files
+        filenames = self.find_files(path)
+        self._set_files([filetype(fn, *args, **kwargs) for fn in filenames])
+
+    @classmethod
+    def from_files(cls, path, files):
+        """
+        Initialize a FileStack from a list of already initialized
+        :class:`~nbodykit.io.base.FileType` instances.
+
+        Parameters
+        ----------
+        path : str, list of str
+            the path that the files were found from, see :func:`find_files`
+        files : list of :class:`~nbodykit.io.base.FileType`
+            the file objects, in the order of the stack
+        """
+        if not all(isinstance(f, FileType) for f in files):
+            raise ValueError("the stack of files must be instances of `FileType`")
+
+        obj = cls.__new__(cls)
+        obj.path = path
+        obj._set_files(files)
+        return obj
+
+    @staticmethod
+    def find_files(path):
+        """
+        Return the list of file names specified by ``path``.
+
+        Parameters
+        ----------
+        path : str
+            list of file names, or string specifying single file or
+            containing a glob-like '*' pattern
+        """
         if isinstance(path, list):
             filenames = path
         elif isinstance(path, string_types):
@@ -49,7 +88,10 @@ class FileStack(FileType):
                 filenames = [os.path.abspath(path)]
         else:
             raise ValueError("'path' should be a string or a list of strings")
-        self.files = [filetype(fn, *args, **kwargs) for fn in filenames]
+        return filenames
+
+    def _set_files(self, files):
+        self.files = files
         self.sizes = numpy.array([len(f) for f in self.files], dtype='i8')
 
         # set dtype and size
@@ -99,14 +141,52 @@ class FileStack(FileType):
         """
         if isinstance(columns, string_types): columns = [columns]
 
-        toret = []
-        for fnum in tools.get_file_slice(self.sizes, start, stop):
+        # the files and the local slices to read
+        fnums = list(tools.get_file_slice(self.sizes, start, stop))
+        slices = [tools.global_to_local_slice(self.sizes, start, stop, fnum) for fnum in fnums]
+
+        def read(i):
+            fnum, sl = fnums[i], slices[i]
+            self.logger.debug("Reading column %s [%d:%d] from file %s" % (columns, sl[0], sl[1], self.files[fnum]))
+            return self.files[fnum].read(columns, sl[0], sl[1], step=1)
+
+        # read several files at once
+        nthreads = min(_global_options['io_concurrency'], len(fnums))
+        if nthreads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=nthreads) as executor:
+                toret = list(executor.map(read, range(len(fnums))))
+        else:
+            toret = [read(i) for i in range(len(fnums))]
 
-            # the local slice
-            sl = tools.global_to_local_slice(self.sizes, start, stop, fnum)
+        return numpy.concatenate(toret, axis=0)[::step]
 
-            # read this chunk
-            toret.append(self.files[fnum].read(columns, sl[0], sl[1], step=1))
+    def get_dask(self, column, blocksize=None):
+        """
+        Return the specified column as a dask array, which
+        delays the explicit reading of the data until
+        :meth:`dask.compute` is called
 
-        self.logger.debug("Reading column %s [%d:%d] from file %s" % (columns, sl[0], sl[1], self))
-        return numpy.concatenate(toret, axis=0)[::step]
+        If all of the files are memory-mapped, this concatenates the
+        dask arrays of the individual files, which are views of the
+        memory maps; see :class:`~nbodykit.io.binary.BinaryFile`.
+
+        Parameters
+        ----------
+        column : str
+            the name of the column to return
+        blocksize : int, optional
+            the size of the chunks in the dask array
+
+        Returns
+        -------
+        :class:`dask.array.Array` :
+            the dask array holding the column
+        """
+        files = getattr(self, 'files', [])
+        if column in self and len(files) \
+            and all(getattr(f, 'mmap', False) and f._can_memmap(column) for f in files):
+            import dask.array as da
+            return da.concatenate([f.get_dask(column, blocksize=blocksize) for f in files], axis=0)
+
+        return FileType.get_dask(self, column, blocksize=blocksize)
@@ -148,4 +148,47 @@ def test_pickle(comm):
         numpy.testing.assert_almost_equal(f['Position'][:], f2['Position'][:])
     
     # cleanup
-    os.remove(tmpfile)
\ No newline at end of file
+    os.remove(tmpfile)
+
+@MPITest([1])
+def test_tokenize(comm):
+    from nbodykit.source.catalog import BinaryCatalog
+    from dask.base import tokenize
+
+    with tempfile.NamedTemporaryFile() as ff:
+
+        # generate data, with two columns of the same dtype and shape
+        dset = numpy.empty(1024, dtype=[('Position', ('f8', 3)), ('Mass', 'f8'), ('Weight', 'f8')])
+        dset['Position'] = numpy.random.random(size=(1024, 3))
+        dset['Mass'] = numpy.random.random(size=1024)
+        dset['Weight'] = numpy.random.random(size=1024)
+        for col in dset.dtype.names:
+            dset[col].tofile(ff)
+        ff.flush()
+
+        # the same file and column gives the same token
+        f1 = BinaryFile(ff.name, dtype=dset.dtype)
+        f2 = BinaryFile(ff.name, dtype=dset.dtype)
+        assert tokenize(f1) == tokenize(f2)
+        assert tokenize(f1['Mass']) == tokenize(f2['Mass'])
+        assert tokenize(f1['Mass']) != tokenize(f1['Weight'])
+
+        # columns of the same dtype are read as different data
+        cat = BinaryCatalog(ff.name, dtype=dset.dtype, comm=comm)
+        mass, weight = cat.compute(cat['Mass'], cat['Weight'])
+        numpy.testing.assert_array_equal(mass, dset['Mass'])
+        numpy.testing.assert_array_equal(weight, dset['Weight'])
+
+        # the same file read with a different configuration has a different token
+        offsets = {'Position': 0, 'Mass': 1024 * 32, 'Weight': 1024 * 24}
+        f3 = BinaryFile(ff.name, dtype=dset.dtype, offsets=offsets)
+        assert tokenize(f3) != tokenize(f1)
+        assert tokenize(f3['Mass']) != tokenize(f1['Mass'])
+        numpy.testing.assert_array_equal(f3.read('Mass', 0, 1024)['Mass'], dset['Weight'])
+
+        # modifying the file changes the token of a new instance
+        token = tokenize(f1)
+        mtime = os.path.getmtime(ff.name)
+        os.utime(ff.name, (mtime + 10, mtime + 10))
+        assert tokenize(f1) == token
+        assert tokenize(BinaryFile(ff.name, dtype=dset.dtype)) != token
@@ -48,6 +48,27 @@ def test_data(comm):
         with pytest.raises(IndexError):
             f.read(['ID'], 0, f.size + 10)
 
+@MPITest([1])
+def test_mmap(comm):
+    tmpfile = tempfile.mktemp()
+    with open(tmpfile, 'wb') as ff:
+        ff.write(base64.b64decode(CONTENT))
+
+    for ptype in [0, 1]:
+        f1 = Gadget1File(tmpfile, ptype=ptype)
+        f2 = Gadget1File(tmpfile, ptype=ptype, mmap=True)
+        for col in f1.keys():
+            numpy.testing.assert_array_equal(f1.read([col], 3, f1.size, 2), f2.read([col], 3, f1.size, 2))
+            if f2._can_memmap(col):
+                numpy.testing.assert_array_equal(f1[col][:], f2.get_dask(col, blocksize=50).compute())
+
+    # the mass of the particles is given by the header
+    assert not f2._can_memmap('Mass')
+    assert f2._can_memmap('Position')
+
+    del f1, f2
+    os.remove(tmpfile)
+
 # this is a simple snapshot file from Gadget2.
 CONTENT="""
 AAEAAJUAAACYAAAAAAAAAAAAAAAAAAAAAAAAABdU7uW38EBApkij1SqHa0AAAAAAAAAAAAAAAAAA
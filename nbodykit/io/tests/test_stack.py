@@ -110,3 +110,80 @@ def test_bad_path(comm):
         # bad path name
         with pytest.raises(ValueError): 
             f = FileStack(TPMBinaryFile, ff, precision='f4')
+
+@MPITest([1])
+def test_concurrent_read(comm):
+    from nbodykit import set_options
+
+    with TemporaryDirectory() as tmpdir:
+
+        # generate TPM-format data
+        pos = numpy.random.random(size=(2048, 3)).astype('f4')
+        vel = numpy.random.random(size=(2048, 3)).astype('f4')
+        uid = numpy.arange(2048, dtype='u8')
+        hdr = numpy.ones(28, dtype='?')
+
+        for i in range(8):
+            sl = slice(i*256, (i+1)*256)
+
+            # write to file
+            fname = os.path.join(tmpdir, 'tpm.%03d' % i)
+            with open(fname, 'wb') as ff:
+                hdr.tofile(ff)
+                pos[sl].tofile(ff); vel[sl].tofile(ff); uid[sl].tofile(ff)
+
+        path = os.path.join(tmpdir, 'tpm.00*')
+        f = FileStack(TPMBinaryFile, path, precision='f4')
+        assert f.nfiles == 8
+
+        # read several files at once
+        with set_options(io_concurrency=3):
+            numpy.testing.assert_almost_equal(pos[100:2000], f['Position'][100:2000])
+            numpy.testing.assert_almost_equal(uid[100:2000:7], f['ID'][100:2000:7])
+
+        # read files one after another
+        with set_options(io_concurrency=1):
+            numpy.testing.assert_almost_equal(pos[100:2000], f['Position'][100:2000])
+
+        # initialize from file objects
+        files = [TPMBinaryFile(fn, precision='f4') for fn in FileStack.find_files(path)]
+        f2 = FileStack.from_files(path, files)
+        assert f2.size == f.size
+        numpy.testing.assert_almost_equal(f2['Velocity'][:], vel)
+
+        with pytest.raises(ValueError):
+            f2 = FileStack.from_files(path, [None])
+
+@MPITest([1])
+def test_mmap(comm):
+
+    with TemporaryDirectory() as tmpdir:
+
+        # generate TPM-format data
+        pos = numpy.random.random(size=(2048, 3)).astype('f4')
+        vel = numpy.random.random(size=(2048, 3)).astype('f4')
+        uid = numpy.arange(2048, dtype='u8')
+        hdr = numpy.ones(28, dtype='?')
+
+        for i, name in enumerate(['tpm.000', 'tpm.001']):
+            sl = slice(i*1024, (i+1)*1024)
+
+            # write to file
+            fname = os.path.join(tmpdir, name)
+            with open(fname, 'wb') as ff:
+                hdr.tofile(ff)
+                pos[sl].tofile(ff); vel[sl].tofile(ff); uid[sl].tofile(ff)
+
+        path = os.path.join(tmpdir, 'tpm.00*')
+        f = FileStack(TPMBinaryFile, path, precision='f4', mmap=True)
+
+        # eager reads do not keep the files mapped
+        numpy.testing.assert_array_equal(uid, f['ID'][:])
+        assert all(ff._map is None for ff in f.files)
+
+        # the dask arrays of the files are concatenated
+        p = f.get_dask('Position', blocksize=1000)
+        assert p.shape == (2048, 3)
+        numpy.testing.assert_array_equal(pos, p.compute())
+        numpy.testing.assert_array_equal(uid[500:1500], f.get_dask('ID')[500:1500].compute())
+        numpy.testing.assert_array_equal(vel, f['Velocity'][:])
@@ -37,4 +37,45 @@ def test_data(comm):
         with pytest.raises(ValueError): 
             f = TPMBinaryFile(ff.name, precision='f16')
         
-    os.remove(tmpfile)
\ No newline at end of file
+    os.remove(tmpfile)
+@MPITest([1])
+def test_mmap(comm):
+    import pickle
+
+    tmpfile = tempfile.mktemp()
+    with open(tmpfile, 'wb') as ff:
+
+        # generate TPM-format data
+        pos = numpy.random.random(size=(1024, 3)).astype('f4')
+        vel = numpy.random.random(size=(1024, 3)).astype('f4')
+        uid = numpy.arange(1024, dtype='u8')
+        hdr = numpy.ones(28, dtype='?')
+
+        # write to file
+        hdr.tofile(ff)
+        pos.tofile(ff); vel.tofile(ff); uid.tofile(ff)
+
+    # read through memory maps
+    f = TPMBinaryFile(tmpfile, precision='f4', mmap=True)
+    assert f.size == 1024
+
+    numpy.testing.assert_array_equal(pos, f['Position'][:])
+    numpy.testing.assert_array_equal(vel[10:1000:3], f['Velocity'][10:1000:3])
+    numpy.testing.assert_array_equal(uid, f['ID'][:])
+
+    # eager reads do not keep the file mapped
+    assert f._map is None
+
+    # the dask chunks are views of the memory map
+    p = f.get_dask('Position', blocksize=100)
+    assert p.chunks[0][0] == 100
+    numpy.testing.assert_array_equal(pos, p.compute())
+    numpy.testing.assert_array_equal(uid[::2], f.get_dask('ID')[::2].compute())
+
+    # memory maps are not pickled
+    f2 = pickle.loads(pickle.dumps(f))
+    assert f2._map is None
+    numpy.testing.assert_array_equal(vel, f2['Velocity'][:])
+
+    del f, f2, p
+    os.remove(tmpfile)
@@ -22,15 +22,18 @@ class TPMBinaryFile(BinaryFile):
         the path to the binary file to load
     precision : {'f4', 'f8'}, optional
         the string dtype specifying the precision
+    mmap : bool, optional
+        if ``True``, read the columns through memory-mapped views of
+        the file; see :class:`~nbodykit.io.binary.BinaryFile`
 
     References
     ----------
     White M., 2002, ApJS, 579, 16
     """
-    def __init__(self, path, precision='f4'):
+    def __init__(self, path, precision='f4', mmap=False):
 
         if precision not in ['f4', 'f8']:
             raise ValueError("precision should be either 'f4' or 'f8'")
 
         dtype = [('Position', (precision, 3)), ('Velocity', (precision, 3)), ('ID', 'u8')]
-        BinaryFile.__init__(self, path, dtype=dtype, header_size=28)
+        BinaryFile.__init__(self, path, dtype=dtype, header_size=28, mmap=mmap)
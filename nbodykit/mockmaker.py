@@ -6,7 +6,6 @@ from pmesh.pm import RealField, ComplexField
 from nbodykit.meshtools import SlabIterator
 from nbodykit.utils import GatherArray, ScatterArray
 from nbodykit.mpirng import MPIRandomState
-import mpsort
 
 def gaussian_complex_fields(pm, linear_power, seed,
             unitary_amplitude=False, inverted_phase=False,
@@ -256,6 +255,10 @@ def poisson_sample_to_points(delta, displacement, pm, nbar, bias=1., seed=None,
     #.  Disribute the positions of particles uniformly within the mesh cells,
         and assign the displacement field at each cell to the particles
 
+    Objects are generated directly from the cells with a non-zero number of
+    objects, in the global order of the cells, such that the result
+    is independent of the number of ranks.
+
     Parameters
     ----------
     delta : RealField
@@ -295,65 +298,54 @@ def poisson_sample_to_points(delta, displacement, pm, nbar, bias=1., seed=None,
     H = delta.BoxSize / delta.Nmesh
     overallmean = H.prod() * nbar
 
-    # number of objects in each cell (per rank, as a RealField)
-    cellmean = delta * overallmean
+    # number of objects in each cell, in place
+    delta[...] *= overallmean
 
     # create a random state with the input seed
     rng = MPIRandomState(seed=seed1, comm=comm, size=delta.size)
 
-    # generate poissons. Note that we use ravel/unravel to
-    # maintain MPI invariane.
-    Nravel = rng.poisson(lam=cellmean.ravel())
-    N = delta.pm.create(type='real')
-    N.unravel(Nravel)
-
-    Ntot = N.csum()
-    if logger and pm.comm.rank == 0:
-        logger.info("Poisson sampling done, total number of objects is %d" % Ntot)
-
-    pos_mesh = delta.pm.generate_uniform_particle_grid(shift=0.0)
-    disp_mesh = numpy.empty_like(pos_mesh)
-
-    # no need to do decompose because pos_mesh is strictly within the
-    # local volume of the RealField.
-    N_per_cell = N.readout(pos_mesh, resampler='nnb')
-    for i in range(N.ndim):
-        disp_mesh[:, i] = displacement[i].readout(pos_mesh, resampler='nnb')
+    # generate poissons. Note that we use ravel to maintain MPI invariance;
+    # each rank holds a contiguous range of the cells in 'C' order.
+    Nravel = rng.poisson(lam=delta.ravel())
+    del delta
 
     # fight round off errors, if any
-    N_per_cell = numpy.int64(N_per_cell + 0.5)
-
-    pos = pos_mesh.repeat(N_per_cell, axis=0)
-    disp = disp_mesh.repeat(N_per_cell, axis=0)
-
-    del pos_mesh
-    del disp_mesh
+    N_per_cell = numpy.int64(Nravel + 0.5)
+    del Nravel
 
+    Ntot = comm.allreduce(N_per_cell.sum())
     if logger and pm.comm.rank == 0:
-        logger.info("catalog produced. Assigning in cell shift.")
-
-    # generate linear ordering of the positions.
-    # this should have been a method in pmesh, e.g. argument
-    # to genereate_uniform_particle_grid(return_id=True);
-
-    # FIXME: after pmesh update, remove this
-    orderby = numpy.int64(pos[:, 0] / H[0] + 0.5)
-    for i in range(1, delta.ndim):
-        orderby[...] *= delta.Nmesh[i]
-        orderby[...] += numpy.int64(pos[:, i] / H[i] + 0.5)
+        logger.info("Poisson sampling done, total number of objects is %d" % Ntot)
 
-    # sort by ID to maintain MPI invariance.
-    pos = mpsort.sort(pos, orderby=orderby, comm=comm)
-    disp = mpsort.sort(disp, orderby=orderby, comm=comm)
+    # the global index and position of the cells holding objects
+    offset = numpy.sum(comm.allgather(len(N_per_cell))[:comm.rank], dtype='i8')
+    nonzero = N_per_cell.nonzero()[0]
+    N_per_cell = N_per_cell[nonzero]
+    cells = numpy.unravel_index(offset + nonzero, pm.Nmesh)
+    pos = numpy.empty((len(nonzero), pm.ndim), dtype='f8')
+    for i in range(pm.ndim):
+        pos[:, i] = cells[i] * H[i]
+    del cells
+
+    # read out the displacement of each cell once; the cells
+    # are routed to the ranks holding the displacement fields
+    layout = pm.decompose(pos)
+    disp = numpy.empty_like(pos)
+    for i in range(pm.ndim):
+        disp[:, i] = displacement[i].readout(pos, layout=layout, resampler='nnb')
+
+    # objects are in the global order of the cells
+    pos = pos.repeat(N_per_cell, axis=0)
+    disp = disp.repeat(N_per_cell, axis=0)
 
     if logger and pm.comm.rank == 0:
-        logger.info("sorting done")
+        logger.info("catalog produced. Assigning in cell shift.")
 
     rng_shift = MPIRandomState(seed=seed2, comm=comm, size=len(pos))
-    in_cell_shift = rng_shift.uniform(0, H[i], itemshape=(delta.ndim,))
+    in_cell_shift = rng_shift.uniform(0, H[i], itemshape=(pm.ndim,))
 
     pos[...] += in_cell_shift
-    pos[...] %= delta.BoxSize
+    pos[...] %= pm.BoxSize
 
     if logger and pm.comm.rank == 0:
         logger.info("catalog shifted.")
@@ -1,6 +1,7 @@
 from numpy.random import RandomState
 import numpy
 from nbodykit.utils import FrontPadArray
+from nbodykit import _global_options
 
 class MPIRandomState:
     """ A Random number generator that is invariant against number of ranks,
@@ -16,11 +17,24 @@ class MPIRandomState:
         The result is only invariant under diif comm.size when allreduce(size)
         and chunksize are kept invariant.
 
+        With ``mode='counter'``, the random numbers are instead transformed
+        from a single stream of the counter-based Philox generator, positioned
+        at the first item of the rank. This needs no padding of the arguments
+        across ranks, and the result is invariant under any chunksize; but it
+        differs from the default ``mode='chunked'``. The default mode is set
+        by the ``mpirng_mode`` option, see :class:`nbodykit.set_options`.
+
     """
-    def __init__(self, comm, seed, size, chunksize=100000):
+    def __init__(self, comm, seed, size, chunksize=100000, mode=None):
+        if mode is None:
+            mode = _global_options['mpirng_mode']
+        if mode not in ['chunked', 'counter']:
+            raise ValueError("mode should be 'chunked' or 'counter'")
+
         self.comm = comm
         self.seed = seed
         self.chunksize = chunksize
+        self.mode = mode
 
         self.size = size
         self.csize = numpy.sum(comm.allgather(size), dtype='intp')
@@ -37,6 +51,9 @@ class MPIRandomState:
 
         self._serial_rng = RandomState(seed)
 
+        # the number of calls in counter mode, to key the streams
+        self._ncalls = 0
+
     def _prepare_args_and_result(self, args, itemshape, dtype):
         """ pad every item in args with values from previous ranks,
             and create an array for holding the result with the same length.
@@ -71,29 +88,95 @@ class MPIRandomState:
         def sampler(rng, args, size):
             lam, = args
             return rng.poisson(lam=lam, size=size)
-        return self._call_rngmethod(sampler, (lam,), itemshape, dtype)
+        def transform(u, lam):
+            return _poisson_ppf(u, lam)
+        return self._call(sampler, transform, (lam,), itemshape, dtype)
 
     def choice(self, choices, itemshape=(), replace=True, p=None):
         """ Produce `self.size` choices, each of shape itemshape. This is a collective MPI call. """
         dtype = numpy.array(choices).dtype
         def sampler(rng, args, size):
             return rng.choice(choices, size=size, replace=replace, p=p)
+        def transform(u):
+            if not replace:
+                raise ValueError("choice without replacement is not supported with mode='counter'")
+            a = numpy.array(choices)
+            if a.ndim == 0:
+                a = numpy.arange(a)
+            if p is None:
+                ind = numpy.int64(u * len(a))
+            else:
+                cdf = numpy.cumsum(p)
+                ind = numpy.searchsorted(cdf / cdf[-1], u, side='right')
+            return a[ind.clip(0, len(a) - 1)]
 
-        return self._call_rngmethod(sampler, (), itemshape, dtype)
+        return self._call(sampler, transform, (), itemshape, dtype)
 
     def normal(self, loc=0, scale=1, itemshape=(), dtype='f8'):
         """ Produce `self.size` normals, each of shape itemshape. This is a collective MPI call. """
         def sampler(rng, args, size):
             loc, scale = args
             return rng.normal(loc=loc, scale=scale, size=size)
-        return self._call_rngmethod(sampler, (loc, scale), itemshape, dtype)
+        def transform(u, loc, scale):
+            from scipy.special import ndtri
+            return loc + scale * ndtri(u)
+        return self._call(sampler, transform, (loc, scale), itemshape, dtype)
 
     def uniform(self, low=0., high=1.0, itemshape=(), dtype='f8'):
         """ Produce `self.size` uniforms, each of shape itemshape. This is a collective MPI call. """
         def sampler(rng, args, size):
             low, high = args
             return rng.uniform(low=low, high=high,size=size)
-        return self._call_rngmethod(sampler, (low, high), itemshape, dtype)
+        def transform(u, low, high):
+            return low + (high - low) * u
+        return self._call(sampler, transform, (low, high), itemshape, dtype)
+
+    def _call(self, sampler, transform, args, itemshape, dtype='f8'):
+        """
+            Produce the random items, with sampler(rng, args, size) in the
+            chunked mode, or with transform(u, *args) of uniforms in the
+            counter mode.
+        """
+        if self.mode == 'chunked':
+            return self._call_rngmethod(sampler, args, itemshape, dtype)
+        else:
+            return self._call_transform(transform, args, itemshape, dtype)
+
+    def _call_transform(self, transform, args, itemshape, dtype='f8'):
+        """
+            Call transform(u, *args) on uniforms in (0, 1) for the items
+            of this rank, and the matching args.
+
+            The uniforms come from one Philox stream per call, keyed by the
+            seed and the number of calls. Each rank advances the stream to
+            its first item, such that the result is invariant no matter
+            how self.size is distributed.
+        """
+        from numpy.random import Philox
+
+        key = (self._ncalls << 64) + int(self.seed) % 2**64
+        self._ncalls += 1
+
+        # each item uses a fixed number of draws
+        itemsize = int(numpy.prod(itemshape, dtype='intp'))
+        start = int(self._start) * itemsize
+        n = self.size * itemsize
+
+        # Philox draws 4 values per step of the counter
+        bitgen = Philox(key=key)
+        bitgen.advance(start // 4)
+        raw = bitgen.random_raw(start % 4 + n)[start % 4:]
+
+        # 52 random bits, away from 0 and 1; exact in double precision
+        u = (raw >> numpy.uint64(12)) + 0.5
+        u *= 2.0 ** -52
+        del raw
+        u = u.reshape((self.size,) + tuple(itemshape))
+
+        args = tuple([a if numpy.isscalar(a) else numpy.asarray(a) for a in args])
+        r = numpy.empty(u.shape, dtype=dtype)
+        r[...] = transform(u, *args)
+        return r
 
     def _call_rngmethod(self, sampler, args, itemshape, dtype='f8'):
         """
@@ -135,3 +218,45 @@ class MPIRandomState:
 
         return padded_r[self._skip:]
 
+def _poisson_ppf(u, lam):
+    """
+        The inverse CDF of the Poisson distribution, the smallest k with
+        cdf(k) >= u, vectorized over the items.
+
+        This starts from the Cornish-Fisher estimate of k and steps the
+        cdf up or down, usually for one or two steps; it is several times
+        faster than :func:`scipy.stats.poisson.ppf`.
+    """
+    from scipy.special import ndtri, pdtr, gammaln
+
+    u, lam = numpy.broadcast_arrays(u, numpy.asarray(lam, dtype='f8'))
+    shape = u.shape
+    u = u.ravel()
+    lam = lam.ravel()
+
+    # the estimate, with the pmf p and the cdf F
+    z = ndtri(u)
+    k = numpy.maximum(numpy.floor(lam + lam ** 0.5 * z + (z * z - 1) / 6.), 0)
+    k[lam == 0] = 0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        p = numpy.exp(k * numpy.log(lam) - lam - gammaln(k + 1))
+    p[lam == 0] = 1.
+    F = pdtr(k, lam)
+
+    # step up while cdf(k) < u
+    i = numpy.nonzero(u > F)[0]
+    while len(i):
+        k[i] += 1
+        p[i] *= lam[i] / k[i]
+        F[i] += p[i]
+        i = i[(u[i] > F[i]) & (p[i] > 0)]
+
+    # step down while cdf(k - 1) >= u
+    i = numpy.nonzero((u <= F - p) & (k > 0))[0]
+    while len(i):
+        F[i] -= p[i]
+        p[i] *= k[i] / lam[i]
+        k[i] -= 1
+        i = i[(u[i] <= F[i] - p[i]) & (k[i] > 0)]
+
+    return k.reshape(shape)
@@ -12,6 +12,60 @@ __all__ = ['FileCatalogFactory', 'FileCatalogBase',
            'CSVCatalog', 'BinaryCatalog', 'BigFileCatalog',
            'HDFCatalog', 'TPMBinaryCatalog', 'Gadget1Catalog', 'FITSCatalog']
 
+def _scatter_filestack(filetype, args, kwargs, comm):
+    """
+    Initialize a :class:`~nbodykit.io.stack.FileStack`, with the
+    initialization of the individual files (which reads their sizes and
+    headers) divided between all ranks and the results allgathered.
+
+    The file names are found on the root rank.
+    """
+    import inspect
+    from nbodykit.io.base import FileType
+
+    # check that filetype is subclass of FileType
+    if not inspect.isclass(filetype) or not issubclass(filetype, FileType):
+        raise ValueError("the stack of `filetype` objects must be subclasses of `FileType`")
+
+    args = list(args)
+    kwargs = dict(kwargs)
+    if 'path' in kwargs:
+        path = kwargs.pop('path')
+    elif len(args):
+        path = args.pop(0)
+    else:
+        raise TypeError("the 'path' argument is required")
+
+    # find the file names on root
+    filenames, error = None, None
+    if comm.rank == 0:
+        try:
+            filenames = FileStack.find_files(path)
+        except Exception as e:
+            error = e
+    filenames, error = comm.bcast((filenames, error))
+    if error is not None:
+        raise error
+
+    # initialize every comm.size-th file on each rank
+    files, error = [], None
+    try:
+        for filename in filenames[comm.rank::comm.size]:
+            files.append(filetype(filename, *args, **kwargs))
+    except Exception as e:
+        error = e
+
+    errors = [e for e in comm.allgather(error) if e is not None]
+    if len(errors):
+        raise errors[0]
+
+    # restore the order of the files
+    stack = [None] * len(filenames)
+    for rank, f in enumerate(comm.allgather(files)):
+        stack[rank::comm.size] = f
+
+    return FileStack.from_files(path, stack)
+
 class FileCatalogBase(CatalogSource):
     """
     Base class to create a source of particles from a
@@ -40,12 +94,8 @@ class FileCatalogBase(CatalogSource):
         self.comm = comm
         self.filetype = filetype
 
-        # bcast the FileStack
-        if self.comm.rank == 0:
-            self._source = FileStack(filetype, *args, **kwargs)
-        else:
-            self._source = None
-        self._source = self.comm.bcast(self._source)
+        # the FileStack, with the files scanned in parallel
+        self._source = _scatter_filestack(filetype, args, kwargs, self.comm)
 
         # compute the size; start with full file.
         lstart = self.comm.rank * self._source.size // self.comm.size
@@ -125,6 +175,36 @@ class FileCatalogBase(CatalogSource):
         else:
             return CatalogSource.get_hardcolumn(self, col)
 
+    def _column_token(self, array):
+        """
+        A token identifying the values of ``array``, which does not
+        depend on the number of ranks.
+
+        A column read unchanged from the files is identified by the token
+        of the files (with their modification times and configuration),
+        the name of the column and the range of rows read; it is not
+        computed. Other columns are hashed, see
+        :func:`CatalogSource._column_token`.
+        """
+        import dask.array as da
+
+        if self.base is not None: return self.base._column_token(array)
+
+        col = None
+        if isinstance(array, da.Array):
+            for name in self._source.dtype.names:
+                if array.name == self.get_hardcolumn(name).name:
+                    col = name
+                    break
+
+        # all ranks must agree, as hashing the values is collective
+        ranges = self.comm.allgather((col, self._lstart, self._lend))
+        if any(c != col or c is None for c, start, end in ranges):
+            return CatalogSource._column_token(self, array)
+
+        token = self.comm.bcast(self._source.__dask_tokenize__())
+        return (token, col, ranges[0][1], ranges[-1][2])
+
 
 def _make_docstring(filetype, examples):
     """
@@ -1,5 +1,5 @@
 from .array import ArrayCatalog
-from nbodykit import CurrentMPIComm, transform
+from nbodykit import CurrentMPIComm, transform, _global_options
 from nbodykit.utils import GatherArray, ScatterArray
 from nbodykit.base.catalog import CatalogSourceBase, CatalogSource, column
 
@@ -152,15 +152,33 @@ class HaloCatalog(CatalogSource):
         """
         from halotools.sim_manager import UserSuppliedHaloCatalog
 
+        # the halo columns
+        kws, BoxSize = self._halo_columns(BoxSize=BoxSize)
+        kws['halo_local_id'] = numpy.arange(0, self.size, dtype='i8')
+
+        # add metadata too
+        kws['cosmology']     = self.cosmo
+        kws['redshift']      = self.attrs['redshift']
+        kws['Lbox']          = BoxSize
+        kws['particle_mass'] = self.attrs.get('particle_mass', 1.0)
+        kws['mdef']          = self.attrs['mdef']
+
+        return UserSuppliedHaloCatalog(**kws)
+
+    def _halo_columns(self, BoxSize=None):
+        """
+        Internal function to compute the local halo columns, named as in
+        :mod:`halotools`, and the box size.
+        """
         # make sure we have at least one halo
         if self.csize == 0:
-            raise ValueError("cannot create halotools UserSuppliedHaloCatalog; catalog is empty")
+            raise ValueError("cannot populate or convert to a halotools catalog; catalog is empty")
 
         # make sure we have a BoxSize
         if BoxSize is None:
             BoxSize = self.attrs.get('BoxSize', None)
         if BoxSize is None:
-            raise ValueError("please specify a 'BoxSize' to convert to a halotools catalog")
+            raise ValueError("please specify a 'BoxSize' to populate or convert to a halotools catalog")
 
         # compute the columns
         cols = ['Position', 'Velocity', 'Mass', 'Radius', 'Concentration']
@@ -188,18 +206,10 @@ class HaloCatalog(CatalogSource):
         kws['halo_id']       = halo_id
         kws['halo_hostid']    = halo_id
         kws['halo_upid']     = numpy.zeros(len(Position)) - 1
-        kws['halo_local_id'] = numpy.arange(0, self.size, dtype='i8')
 
-        # add metadata too
-        kws['cosmology']     = self.cosmo
-        kws['redshift']      = self.attrs['redshift']
-        kws['Lbox']          = BoxSize
-        kws['particle_mass'] = self.attrs.get('particle_mass', 1.0)
-        kws['mdef']          = self.attrs['mdef']
+        return kws, BoxSize
 
-        return UserSuppliedHaloCatalog(**kws)
-
-    def populate(self, model, BoxSize=None, seed=None, **params):
+    def populate(self, model, BoxSize=None, seed=None, engine=None, **params):
         """
         Populate the HaloCatalog using a :mod:`halotools` model.
 
@@ -207,6 +217,15 @@ class HaloCatalog(CatalogSource):
         will be converted to a Halotools model) or directly a Halotools model
         instance.
 
+        With ``engine='native'``, the built-in models are populated without
+        the :mod:`halotools` mock: the mean occupations of the model are
+        evaluated on the halo columns, and the centrals and satellites are
+        drawn with :class:`~nbodykit.mpirng.MPIRandomState`. Satellites are
+        placed following a NFW profile with the ``Concentration`` column,
+        and their velocities follow the isotropic Jeans dispersion of the
+        profile. The halo columns are computed once and re-used by
+        :func:`PopulatedHaloCatalog.repopulate`.
+
         This assumes that this is the first time this catalog has been
         populated with the input model. To re-populate using the same
         model (but different parameters), call the :func:`repopulate`
@@ -222,6 +241,10 @@ class HaloCatalog(CatalogSource):
             is not in :attr:`attrs`
         seed : int, optional
             the random seed to use when populating the mock
+        engine : 'halotools', 'native', optional
+            the engine populating the mock; the default is set by the
+            ``hod_engine`` option, see :class:`nbodykit.set_options`.
+            'native' requires a model from :mod:`nbodykit.hod`.
         **params :
             key/value pairs specifying the model parameters to use
 
@@ -250,23 +273,33 @@ class HaloCatalog(CatalogSource):
         from halotools.empirical_models import ModelFactory
         from halotools.sim_manager import UserSuppliedHaloCatalog
 
+        if engine is None:
+            engine = _global_options['hod_engine']
+        if engine not in ['halotools', 'native']:
+            raise ValueError("engine should be 'halotools' or 'native'")
+
         # handle builtin model types
         if isinstance(model, (type, HODModel)) and issubclass(model, HODModel):
             model = model.to_halotools(self.cosmo, self.attrs['redshift'],
                                         self.attrs['mdef'], concentration_key='halo_nfw_conc')
+        elif engine == 'native':
+            raise TypeError("the 'native' engine can only populate models from nbodykit.hod")
 
         # check model type
         if not isinstance(model, ModelFactory):
             raise TypeError("model for populating mocks should be a Halotools ModelFactory")
 
-        # make halotools catalog
-        halocat = self.to_halotools(BoxSize=BoxSize)
+        # make halotools catalog, or the halo table of the native engine
+        if engine == 'native':
+            halocat = _native_halo_table(self, BoxSize=BoxSize)
+        else:
+            halocat = self.to_halotools(BoxSize=BoxSize)
 
         # cache the model so we have option to call repopulate later
         self.model = model
 
         # return the populated catalog
-        return _populate_mock(self, model, seed=seed, halocat=halocat, **params)
+        return _populate_mock(self, model, seed=seed, halocat=halocat, engine=engine, **params)
 
 
 class PopulatedHaloCatalog(ArrayCatalog):
@@ -287,6 +320,10 @@ class PopulatedHaloCatalog(ArrayCatalog):
     cosmo : :class:`nbodykit.cosmology.cosmology.Cosmology`
         the cosmology instance
     """
+    # the engine and table of halos of the last population
+    engine = 'halotools'
+    _halocat = None
+
     @CurrentMPIComm.enable
     def __init__(self, data, model, cosmo, comm=None):
         ArrayCatalog.__init__(self, data, comm=comm)
@@ -298,10 +335,11 @@ class PopulatedHaloCatalog(ArrayCatalog):
         Re-populate the catalog in-place, using the specified ``seed``
         or model parameters.
 
-        This re-uses the model that was last used to create this catalog.
-        It is faster than :func:`HaloCatalog.populate` as it avoids
-        initialization steps. It is intended to be used when looping over
-        different parameter sets, e.g., when performing parameter optimization.
+        This re-uses the model and engine that was last used to create this
+        catalog. It is faster than :func:`HaloCatalog.populate` as it avoids
+        initialization steps; the 'native' engine also re-uses the halo
+        columns. It is intended to be used when looping over different
+        parameter sets, e.g., when performing parameter optimization.
 
         .. note::
             This operation is performed in-place.
@@ -313,17 +351,20 @@ class PopulatedHaloCatalog(ArrayCatalog):
         **params :
             key/value pairs specifying the model parameters to use
         """
-        _populate_mock(self, self.model, seed=seed, inplace=True, **params)
+        _populate_mock(self, self.model, seed=seed, halocat=self._halocat,
+                        inplace=True, engine=self.engine, **params)
 
 
-def _populate_mock(cat, model, seed=None, halocat=None, inplace=False, **params):
+def _populate_mock(cat, model, seed=None, halocat=None, inplace=False,
+                    engine='halotools', **params):
     """
     Internal function to perform the mock population on a HaloCatalog, given
     a :mod:`halotools` model.
 
-    The implementation is not massively parallel. The data is gathered to
-    the root rank, mock population is performed, and then the data is
-    re-scattered evenly across ranks.
+    With the 'halotools' engine, each rank populates its local halos with
+    the mock of the model. With the 'native' engine, ``halocat`` is the
+    table of local halos returned by :func:`_native_halo_table`, and the
+    mock is populated by :func:`_populate_native`.
     """
     # verify input params
     valid = sorted(model.param_dict)
@@ -334,34 +375,41 @@ def _populate_mock(cat, model, seed=None, halocat=None, inplace=False, **params)
     # update the model parameters
     model.param_dict.update(params)
 
-    # set the seed randomly if it is None
+    # set the seed randomly on the root if it is None
     if seed is None:
-        seed = numpy.random.randint(0, 4294967295)
-
-    # use uncorrelated seed per rank
-    rng = numpy.random.RandomState(seed=seed)
-    seed1 = rng.randint(0, 4294967295, size=cat.comm.size)[cat.comm.rank]
+        if cat.comm.rank == 0:
+            seed = numpy.random.randint(0, 4294967295)
+        seed = cat.comm.bcast(seed)
 
     # the types of galaxies we are populating
     gal_types = getattr(model, 'gal_types', [])
 
-    # re-populate the mock (without halo catalog pre-processing)
-    kws = {'seed':seed1, 'Num_ptcl_requirement':0, 'halo_mass_column_key':cat.attrs['halo_mass_key']}
-    if hasattr(model, 'mock'):
-        model.mock.populate(**kws)
-    # populating model for the first time (initialization costs)
+    if engine == 'native':
+        data = _populate_native(cat, model, halocat, seed)
+        Nhalos = len(halocat)
     else:
-        if halocat is None:
-            raise ValueError("halocat cannot be None if we are populating for the first time")
-        model.populate_mock(halocat=halocat, **kws)
-
-    # enumerate gal types as integers
-    # NOTE: necessary to avoid "O" type columns
-    _enum_gal_types(model.mock.galaxy_table, gal_types)
-
-    # crash if any object dtypes
-    # NOTE: we cannot use GatherArray/ScatterArray on objects
-    data = _test_for_objects(model.mock.galaxy_table).as_array()
+        # use uncorrelated seed per rank
+        rng = numpy.random.RandomState(seed=seed)
+        seed1 = rng.randint(0, 4294967295, size=cat.comm.size)[cat.comm.rank]
+
+        # re-populate the mock (without halo catalog pre-processing)
+        kws = {'seed':seed1, 'Num_ptcl_requirement':0, 'halo_mass_column_key':cat.attrs['halo_mass_key']}
+        if hasattr(model, 'mock'):
+            model.mock.populate(**kws)
+        # populating model for the first time (initialization costs)
+        else:
+            if halocat is None:
+                raise ValueError("halocat cannot be None if we are populating for the first time")
+            model.populate_mock(halocat=halocat, **kws)
+
+        # enumerate gal types as integers
+        # NOTE: necessary to avoid "O" type columns
+        _enum_gal_types(model.mock.galaxy_table, gal_types)
+
+        # crash if any object dtypes
+        # NOTE: we cannot use GatherArray/ScatterArray on objects
+        data = _test_for_objects(model.mock.galaxy_table).as_array()
+        Nhalos = len(model.mock.halo_table)
 
     # re-initialize with new source
     if inplace:
@@ -370,6 +418,10 @@ def _populate_mock(cat, model, seed=None, halocat=None, inplace=False, **params)
     else:
         galcat = PopulatedHaloCatalog(data, model, cat.cosmo, comm=cat.comm)
 
+    # the engine and halo table, for repopulating
+    galcat.engine = engine
+    galcat._halocat = halocat
+
     # crash with no particles!
     if galcat.csize == 0:
         raise ValueError("no particles in catalog after populating halo catalog")
@@ -390,13 +442,153 @@ def _populate_mock(cat, model, seed=None, halocat=None, inplace=False, **params)
     galcat.attrs['gal_types'] = {t:i for i,t in enumerate(gal_types)}
 
     # propagate total number of halos for logging
-    Nhalos = galcat.comm.allreduce(len(galcat.model.mock.halo_table))
+    Nhalos = galcat.comm.allreduce(Nhalos)
 
     # and log some info
     _log_populated_stats(galcat, Nhalos)
 
     return galcat
 
+def _nfw_mass(s):
+    r"""
+    The mass of a NFW profile enclosed within ``s`` scale radii, in units of
+    :math:`4 \pi \rho_s r_s^3`.
+    """
+    return numpy.log1p(s) - s / (1. + s)
+
+def _nfw_tables(smin=1e-4, smax=1e4, N=4096):
+    r"""
+    Internal function to tabulate the NFW profile on a logarithmic grid of
+    radii ``s``, in units of the scale radius.
+
+    Returns the log of the radii, the log of the enclosed mass, which is
+    interpolated inversely to sample the radii of satellites, and the
+    dimensionless radial velocity dispersion of the isotropic Jeans equation,
+
+    .. math::
+
+        f(s) = s (1+s)^2 \int_s^\infty \frac{m(t)}{t^3 (1+t)^2} dt,
+
+    such that :math:`\sigma_r^2 = V_\mathrm{vir}^2 c f(s) / m(c)`.
+    """
+    s = numpy.logspace(numpy.log10(smin), numpy.log10(smax), N)
+    logs = numpy.log(s)
+
+    # integrate from the outside in d ln t; the tail beyond smax is ~ ln(t) / t^5
+    integrand = _nfw_mass(s) / (s**2 * (1. + s)**2)
+    dI = 0.5 * (integrand[1:] + integrand[:-1]) * numpy.diff(logs)
+    I = numpy.append(numpy.cumsum(dI[::-1])[::-1], 0.)
+    I += numpy.log(smax) / (4. * smax**4)
+
+    return logs, numpy.log(_nfw_mass(s)), s * (1. + s)**2 * I
+
+_NFW_LOGS, _NFW_LOGM, _NFW_SIGMA2 = _nfw_tables()
+
+def _native_halo_table(cat, BoxSize=None):
+    """
+    Internal function to compute the table of local halos populated by the
+    'native' engine.
+
+    The table holds the columns of :func:`HaloCatalog.to_halotools`, and the
+    profile columns of the satellites, ``halo_nfw_norm`` (the enclosed NFW
+    mass at the concentration) and ``halo_vvir`` (the virial velocity in
+    km/s). It is computed once and re-used when repopulating.
+    """
+    from astropy.table import Table
+    from astropy.constants import G
+
+    cols, BoxSize = cat._halo_columns(BoxSize=BoxSize)
+
+    mass = cols[cat.attrs['halo_mass_key']]
+    radius = cols[cat.attrs['halo_radius_key']]
+    G = G.to('km2 Mpc / (Msun s2)').value
+
+    cols['halo_nfw_norm'] = _nfw_mass(cols['halo_nfw_conc'])
+    cols['halo_vvir'] = (G * mass / radius) ** 0.5
+
+    table = Table(cols)
+    table.meta['Lbox'] = numpy.ones(3) * BoxSize
+    return table
+
+def _populate_native(cat, model, halos, seed):
+    """
+    Internal function to populate the table of local halos ``halos`` with
+    the 'native' engine, returning the galaxy data.
+
+    Centrals are drawn with the probability of the mean central occupation
+    of each halo, and the number of satellites from a Poisson distribution
+    with the mean satellite occupation. Satellites are placed at radii drawn
+    by inverting the enclosed NFW mass, along random directions, and their
+    velocities are drawn from the isotropic NFW radial velocity dispersion.
+    The random numbers are drawn with :class:`~nbodykit.mpirng.MPIRandomState`,
+    such that the result does not depend on the number of ranks.
+    """
+    from nbodykit.mpirng import MPIRandomState
+
+    gal_types = list(getattr(model, 'gal_types', []))
+    if sorted(gal_types) != ['centrals', 'satellites']:
+        raise ValueError("the 'native' engine only populates centrals and satellites")
+
+    mkey = cat.attrs['halo_mass_key']
+    rkey = cat.attrs['halo_radius_key']
+
+    # the mean occupations, with the current parameters of the model
+    mean_ncen = model.mean_occupation_centrals(table=halos)
+    mean_nsat = model.mean_occupation_satellites(table=halos)
+
+    # uncorrelated seeds of the occupations and of the satellite phase space
+    seeds = numpy.random.RandomState(seed=seed).randint(0, 4294967295, size=2)
+
+    # draw the occupations
+    rng = MPIRandomState(cat.comm, seeds[0], size=len(halos))
+    cen = numpy.nonzero(rng.uniform() < mean_ncen)[0]
+    nsat = rng.poisson(mean_nsat, dtype='i8')
+    sat = numpy.repeat(numpy.arange(len(halos)), nsat)
+
+    # draw the satellite radii, directions and velocity dispersions
+    rng = MPIRandomState(cat.comm, seeds[1], size=len(sat))
+    q = rng.uniform()
+    direction = rng.normal(itemshape=(3,))
+    dv = rng.normal(itemshape=(3,))
+
+    conc = numpy.asarray(halos['halo_nfw_conc'])[sat]
+    norm = numpy.asarray(halos['halo_nfw_norm'])[sat]
+    s = numpy.exp(numpy.interp(numpy.log(q * norm), _NFW_LOGM, _NFW_LOGS))
+    s = numpy.minimum(s, conc)
+    sigma2 = numpy.interp(numpy.log(s), _NFW_LOGS, _NFW_SIGMA2)
+
+    r = s / conc * numpy.asarray(halos[rkey])[sat]
+    direction /= numpy.einsum('ij,ij->i', direction, direction)[:, None] ** 0.5
+    sigma = numpy.asarray(halos['halo_vvir'])[sat] * (conc / norm * sigma2) ** 0.5
+
+    # the galaxy data; centrals first, then satellites
+    hostcols = ['halo_id', 'halo_hostid', 'halo_upid', 'halo_x', 'halo_y', 'halo_z',
+                'halo_vx', 'halo_vy', 'halo_vz', mkey, rkey, 'halo_nfw_conc']
+    dtype = [(col, halos[col].dtype) for col in hostcols]
+    dtype += [('gal_type', 'i4'), ('host_centric_distance', 'f8')]
+    dtype += [(col, 'f8') for col in ['x', 'y', 'z', 'vx', 'vy', 'vz']]
+
+    ind = numpy.concatenate([cen, sat])
+    data = numpy.empty(len(ind), dtype=dtype)
+    for col in hostcols:
+        data[col] = numpy.asarray(halos[col])[ind]
+
+    data['gal_type'][:len(cen)] = gal_types.index('centrals')
+    data['gal_type'][len(cen):] = gal_types.index('satellites')
+    data['host_centric_distance'][:len(cen)] = 0.
+    data['host_centric_distance'][len(cen):] = r
+
+    Lbox = halos.meta['Lbox']
+    for i, (x, v) in enumerate(zip('xyz', ['vx', 'vy', 'vz'])):
+        data[x] = data['halo_' + x]
+        data[x][len(cen):] += r * direction[:, i]
+        data[x] %= Lbox[i]
+
+        data[v] = data['halo_' + v]
+        data[v][len(cen):] += sigma * dv[:, i]
+
+    return data
+
 def _log_populated_stats(cat, Nhalos):
     """
     Internal function to log statistics of a populated catalog. It logs
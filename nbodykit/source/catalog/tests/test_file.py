@@ -4,6 +4,7 @@ from nbodykit import setup_logging
 from numpy.testing import assert_allclose
 import tempfile
 import os
+import pytest
 
 @MPITest([1])
 def test_hdf(comm):
@@ -120,6 +121,37 @@ def test_stack_glob(comm):
     os.unlink(tmpfile1)
     os.unlink(tmpfile2)
 
+@MPITest([1, 4])
+def test_stack_scatter(comm):
+
+    tmpfiles = ['test-scatter-%d.dat' % i for i in range(5)]
+
+    # generate data
+    data = numpy.random.RandomState(42).random_sample(size=(100,5))
+    if comm.rank == 0:
+        for i, tmpfile in enumerate(tmpfiles):
+            numpy.savetxt(tmpfile, data + i, fmt='%.7e')
+    comm.barrier()
+
+    # the files are initialized on all ranks
+    names =['a', 'b', 'c', 'd', 'e']
+    f = CSVCatalog('test-scatter-*', names, blocksize=100, comm=comm)
+    assert f.csize == 500
+
+    # the order of the files is preserved
+    fulldata = numpy.concatenate([data + i for i in range(5)], axis=0)
+    for i, name in enumerate(names):
+        numpy.testing.assert_almost_equal(fulldata[:,i], numpy.concatenate(comm.allgather(f[name].compute())), decimal=6)
+
+    # missing files raise on all ranks
+    with pytest.raises(FileNotFoundError):
+        f = CSVCatalog('test-scatter-missing.dat', names, comm=comm)
+
+    comm.barrier()
+    if comm.rank == 0:
+        for tmpfile in tmpfiles:
+            os.unlink(tmpfile)
+
 @MPITest([1])
 def test_stack_list(comm):
 
@@ -148,3 +180,42 @@ def test_stack_list(comm):
 
     os.unlink(tmpfile1)
     os.unlink(tmpfile2)
+
+@MPITest([4])
+def test_column_token(comm):
+
+    tmpfile = comm.bcast(tempfile.mkstemp()[1] if comm.rank == 0 else None)
+
+    # generate data
+    dset = numpy.empty(1024, dtype=[('Position', ('f8', 3)), ('Mass', 'f8')])
+    dset['Position'] = numpy.random.RandomState(42).random_sample(size=(1024, 3))
+    dset['Mass'] = numpy.random.RandomState(84).random_sample(size=1024)
+    if comm.rank == 0:
+        with open(tmpfile, 'wb') as ff:
+            for col in dset.dtype.names:
+                dset[col].tofile(ff)
+    comm.barrier()
+
+    def tokens(comm):
+        source = BinaryCatalog(tmpfile, dtype=dset.dtype, comm=comm)
+        columns = [source['Position'], source['Mass'], source['Mass'] * 2, source['Mass'] > 0.5]
+        return [source._column_token(column) for column in columns]
+
+    # the tokens do not depend on the number of ranks
+    t1 = tokens(comm.Split(comm.rank))
+    t2 = tokens(comm.Split(comm.rank % 2))
+    t4 = tokens(comm)
+    assert t1 == t2 == t4
+    assert len(set(map(str, t4))) == 4
+
+    # columns read from the file are identified by the file
+    assert t4[0][1] == 'Position'
+    assert t4[1][1] == 'Mass'
+
+    # the same file read with a different configuration
+    source = BinaryCatalog(tmpfile, dtype=dset.dtype, offsets={'Position': 0, 'Mass': 0}, comm=comm)
+    assert source._column_token(source['Mass']) != t4[1]
+
+    comm.barrier()
+    if comm.rank == 0:
+        os.unlink(tmpfile)
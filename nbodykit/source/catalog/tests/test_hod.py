@@ -1,7 +1,8 @@
 from runtests.mpi import MPITest
 from nbodykit.lab import *
 from nbodykit.tutorials import DemoHaloCatalog
-from nbodykit import setup_logging
+from nbodykit import setup_logging, set_options
+from numpy.testing import assert_allclose
 import shutil
 import pytest
 
@@ -76,6 +77,61 @@ def test_repopulate(comm):
         hod.repopulate(seed=42, bad_param_name=1.0)
 
 
+@MPITest([1, 4])
+def test_native_engine(comm):
+
+    halos = DemoHaloCatalog('bolshoi', 'rockstar', 0.5, comm=comm)
+
+    # the native engine only populates the nbodykit models
+    model = Zheng07Model.to_halotools(halos.cosmo, halos.attrs['redshift'], 'vir')
+    with pytest.raises(TypeError):
+        hod = halos.populate(model, engine='native')
+
+    for model in [Zheng07Model, Leauthaud11Model]:
+        hod = halos.populate(model, seed=42, engine='native')
+        assert hod.engine == 'native'
+        assert hod.csize > 0
+
+        # satellites are within the halo radius, and centrals at the center
+        gal_type = hod['gal_type'].compute()
+        r = hod['host_centric_distance'].compute()
+        R = hod[halos.attrs['halo_radius_key']].compute()
+        assert (r[gal_type == hod.attrs['gal_types']['centrals']] == 0).all()
+        assert (r <= R).all()
+
+        # positions in the box
+        pos = hod['Position'].compute()
+        assert ((pos >= 0) & (pos < halos.attrs['BoxSize'])).all()
+
+@MPITest([1, 4])
+def test_native_repopulate(comm):
+
+    halos = DemoHaloCatalog('bolshoi', 'rockstar', 0.5, comm=comm)
+
+    with set_options(hod_engine='native'):
+        hod = halos.populate(Zheng07Model, seed=42)
+    size = hod.csize
+    pos = numpy.concatenate(comm.allgather(hod['Position'].compute()))
+
+    # repopulate (with same seed --> same catalog)
+    hod.repopulate(seed=42)
+    assert hod.engine == 'native'
+    assert hod.csize == size
+    assert_allclose(numpy.concatenate(comm.allgather(hod['Position'].compute())), pos)
+
+    # new params, same seed
+    hod.repopulate(seed=42, alpha=1.0)
+    assert hod.csize != size
+
+    # more satellites per halo with a smaller logM1
+    fsat = hod.attrs['fsat']
+    hod.repopulate(seed=42, logM1=hod.attrs['logM1'] - 0.5)
+    assert hod.attrs['fsat'] > fsat
+
+    # bad param name
+    with pytest.raises(ValueError):
+        hod.repopulate(seed=42, bad_param_name=1.0)
+
 @MPITest([1, 4])
 def test_hod_cm(comm):
 
@@ -0,0 +1,132 @@
+import os
+import shutil
+import logging
+import numpy
+
+class MeshCache(object):
+    """
+    A persistent, on-disk cache of painted fields, stored as
+    :class:`~nbodykit.source.mesh.bigfile.BigFileMesh` files in a
+    directory.
+
+    Entries are evicted in least-recently-used order when the total size
+    of the cache exceeds ``size``. All methods are collective over ``comm``;
+    the file system operations are done on the root rank.
+
+    Parameters
+    ----------
+    path : str
+        the directory holding the cached meshes
+    size : int
+        the maximum total size of the cache in bytes
+    comm : MPI communicator
+        the MPI communicator
+    """
+    logger = logging.getLogger('MeshCache')
+
+    def __init__(self, path, size, comm):
+
+        self.path = path
+        self.size = size
+        self.comm = comm
+
+        if self.comm.rank == 0 and not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(self.path): raise
+        self.comm.barrier()
+
+    def filename(self, key):
+        """
+        The name of the file storing the entry ``key``.
+        """
+        return os.path.join(self.path, key + '.bigfile')
+
+    def get(self, key):
+        """
+        Return the :class:`~pmesh.pm.RealField` stored as ``key``, with
+        its ``attrs``, or ``None`` if the cache has no such entry.
+        """
+        from nbodykit.source.mesh.bigfile import BigFileMesh
+
+        filename = self.filename(key)
+        exists = None
+        if self.comm.rank == 0:
+            exists = os.path.exists(filename)
+        if not self.comm.bcast(exists):
+            return None
+
+        mesh = BigFileMesh(filename, 'Field', comm=self.comm)
+        real = mesh.to_real_field()
+
+        # restore the attributes of the field, rather than of the mesh
+        real.attrs = {}
+        for key in mesh.attrs:
+            if key in ['ndarray.shape', 'Nmesh', 'BoxSize']: continue
+            value = mesh.attrs[key]
+            if getattr(value, 'ndim', None) == 0:
+                value = value[()]
+            real.attrs[key] = value
+
+        # mark as recently used
+        if self.comm.rank == 0:
+            os.utime(filename, None)
+            self.logger.info("loaded mesh from cache %s" % filename)
+
+        return real
+
+    def put(self, key, field):
+        """
+        Store the field ``field``, and its ``attrs``, as the entry ``key``,
+        evicting the least recently used entries if the cache is full.
+        """
+        from nbodykit.source.mesh.field import FieldMesh
+
+        nbytes = self.comm.allreduce(field.value.nbytes)
+        if nbytes > self.size:
+            if self.comm.rank == 0:
+                self.logger.info("mesh of %d bytes is too large for the cache of %d bytes" % (nbytes, self.size))
+            return
+
+        # write to a temporary file first, such that readers never see a partial entry
+        filename = self.filename(key)
+        tmpname = None
+        if self.comm.rank == 0:
+            tmpname = filename + '.tmp-%d-%d' % (os.getpid(), numpy.random.randint(2**31))
+        tmpname = self.comm.bcast(tmpname)
+
+        mesh = FieldMesh(field)
+        mesh.attrs.update(field.attrs)
+        mesh.save(tmpname, dataset='Field', mode='real')
+
+        self.comm.barrier()
+        if self.comm.rank == 0:
+            if os.path.exists(filename):
+                shutil.rmtree(filename)
+            os.rename(tmpname, filename)
+            self.logger.info("saved mesh to cache %s" % filename)
+            self._evict()
+        self.comm.barrier()
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache fits
+        in :attr:`size` bytes; only called on the root rank.
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.bigfile'): continue
+            filename = os.path.join(self.path, name)
+            nbytes = 0
+            for root, dirs, files in os.walk(filename):
+                nbytes += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+            entries.append((os.path.getmtime(filename), nbytes, filename))
+
+        total = sum(e[1] for e in entries)
+        for mtime, nbytes, filename in sorted(entries):
+            if total <= self.size: break
+            shutil.rmtree(filename, ignore_errors=True)
+            total -= nbytes
+            self.logger.info("evicted mesh %s from cache" % filename)
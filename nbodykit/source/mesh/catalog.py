@@ -1,12 +1,61 @@
 from nbodykit.base.mesh import MeshSource
 from nbodykit import _global_options
+from nbodykit.utils import parse_bytes, ExchangeArrays
+from nbodykit.source.mesh.cache import MeshCache
+from mpi4py import MPI
 import numpy
 import logging
 import warnings
+import inspect
 
 # for converting from particle to mesh
 from pmesh import window
-from pmesh.pm import RealField, ComplexField
+from pmesh.pm import RealField, ComplexField, BaseComplexField
+
+def _accepts_keyword(func, name):
+    """
+    Return whether the callable ``func`` accepts the keyword ``name``.
+    """
+    try:
+        params = inspect.signature(func).parameters
+    except AttributeError: # Python 2
+        spec = inspect.getargspec(func)
+        return name in spec.args or spec.keywords is not None
+    return name in params or any(p.kind == p.VAR_KEYWORD for p in params.values())
+
+class _Prefetch(object):
+    """
+    Evaluate ``func(s)`` in a background thread; :func:`result` waits
+    for the thread and returns the result, raising any exception
+    that occurred in the thread.
+    """
+    def __init__(self, func, s):
+        import threading
+
+        self._result = None
+        self._error = None
+
+        def target():
+            try:
+                self._result = func(s)
+            except BaseException as e:
+                self._error = e
+
+        self._thread = threading.Thread(target=target)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def cancel(self):
+        """ Wait for the thread and discard its result. """
+        self._thread.join()
+        self._result = None
+        self._error = None
 
 class CatalogMesh(MeshSource):
     """
@@ -179,39 +228,218 @@ class CatalogMesh(MeshSource):
         See the :ref:`documentation <painting-mesh>` on painting for more
         details on painting catalogs to a mesh.
 
+        If the ``mesh_cache_dir`` option is set, the painted field is
+        stored on disk, and loaded instead of painted when the same
+        columns are painted again with the same mesh parameters; see
+        :class:`nbodykit.set_options`.
+
         Returns
         -------
         real : :class:`pmesh.pm.RealField`
             the painted real field; this has a ``attrs`` dict storing meta-data
         """
-
         pm = self.pm
-        Nlocal = 0 # (unweighted) number of particles read on local rank
-        Wlocal = 0 # (weighted) number of particles read on local rank
-        W2local = 0 # sum of weight square. This is used to estimate shotnoise.
-
-        # the paint brush window
-        resampler = window.methods[self.resampler]
 
-        # initialize the RealField to return
         if out is not None:
             assert isinstance(out, RealField), "output of to_real_field must be a RealField"
             numpy.testing.assert_array_equal(out.pm.Nmesh, pm.Nmesh)
-            toret = out
+
+        # the persistent cache of painted meshes
+        if _global_options['mesh_cache_dir'] is not None:
+            cache = MeshCache(_global_options['mesh_cache_dir'],
+                              parse_bytes(_global_options['mesh_cache_size']), pm.comm)
+            key = self._cache_key(normalize)
+
+            toret = cache.get(key)
+            if toret is None:
+                toret = self._paint_real_field(None, normalize)
+                cache.put(key, toret)
+
+            if out is not None:
+                out[:] += toret[:]
+                out.attrs = toret.attrs
+                toret = out
+            return toret
+
+        return self._paint_real_field(out, normalize)
+
+    def _paint_real_field(self, out, normalize):
+        """
+        Paint the density field, see :func:`to_real_field`.
+        """
+        pm = self.pm
+
+        if not self.interlaced:
+            # initialize the RealField to return
+            if out is not None:
+                toret = out
+            else:
+                toret = RealField(pm)
+                toret[:] = 0
+
+            N, W, W2, peak = self._paint(toret)
         else:
-            toret = RealField(pm)
-            toret[:] = 0
+            # we need two empty meshes even if out was provided
+            # since out may have non-zero elements, messing up our interlacing sum
+            c1, N, W, W2, peak = self._paint_interlaced()
 
-        # for interlacing, we need two empty meshes if out was provided
-        # since out may have non-zero elements, messing up our interlacing sum
-        if self.interlaced:
+            # FFT back to real-space, in place
+            real1 = c1.c2r(out=Ellipsis)
 
-            real1 = RealField(pm)
-            real1[:] = 0
+            # need to add to the returned mesh if user supplied "out"
+            if out is not None:
+                toret = out
+                toret[:] += real1[:]
+            else:
+                toret = real1
+
+        return self._finalize_field(toret, N, W, W2, peak, normalize)
+
+    def to_complex_field(self, out=None, normalize=True):
+        """
+        Paint the density field, returning the Fourier-space field.
+
+        For interlaced meshes, the two shifted meshes are transformed in
+        place and combined in Fourier space, skipping the round trip to
+        configuration space; the peak memory is that of two real meshes.
+        Otherwise, this is the in-place r2c transform of
+        :func:`to_real_field`.
+
+        The meta-data attributes are identical to those of
+        :func:`to_real_field`.
+
+        Returns
+        -------
+        complex : :class:`pmesh.pm.ComplexField`
+            the painted complex field; this has a ``attrs`` dict storing meta-data
+        """
+        # subclasses that compose the real field in to_real_field
+        # (e.g. multiple species), non-interlaced or cached meshes use r2c
+        if type(self).to_real_field is not CatalogMesh.to_real_field:
+            if _accepts_keyword(self.to_real_field, 'normalize'):
+                real = self.to_real_field(normalize=normalize)
+            else:
+                real = self.to_real_field()
+            toret = real.r2c(out=Ellipsis)
+            toret.attrs = real.attrs
+        elif not self.interlaced or _global_options['mesh_cache_dir'] is not None:
+            real = self.to_real_field(normalize=normalize)
+            toret = real.r2c(out=Ellipsis)
+            toret.attrs = real.attrs
+        else:
+            toret, N, W, W2, peak = self._paint_interlaced()
+            toret = self._finalize_field(toret, N, W, W2, peak, normalize)
+
+        if out is not None:
+            assert isinstance(out, BaseComplexField), "output of to_complex_field must be a ComplexField"
+            numpy.testing.assert_array_equal(out.pm.Nmesh, self.pm.Nmesh)
+            out[:] += toret[:]
+            out.attrs = toret.attrs
+            toret = out
+
+        return toret
+
+    def _cache_key(self, normalize):
+        """
+        The key of the painted field in the mesh cache.
+
+        This hashes the tokens of the painted columns and the selection,
+        which identify the files (with their modification times) or
+        the values of the columns, see :func:`CatalogSource._column_token`;
+        and the mesh parameters. The key does not depend on the number
+        of ranks.
+        """
+        from dask.base import tokenize
+
+        columns = [self.Position, self.Weight, self.Value, self.Selection]
+        tokens = [self.source._column_token(column) for column in columns]
+
+        return tokenize(tokens, self.pm.Nmesh, self.pm.BoxSize,
+                        self.dtype, self.resampler, self.interlaced, normalize)
+
+    def _paint_interlaced(self):
+        """
+        Paint to two meshes separated by 1/2 cell size, and compose the
+        interlaced field in Fourier space.
+
+        The r2c transforms are done in place, so only two meshes are
+        allocated.
+
+        Returns
+        -------
+        c1 : :class:`pmesh.pm.ComplexField`
+            the interlaced (un-normalized) complex field
+        N, W, W2, peak : int, float, float, int
+            the painting statistics, see :func:`_paint`
+        """
+        pm = self.pm
+
+        real1 = RealField(pm)
+        real1[:] = 0
+
+        # the second, shifted mesh (always needed)
+        real2 = RealField(pm)
+        real2[:] = 0
+
+        N, W, W2, peak = self._paint(real1, real2)
+
+        # compose the two interlaced fields into the final result.
+        c1 = real1.r2c(out=Ellipsis)
+        del real1
+        c2 = real2.r2c(out=Ellipsis)
+        del real2
+
+        # and then combine; the phase shift exp(0.5 i k.H) factorizes
+        # per dimension, so apply it in place without a full temporary
+        H = pm.BoxSize / pm.Nmesh
+        for i in range(3):
+            c2.value[...] *= numpy.exp(0.5 * 1j * c1.x[i] * H[i])
+        c1.value[...] += c2.value
+        c1.value[...] *= 0.5
+
+        return c1, N, W, W2, peak
+
+    def _paint(self, real1, real2=None):
+        """
+        Paint the catalog to ``real1`` in chunks; if interlaced, also paint
+        to ``real2``, shifted by half of a cell.
+
+        The chunks are sized by the ``paint_chunk_size`` option and,
+        if set, by the per-rank ``paint_memory_budget`` option, see
+        :func:`_paint_chunksize`. If some rank would receive too many
+        objects in the decomposition, the columns that were already
+        computed are split and painted in smaller pieces; they are
+        not computed again.
+
+        If the ``paint_pipeline`` option is set, the columns of the next
+        chunk are evaluated in a background thread while the current
+        chunk is exchanged and painted. If the current chunk is split,
+        the next chunk is evaluated again with the smaller size, such
+        that the chunks are the same as without the pipeline.
+
+        Returns
+        -------
+        N : int
+            the (unweighted) number of objects painted
+        W : float
+            the weighted number of objects painted
+        W2 : float
+            the sum of the square of the weights
+        peak : int
+            the estimated peak number of bytes of the particle data held
+            on any rank during painting, excluding the meshes
+        """
+        pm = self.pm
+        Nlocal = 0 # (unweighted) number of particles read on local rank
+        Wlocal = 0 # (weighted) number of particles read on local rank
+        W2local = 0 # sum of weight square. This is used to estimate shotnoise.
 
-            # the second, shifted mesh (always needed)
-            real2 = RealField(pm)
-            real2[:] = 0
+        # the paint brush window
+        resampler = window.methods[self.resampler]
+        if not self.interlaced:
+            smoothing = 0.5 * resampler.support
+        else:
+            smoothing = 1.0 * resampler.support
 
         Position = self.Position
         Weight = self.Weight
@@ -221,14 +449,70 @@ class CatalogMesh(MeshSource):
         # ensure the slices are synced, since decomposition is collective
         Nlocalmax = max(pm.comm.allgather(len(Position)))
 
-        H = pm.BoxSize / pm.Nmesh
+        # evaluate the next chunk in a thread while painting
+        pipeline = _global_options['paint_pipeline']
+
+        # the chunk size and the per-object sizes in bytes
+        max_chunksize, budget, local_nbytes, exchange_nbytes = self._paint_chunksize(smoothing)
+
+        # the estimated peak bytes on this rank
+        peak = [0]
+
+        def paint(position, weight, value):
+            """
+            Decompose and paint the computed columns; if some rank would
+            receive too many objects, split and paint in two halves.
+
+            Returns the number of pieces painted.
+            """
+            lay = pm.decompose(position, smoothing=smoothing)
 
-        # paint data in chunks on each rank;
-        # we do this by chunk 8 million is pretty big anyways.
-        max_chunksize = _global_options['paint_chunk_size']
+            # if we are receiving too many particles, retry the computed data in halves
+            nbytes = len(position) * local_nbytes + lay.newlength * exchange_nbytes
+            newlengths, allbytes = zip(*pm.comm.allgather((lay.newlength, nbytes)))
+            if budget is None:
+                throttle = max(newlengths) > 2 * max_chunksize
+            else:
+                throttle = max(allbytes) > budget
+
+            if throttle:
+                if pm.comm.rank == 0:
+                    if budget is None:
+                        self.logger.info("Throttling chunksize as some ranks will receive too many particles. (%d > %d)" % (max(newlengths), max_chunksize * 2))
+                    else:
+                        self.logger.info("Throttling chunksize as some ranks will exceed the memory budget. (%d > %d bytes)" % (max(allbytes), budget))
+
+                if max(pm.comm.allgather(len(position))) <= 1:
+                    raise RuntimeError("Cannot find a chunksize that fits into memory.")
+                del lay
 
-        # use a local scope to avoid having two copies of data in memory
-        def dochunk(s):
+                h = len(position) // 2
+                pieces = 0
+                for sl in [slice(None, h), slice(h, None)]:
+                    pieces += paint(position[sl], weight[sl], value[sl])
+                return pieces
+
+            peak[0] = max(peak[0], nbytes)
+
+            p, w, v = ExchangeArrays(lay, position, weight, value)
+
+            if not self.interlaced:
+                pm.paint(p, mass=w * v, resampler=resampler, hold=True, out=real1)
+
+            # interlacing: use 2 meshes separated by 1/2 cell size
+            else:
+                # in mesh units
+                shifted = pm.affine.shift(0.5)
+
+                # paint to two shifted meshes
+                pm.paint(p, mass=w * v, resampler=resampler, hold=True, out=real1)
+                pm.paint(p, mass=w * v, resampler=resampler, transform=shifted, hold=True, out=real2)
+
+            return 1
+
+        # use a local scope to avoid having two copies of data in memory;
+        # this does not call MPI, such that it can run in a thread
+        def compute(s):
             if len(Position) != 0:
 
                 # selection has to be computed many times when data is `large`.
@@ -261,45 +545,23 @@ class CatalogMesh(MeshSource):
             if value is None:
                 value = numpy.ones(len(position))
 
+            return position, weight, value
+
+        def dochunk(position, weight, value):
+
             # track total (selected) number and sum of weights
             Nlocal = len(position)
             Wlocal = weight.sum()
             W2local = (weight ** 2).sum()
 
-            # no interlacing
-            if not self.interlaced:
-                lay = pm.decompose(position, smoothing=0.5 * resampler.support)
-            else:
-                lay = pm.decompose(position, smoothing=1.0 * resampler.support)
+            pieces = paint(position, weight, value)
 
-            # if we are receiving too many particles, abort and retry with a smaller chunksize
-            newlengths = pm.comm.allgather(lay.newlength)
-            if any([newlength > 2 * max_chunksize for newlength in newlengths]):
-                if pm.comm.rank == 0:
-                    self.logger.info("Throttling chunksize as some ranks will receive too many particles. (%d > %d)" % (max(newlengths), max_chunksize * 2))
-                raise StopIteration
-
-            p = lay.exchange(position)
-            w = lay.exchange(weight)
-            v = lay.exchange(value)
-
-            if not self.interlaced:
-                pm.paint(p, mass=w * v, resampler=resampler, hold=True, out=toret)
-
-            # interlacing: use 2 meshes separated by 1/2 cell size
-            else:
-                # in mesh units
-                shifted = pm.affine.shift(0.5)
-
-                # paint to two shifted meshes
-                pm.paint(p, mass=w * v, resampler=resampler, hold=True, out=real1)
-                pm.paint(p, mass=w * v, resampler=resampler, transform=shifted, hold=True, out=real2)
-
-            return Nlocal, Wlocal, W2local
+            return Nlocal, Wlocal, W2local, pieces
 
         import gc
         i = 0
         chunksize = max_chunksize
+        prefetch = None
         while i < Nlocalmax:
 
             s = slice(i, i + chunksize)
@@ -308,12 +570,22 @@ class CatalogMesh(MeshSource):
                 self.logger.info("Chunk %d ~ %d / %d " % (i, i + chunksize, Nlocalmax))
 
             try:
-                Nlocal1, Wlocal1, W2local1 = dochunk(s)
-            except StopIteration:
-                chunksize = chunksize // 2
-                if chunksize < 1:
-                    raise RuntimeError("Cannot find a chunksize that fits into memory.")
-                continue
+                if prefetch is not None:
+                    columns = prefetch.result()
+                else:
+                    columns = compute(s)
+
+                # evaluate the next chunk while this one is exchanged and painted,
+                # sized as if this one is not split; at most two chunks are in
+                # flight, and all MPI calls are made in this thread, in the
+                # same order on all ranks
+                prefetch = None
+                if pipeline and i + chunksize < Nlocalmax:
+                    nextsize = min(max_chunksize, int(chunksize * 1.5))
+                    prefetch = _Prefetch(compute, slice(i + chunksize, i + chunksize + nextsize))
+
+                Nlocal1, Wlocal1, W2local1, pieces = dochunk(*columns)
+                del columns
             finally:
                 # collect unfreed items
                 gc.collect()
@@ -329,30 +601,16 @@ class CatalogMesh(MeshSource):
                     % (Nglobal, self.source.csize))
 
             i = i + chunksize
-            chunksize = min(max_chunksize, int(chunksize * 1.5))
-
-        # now the loop over particles is done
-
-        if not self.interlaced:
-            # nothing to do, toret is already filled.
-            pass
-        else:
-            # compose the two interlaced fields into the final result.
-            c1 = real1.r2c()
-            c2 = real2.r2c()
-
-            # and then combine
-            for k, s1, s2 in zip(c1.slabs.x, c1.slabs, c2.slabs):
-                kH = sum(k[i] * H[i] for i in range(3))
-                s1[...] = s1[...] * 0.5 + s2[...] * 0.5 * numpy.exp(0.5 * 1j * kH)
-
-            # FFT back to real-space
-            # NOTE: cannot use "toret" here in case user supplied "out"
-            c1.c2r(real1)
-
-            # need to add to the returned mesh if user supplied "out"
-            toret[:] += real1[:]
 
+            # shrink the following chunks if this one was split;
+            # the prefetched chunk is too large, so compute it again
+            if pieces > 1:
+                chunksize = max(chunksize // pieces, 1)
+                if prefetch is not None:
+                    prefetch.cancel()
+                    prefetch = None
+            else:
+                chunksize = min(max_chunksize, int(chunksize * 1.5))
 
         # unweighted number of objects
         N = pm.comm.allreduce(Nlocal)
@@ -363,6 +621,72 @@ class CatalogMesh(MeshSource):
         # weighted number of objects
         W2 = pm.comm.allreduce(W2local)
 
+        # the peak bytes on any rank
+        peak = pm.comm.allreduce(int(peak[0]), op=MPI.MAX)
+
+        return N, W, W2, peak
+
+    def _paint_chunksize(self, smoothing):
+        """
+        Return the number of objects to paint per chunk, from the
+        ``paint_chunk_size`` option and the per-rank
+        ``paint_memory_budget`` option.
+
+        The size of an object is estimated from the dtypes of the
+        columns being computed, and from the columns exchanged in the
+        decomposition. The latter are inflated by the fraction of
+        objects duplicated into the ghost regions of the domains, which
+        grows with the support of the resampler.
+
+        Returns
+        -------
+        chunksize : int
+            the number of objects per chunk
+        budget : int, None
+            the per-rank budget in bytes, or ``None`` if not set
+        local_nbytes : int
+            the bytes per object of the computed columns
+        exchange_nbytes : float
+            the bytes per object received in the decomposition
+        """
+        pm = self.pm
+
+        def itemsize(column, default=8):
+            if column is None:
+                return default
+            return column.dtype.itemsize * int(numpy.prod(column.shape[1:]))
+
+        # position, weight, value (ones if not set) and selection
+        local_nbytes = itemsize(self.Position) + itemsize(self.Weight) \
+                        + itemsize(self.Value) + itemsize(self.Selection, 0)
+
+        # the exchanged position, weight and value, and the painted mass
+        ghost = 1.0
+        for Nmesh, np in zip(pm.Nmesh, pm.np):
+            if np > 1:
+                width = 1.0 * Nmesh / np
+                ghost *= (width + 2 * smoothing) / width
+        exchange_nbytes = ghost * (itemsize(self.Position) + 3 * 8)
+
+        chunksize = _global_options['paint_chunk_size']
+        budget = _global_options['paint_memory_budget']
+        if budget is not None:
+            budget = parse_bytes(budget)
+            # the pipeline holds the computed columns of two chunks
+            if _global_options['paint_pipeline']:
+                local_nbytes = 2 * local_nbytes
+            chunksize = min(chunksize, int(budget // (local_nbytes + exchange_nbytes)))
+            chunksize = max(chunksize, 1)
+
+        return chunksize, budget, local_nbytes, exchange_nbytes
+
+    def _finalize_field(self, toret, N, W, W2, peak, normalize):
+        """
+        Attach the painting meta-data to the painted field ``toret``
+        and optionally normalize it to :math:`1+\delta`.
+        """
+        pm = self.pm
+
         # weighted number density (objs/cell)
         nbar = 1. * W / numpy.prod(pm.Nmesh)
 
@@ -384,18 +708,30 @@ class CatalogMesh(MeshSource):
         toret.attrs['W'] = W
         toret.attrs['W2'] = W
         toret.attrs['num_per_cell'] = nbar
+        toret.attrs['paint_peak_bytes'] = peak
 
-        csum = toret.csum()
         if pm.comm.rank == 0:
             self.logger.info("painted %d out of %d objects to mesh" %(N, self.source.csize))
             self.logger.info("mean particles per cell is %g", nbar)
-            self.logger.info("sum is %g ", csum)
+
+        if isinstance(toret, RealField):
+            csum = toret.csum()
+            if pm.comm.rank == 0:
+                self.logger.info("sum is %g ", csum)
 
         if normalize:
             if nbar > 0:
                 toret[...] /= nbar
-            else:
+            elif isinstance(toret, RealField):
                 toret[...] = 1
+            else:
+                # uniform density is the zero mode only
+                for i, s in zip(toret.slabs.i, toret.slabs):
+                    mask = True
+                    for i1 in i:
+                        mask = mask & (i1 == 0)
+                    s[...] = 0
+                    s[mask] = 1
 
             if pm.comm.rank == 0:
                 self.logger.info("normalized the convention to 1 + delta")
@@ -41,6 +41,30 @@ def test_paint_empty(comm):
     real = mesh.to_real_field(normalize=False)
     assert_allclose(real, 0.0)
 
+    complex = mesh.to_complex_field(normalize=True)
+    assert_allclose(complex.c2r(), 1.0)
+
+@MPITest([1, 4])
+def test_paint_interlaced_complex(comm):
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+
+    # interlacing with TSC
+    mesh = source.to_mesh(resampler='tsc', Nmesh=32, interlaced=True, compensated=True)
+
+    # painting directly to Fourier space skips the round trip to real space
+    c1 = mesh.to_complex_field()
+    c2 = mesh.to_real_field().r2c()
+
+    assert_allclose(c1, c2, atol=1e-6)
+    assert c1.attrs['N'] == source.csize
+    assert_allclose(c1.attrs['shotnoise'], 1 / 3e-4, rtol=1e-1)
+
+    # the compensated complex field
+    c1 = mesh.compute(mode='complex')
+    c2 = mesh.compute(mode='real').r2c()
+    assert_allclose(c1, c2, atol=1e-6)
+
 @MPITest([1])
 def test_paint_chunksize(comm):
 
@@ -57,6 +81,185 @@ def test_paint_chunksize(comm):
 
     assert_allclose(r1, r2)
 
+@MPITest([1, 4])
+def test_paint_memory_budget(comm):
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+    source['Weight'] = source.rng.uniform()
+
+    # interlacing with TSC
+    mesh = source.to_mesh(resampler='tsc', Nmesh=64, interlaced=True, compensated=True, weight='Weight')
+
+    r1 = mesh.compute()
+
+    # chunks sized by the budget
+    with set_options(paint_memory_budget='1MB'):
+        r2 = mesh.compute()
+
+    assert_allclose(r1, r2)
+    assert r2.attrs['N'] == source.csize
+    assert 0 < r2.attrs['paint_peak_bytes'] <= 1e6
+    assert r2.attrs['paint_peak_bytes'] < r1.attrs['paint_peak_bytes']
+
+    # the budget takes precedence over the chunk size
+    with set_options(paint_memory_budget=200000, paint_chunk_size=source.csize):
+        r3 = mesh.compute()
+
+    assert_allclose(r1, r3)
+    assert r3.attrs['paint_peak_bytes'] <= 200000
+
+@MPITest([1, 4])
+def test_paint_pipeline(comm):
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+    source['Weight'] = source.rng.uniform()
+
+    # interlacing with TSC
+    mesh = source.to_mesh(resampler='tsc', Nmesh=64, interlaced=True, compensated=True, weight='Weight')
+
+    with set_options(paint_chunk_size=source.csize // 7):
+        r1 = mesh.compute()
+
+    # prefetch the next chunk in a thread
+    with set_options(paint_chunk_size=source.csize // 7, paint_pipeline=True):
+        r2 = mesh.compute()
+
+    assert_array_equal(r1, r2)
+    assert r1.attrs['N'] == r2.attrs['N']
+    assert_allclose(r1.attrs['shotnoise'], r2.attrs['shotnoise'])
+
+@MPITest([4])
+def test_paint_pipeline_split(comm):
+    import logging
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+
+    # all objects in the domain of one rank, such that the chunks are split
+    source['Position'] = source['Position'] * 0.2
+
+    mesh = source.to_mesh(resampler='cic', Nmesh=64, compensated=True)
+
+    class Handler(logging.Handler):
+        def __init__(self):
+            logging.Handler.__init__(self)
+            self.messages = []
+        def emit(self, record):
+            self.messages.append(record.getMessage())
+
+    def paint(**options):
+        handler = Handler()
+        mesh.logger.addHandler(handler)
+        try:
+            with set_options(paint_chunk_size=source.csize // 28, **options):
+                r = mesh.compute()
+        finally:
+            mesh.logger.removeHandler(handler)
+        # only logged on the root rank
+        return r, comm.bcast(handler.messages)
+
+    r1, log1 = paint()
+    r2, log2 = paint(paint_pipeline=True)
+
+    assert any(m.startswith('Throttling') for m in log1)
+
+    # the pipeline paints the same shrunk chunks
+    chunks1 = [m for m in log1 if m.startswith(('Chunk', 'Throttling'))]
+    chunks2 = [m for m in log2 if m.startswith(('Chunk', 'Throttling'))]
+    assert chunks1 == chunks2
+
+    assert_array_equal(r1, r2)
+    assert r1.attrs['N'] == r2.attrs['N'] == source.csize
+
+@MPITest([1, 4])
+def test_mesh_cache(comm):
+    import tempfile
+    import shutil
+    import os
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+    source['Weight'] = source.rng.uniform()
+
+    # interlacing with TSC
+    mesh = source.to_mesh(resampler='tsc', Nmesh=32, interlaced=True, compensated=True, weight='Weight')
+    r1 = mesh.compute()
+
+    tmpdir = comm.bcast(tempfile.mkdtemp() if comm.rank == 0 else None)
+    with set_options(mesh_cache_dir=tmpdir):
+
+        # paint and save to the cache
+        r2 = mesh.compute()
+        assert len(os.listdir(tmpdir)) == 1
+
+        # load from the cache
+        r3 = mesh.compute()
+        assert len(os.listdir(tmpdir)) == 1
+
+        # a different selection is a different entry
+        mesh2 = source.to_mesh(resampler='tsc', Nmesh=32, interlaced=True, compensated=True, weight='Weight')
+        mesh2.Selection = source['Weight'] > 0.5
+        r4 = mesh2.compute()
+        assert len(os.listdir(tmpdir)) == 2
+
+    assert_allclose(r1, r2, rtol=1e-5)
+    assert_allclose(r1, r3, rtol=1e-5)
+    assert r4.attrs['N'] < r1.attrs['N']
+    for key in ['N', 'W', 'shotnoise', 'num_per_cell']:
+        assert_allclose(r3.attrs[key], r1.attrs[key])
+
+    # evict the least recently used mesh
+    with set_options(mesh_cache_dir=tmpdir, mesh_cache_size=32**3 * 4 * 1.5):
+        mesh2.Selection = source['Weight'] > 0.2
+        mesh2.compute()
+        assert len(os.listdir(tmpdir)) == 1
+
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(tmpdir)
+
+@MPITest([4])
+def test_mesh_cache_nranks(comm):
+    import tempfile
+    import shutil
+    import os
+    from mpi4py import MPI
+
+    tmpfile = comm.bcast(tempfile.mkstemp()[1] if comm.rank == 0 else None)
+
+    dset = numpy.empty(4096, dtype=[('Position', ('f4', 3)), ('Mass', 'f4')])
+    dset['Position'] = numpy.random.RandomState(42).uniform(0, 512., size=(4096, 3))
+    dset['Mass'] = numpy.random.RandomState(84).uniform(size=4096)
+    if comm.rank == 0:
+        with open(tmpfile, 'wb') as ff:
+            for col in dset.dtype.names:
+                dset[col].tofile(ff)
+    comm.barrier()
+
+    def paint(comm):
+        source = BinaryCatalog(tmpfile, dtype=dset.dtype, comm=comm)
+        mesh = source.to_mesh(Nmesh=32, BoxSize=512., weight='Mass')
+        mesh.Selection = source['Mass'] > 0.5
+        r = mesh.compute()
+        return r.cmean(), r.attrs['N']
+
+    tmpdir = comm.bcast(tempfile.mkdtemp() if comm.rank == 0 else None)
+    with set_options(mesh_cache_dir=tmpdir):
+        cmean, N = paint(comm)
+        assert len(os.listdir(tmpdir)) == 1
+
+        # a different number of ranks loads the same entry
+        sub = comm.Split(0 if comm.rank < 2 else MPI.UNDEFINED)
+        if sub != MPI.COMM_NULL:
+            cmean2, N2 = paint(sub)
+            assert len(os.listdir(tmpdir)) == 1
+            assert N2 == N
+            assert_allclose(cmean2, cmean, rtol=1e-5)
+            sub.Free()
+
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(tmpdir)
+        os.unlink(tmpfile)
+
 @MPITest([1, 4])
 def test_shotnoise(comm):
 
@@ -124,3 +124,23 @@ def test_paint_interlaced(comm):
     assert_allclose(combined.cmean(), 1.0)
     # must be the same
     assert_allclose(combined.value, (real1.value + real2.value)/norm, atol=1e-5)
+
+@MPITest([1, 4])
+def test_complex_field_unnormalized(comm):
+
+    # the catalog
+    source1 = UniformCatalog(nbar=3e-5, BoxSize=512., seed=42, comm=comm)
+    source2 = UniformCatalog(nbar=3e-5, BoxSize=512., seed=84, comm=comm)
+    cat = MultipleSpeciesCatalog(['data', 'randoms'], source1, source2)
+
+    mesh = cat.to_mesh(Nmesh=32, BoxSize=512)
+
+    # to_complex_field must honor normalize=False
+    real = mesh.to_real_field(normalize=False)
+    complex = mesh.to_complex_field(normalize=False)
+    assert_allclose(complex.value, real.r2c().value, atol=1e-5)
+
+    # the normalized field differs by num_per_cell
+    complex1 = mesh.to_complex_field()
+    norm = complex1.attrs['num_per_cell']
+    assert_allclose(complex1.value * norm, complex.value, atol=1e-5)
@@ -84,3 +84,57 @@ def test_mpirng_poisson(comm):
 
     assert_array_equal(all, correct)
 
+
+@MPITest([4])
+def test_mpirng_counter(comm):
+    rng = MPIRandomState(comm, seed=1234, size=10, mode='counter')
+
+    local = rng.uniform(low=numpy.ones(rng.size)[:, None] * 0.5, itemshape=(3,))
+    all = numpy.concatenate(comm.allgather(local), axis=0)
+
+    # invariant under the chunksize
+    rng1 = MPIRandomState(MPI.COMM_SELF, seed=1234, size=rng.csize, chunksize=3, mode='counter')
+
+    correct = rng1.uniform(low=0.5, itemshape=(3,))
+
+    assert_array_equal(all, correct)
+
+    # it shouldn't be the same!
+    assert (rng.uniform() != rng.uniform()).any()
+
+@MPITest([4])
+def test_mpirng_counter_poisson(comm):
+    from nbodykit import set_options
+
+    with set_options(mpirng_mode='counter'):
+        rng = MPIRandomState(comm, seed=1234, size=10 * (comm.rank + 1))
+        rng1 = MPIRandomState(MPI.COMM_SELF, seed=1234, size=rng.csize)
+    assert rng.mode == 'counter'
+
+    lam = numpy.linspace(0, 5, rng.csize)
+    start = sum(comm.allgather(rng.size)[:comm.rank])
+    local = rng.poisson(lam=lam[start:start + rng.size])
+    all = numpy.concatenate(comm.allgather(local), axis=0)
+
+    correct = rng1.poisson(lam=lam)
+
+    assert_array_equal(all, correct)
+    assert (correct[lam == 0] == 0).all()
+
+def test_poisson_ppf():
+    from nbodykit.mpirng import _poisson_ppf
+    from scipy.stats import poisson
+
+    rng = numpy.random.RandomState(42)
+    u = rng.uniform(size=10000)
+    for lam in [numpy.zeros(len(u)), rng.uniform(0, 3, size=len(u)), 10 ** rng.uniform(-5, 6, size=len(u))]:
+        assert_array_equal(_poisson_ppf(u, lam), poisson.ppf(u, lam))
+
+@MPITest([1])
+def test_mpirng_counter_bounds(comm):
+    rng = MPIRandomState(comm, seed=1234, size=100000, mode='counter')
+
+    # the uniforms are strictly within (0, 1)
+    u = rng.uniform()
+    assert (u > 0).all() and (u < 1).all()
+    assert numpy.isfinite(rng.normal()).all()
@@ -1,7 +1,8 @@
 from runtests.mpi import MPITest
 from nbodykit.lab import *
-from nbodykit import setup_logging
+from nbodykit import setup_logging, set_options
 from nbodykit.utils import ScatterArray, GatherArray, FrontPadArray
+from nbodykit.utils import SortPermutation, PermuteArray, ParallelSort
 from numpy.testing import assert_array_equal
 import os
 import pytest
@@ -217,6 +218,31 @@ def test_frontpad_array(comm):
     for i in range(comm.rank):
         assert_array_equal(data2[(comm.rank - i - 1) * 10:(comm.rank - i)* 10], comm.rank - i - 1)
 
+@MPITest([1, 4])
+def test_exchange_arrays(comm):
+    from nbodykit.utils import ExchangeArrays
+    from pmesh.domain import GridND
+
+    rng = numpy.random.RandomState(comm.rank)
+    pos = rng.uniform(0, 1, size=(1000, 3))
+    weight = rng.uniform(size=1000).astype('f4')
+    index = numpy.arange(1000) + 1000 * comm.rank
+
+    grid = [numpy.linspace(0, 1, 3, endpoint=True)] * 3
+    domain = GridND(grid, comm=comm)
+    layout = domain.decompose(pos, smoothing=0.1)
+
+    # a single exchange for all arrays
+    pos2, weight2, index2 = ExchangeArrays(layout, pos, weight, index)
+    assert_array_equal(pos2, layout.exchange(pos))
+    assert_array_equal(weight2, layout.exchange(weight))
+    assert_array_equal(index2, layout.exchange(index))
+    assert weight2.dtype == weight.dtype
+
+    # mismatched lengths
+    with pytest.raises(ValueError):
+        ExchangeArrays(layout, pos, weight[:10])
+
 @MPITest([4])
 def test_distributed_array_topo(comm):
     from nbodykit.utils import DistributedArray, EmptyRank
@@ -337,3 +363,75 @@ def test_distributed_array_bincount_gaps(comm):
     assert_array_equal( numpy.concatenate(comm.allgather(N.local)),
         [1, 1, 0, 4, 0, 2])
 
+
+@MPITest([1, 4])
+def test_sort_permutation(comm):
+    rng = numpy.random.RandomState(1234)
+    sizes = rng.randint(0, 200, size=comm.size)
+    sizes[-1] = 0
+    keys = [rng.randint(-5, 5, size=(n, 2)).astype('i4') for n in sizes]
+    values = [rng.normal(size=n).astype('f4') for n in sizes]
+
+    key = numpy.concatenate(keys)
+    value = numpy.concatenate(values)
+
+    for engine in ['mpsort', 'samplesort']:
+        # stable sort; the second column is more significant
+        dest = SortPermutation(keys[comm.rank], comm, engine=engine, nranks=2)
+        dest = numpy.concatenate(comm.allgather(dest))
+        assert_array_equal(dest.argsort(), numpy.lexsort((key[:, 0], key[:, 1])))
+
+        dest = SortPermutation(values[comm.rank], comm, engine=engine)
+        dest = numpy.concatenate(comm.allgather(dest))
+        assert_array_equal(dest.argsort(), value.argsort(kind='mergesort'))
+
+@MPITest([4])
+def test_sort_permutation_duplicates(comm):
+    from nbodykit.utils import _samplesort_ranks, _sort_words
+
+    # few distinct keys, all of a value on the first rank
+    key = numpy.zeros(1000 * (comm.rank == 0) + 10, dtype='i8')
+    key[::3] = 1
+    allkey = numpy.concatenate(comm.allgather(key))
+
+    dest = SortPermutation(key, comm, engine='samplesort')
+    dest = numpy.concatenate(comm.allgather(dest))
+    assert_array_equal(dest.argsort(), allkey.argsort(kind='mergesort'))
+
+    # runs of equal keys are split evenly between the ranks
+    data = numpy.empty(len(key), dtype=[('w0', 'u8'), ('origin', 'i8')])
+    data['w0'] = _sort_words(key)[:, 0]
+    data['origin'] = numpy.arange(len(key)) + sum(comm.allgather(len(key))[:comm.rank])
+    counts = numpy.bincount(_samplesort_ranks(data, comm.size, 32, comm), minlength=comm.size)
+    counts = comm.allreduce(counts)
+    assert counts.max() <= 1.25 * len(allkey) / comm.size
+
+@MPITest([1, 4])
+def test_parallel_sort(comm):
+    rng = numpy.random.RandomState(1234)
+    data = numpy.empty(rng.randint(0, 200, size=comm.size)[comm.rank],
+                       dtype=[('key', 'u8'), ('value', ('f8', 3))])
+    data['key'] = numpy.random.RandomState(comm.rank).randint(0, 100, size=len(data))
+    data['value'] = numpy.random.RandomState(comm.rank).normal(size=(len(data), 3))
+    alldata = numpy.concatenate(comm.allgather(data))
+
+    for engine in ['mpsort', 'samplesort']:
+        with set_options(sort_engine=engine):
+            # all on the first rank
+            out = numpy.empty(len(alldata) if comm.rank == 0 else 0, dtype=data.dtype)
+            ParallelSort(data.copy(), orderby='key', out=out, comm=comm)
+            out = numpy.concatenate(comm.allgather(out))
+            assert_array_equal(out['key'], numpy.sort(alldata['key']))
+            assert_array_equal(numpy.sort(out['value'].sum(axis=-1)),
+                               numpy.sort(alldata['value'].sum(axis=-1)))
+
+@MPITest([4])
+def test_permute_array(comm):
+    N = [10, 0, 5, 7]
+    start = sum(N[:comm.rank])
+    data = numpy.arange(start, start + N[comm.rank])
+    dest = sum(N) - 1 - data
+
+    out = PermuteArray(data, dest, comm, size=[0, 11, 11, 0][comm.rank])
+    out = numpy.concatenate(comm.allgather(out))
+    assert_array_equal(out, numpy.arange(sum(N))[::-1])
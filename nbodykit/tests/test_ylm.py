@@ -0,0 +1,78 @@
+from nbodykit.ylm import get_real_Ylm, get_complex_Ylm, power_table
+from numpy.testing import assert_allclose
+import numpy
+import pytest
+
+def random_unit_vectors(N, seed=42):
+    rng = numpy.random.RandomState(seed)
+    theta = numpy.arccos(rng.uniform(-1, 1, size=N))
+    phi = rng.uniform(0, 2*numpy.pi, size=N)
+    return theta, phi
+
+def scipy_ylm(l, m, theta, phi):
+    """
+    The complex spherical harmonic from SciPy, at polar angle ``theta``
+    and azimuthal angle ``phi``; ``sph_harm`` is removed in SciPy 1.17.
+    """
+    try:
+        from scipy.special import sph_harm_y
+    except ImportError:
+        from scipy.special import sph_harm
+        return sph_harm(m, l, phi, theta)
+    return sph_harm_y(l, m, theta, phi)
+
+def test_complex_ylm():
+
+    theta, phi = random_unit_vectors(100)
+    xpyhat = numpy.sin(theta) * numpy.exp(1j*phi)
+    zhat = numpy.cos(theta)
+
+    for l in range(0, 11):
+        for m in range(0, l+1):
+            Ylm = get_complex_Ylm(l, m)
+            assert_allclose(Ylm(xpyhat, zhat), scipy_ylm(l, m, theta, phi), atol=1e-10)
+
+def test_real_ylm():
+
+    theta, phi = random_unit_vectors(100)
+    xhat = numpy.sin(theta) * numpy.cos(phi)
+    yhat = numpy.sin(theta) * numpy.sin(phi)
+    zhat = numpy.cos(theta)
+
+    for l in range(0, 11):
+        for m in range(-l, l+1):
+            Y = scipy_ylm(l, abs(m), theta, phi)
+            if m < 0:
+                expected = 2**0.5 * (-1)**m * Y.imag
+            elif m > 0:
+                expected = 2**0.5 * (-1)**m * Y.real
+            else:
+                expected = Y.real
+
+            Ylm = get_real_Ylm(l, m)
+            assert_allclose(Ylm(xhat, yhat, zhat), expected, atol=1e-10)
+
+def test_shared_tables():
+
+    theta, phi = random_unit_vectors(10)
+    xhat = numpy.sin(theta) * numpy.cos(phi)
+    yhat = numpy.sin(theta) * numpy.sin(phi)
+    zhat = numpy.cos(theta)
+
+    # kernels are evaluated from the same tables of powers
+    table = [power_table(x, 4) for x in (xhat, yhat, zhat)]
+    for m in range(-4, 5):
+        Ylm = get_real_Ylm(4, m)
+        assert_allclose(Ylm.evaluate(table), Ylm(xhat, yhat, zhat))
+
+def test_registry():
+
+    # the kernels are created once per process
+    assert get_real_Ylm(3, -2) is get_real_Ylm(3, -2)
+    assert get_complex_Ylm(3, 2) is get_complex_Ylm(3, 2)
+
+    with pytest.raises(ValueError):
+        get_real_Ylm(2, 3)
+
+    with pytest.raises(ValueError):
+        get_complex_Ylm(2, -1)
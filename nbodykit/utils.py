@@ -1,5 +1,6 @@
 import numpy
 from mpi4py import MPI
+import mpsort
 import warnings
 import functools
 import contextlib
@@ -364,6 +365,418 @@ def FrontPadArray(array, front, comm):
     recvbuf = comm.alltoall(sendbuf)
     return numpy.concatenate(list(recvbuf) + [array], axis=0)
 
+def ExchangeArrays(layout, *arrays):
+    """
+    Exchange several arrays with a domain decomposition layout in a
+    single collective operation.
+
+    The arrays are packed into one structured array, which is exchanged
+    with one call to ``layout.exchange``, and then unpacked. This
+    replaces one alltoallv per array with a single one.
+
+    Parameters
+    ----------
+    layout : :class:`pmesh.domain.Layout`
+        the layout returned by the domain decomposition
+    *arrays : array_like
+        the arrays to exchange; each must have the same length, equal
+        to the number of positions used to build the layout
+
+    Returns
+    -------
+    tuple of array_like :
+        the exchanged arrays, in the same order as the input
+    """
+    if len(arrays) == 0:
+        return ()
+
+    arrays = [numpy.asarray(a) for a in arrays]
+    if any(len(a) != len(arrays[0]) for a in arrays[1:]):
+        raise ValueError("arrays must have the same length in ExchangeArrays")
+
+    # no need to pack a single array
+    if len(arrays) == 1:
+        return (layout.exchange(arrays[0]),)
+
+    # pack the arrays into a structured buffer
+    names = ['f%d' % i for i in range(len(arrays))]
+    dtype = numpy.dtype([(name, a.dtype, a.shape[1:]) for name, a in zip(names, arrays)])
+    buffer = numpy.empty(len(arrays[0]), dtype=dtype)
+    for name, a in zip(names, arrays):
+        buffer[name] = a
+
+    # one exchange for all arrays
+    buffer = layout.exchange(buffer)
+
+    # unpack to contiguous arrays
+    return tuple(numpy.ascontiguousarray(buffer[name]) for name in names)
+
+def AlltoallvArray(data, rank, comm):
+    """
+    Send the items of an array to the given ranks, with a single
+    ``Alltoallv``.
+
+    As in :func:`GatherArray`, the items are sent as bytes, which avoids
+    mpi4py pickling.
+
+    Parameters
+    ----------
+    data : array_like
+        the local items to send
+    rank : array_like
+        the rank each item is sent to
+    comm : MPI communicator
+        the MPI communicator
+
+    Returns
+    -------
+    recvbuffer : array_like
+        the received items, ordered by the sending rank; the items from
+        one rank keep their original order
+    """
+    data = numpy.asarray(data)
+    rank = numpy.asarray(rank, dtype='intp')
+
+    order = rank.argsort(kind='mergesort')
+    data = numpy.ascontiguousarray(data[order])
+
+    sendcounts = numpy.bincount(rank, minlength=comm.size)
+    recvcounts = numpy.array(comm.alltoall(sendcounts.tolist()), dtype='intp')
+    sendoffsets = numpy.zeros_like(sendcounts)
+    sendoffsets[1:] = sendcounts.cumsum()[:-1]
+    recvoffsets = numpy.zeros_like(recvcounts)
+    recvoffsets[1:] = recvcounts.cumsum()[:-1]
+
+    recvbuffer = numpy.empty((recvcounts.sum(),) + data.shape[1:], dtype=data.dtype)
+
+    # setup the custom dtype
+    itemsize = data.dtype.itemsize * int(numpy.prod(data.shape[1:]))
+    dt = MPI.BYTE.Create_contiguous(itemsize)
+    dt.Commit()
+
+    comm.Alltoallv([data, (sendcounts, sendoffsets), dt],
+                   [recvbuffer, (recvcounts, recvoffsets), dt])
+    dt.Free()
+
+    return recvbuffer
+
+def _radix_key(array, reverse=False):
+    """
+    Return an unsigned 64-bit integer key for ``array``, whose unsigned
+    integer order is the same as the numerical order of ``array``.
+
+    Floating point numbers are mapped by flipping all bits of negative
+    numbers and the sign bit of positive numbers; signed integers by
+    flipping the sign bit.
+    """
+    dt = array.dtype
+    if issubclass(dt.type, numpy.floating) and dt.itemsize in (4, 8):
+        bits = array.view('u%d' % dt.itemsize)
+        signbit = bits.dtype.type(1) << bits.dtype.type(8 * dt.itemsize - 1)
+        key = numpy.where(bits & signbit, ~bits, bits | signbit).astype('u8')
+    elif issubclass(dt.type, numpy.signedinteger):
+        key = array.astype('i8').view('u8') ^ numpy.uint64(1 << 63)
+    elif issubclass(dt.type, numpy.unsignedinteger):
+        key = array.astype('u8')
+    else:
+        raise TypeError("cannot sort by dtype '%s'; must be integer or floating type" % str(dt))
+
+    if reverse:
+        key = ~key
+    return key
+
+def _sort_words(key):
+    """
+    The sort key as a (N, M) array of u8 words. As in :mod:`mpsort`,
+    the later columns of a 2d key are more significant.
+    """
+    key = numpy.asarray(key)
+    if key.ndim == 1:
+        key = key[:, None]
+    if key.ndim != 2:
+        raise ValueError("sort key must be 1d or 2d")
+
+    words = numpy.empty(key.shape, dtype='u8')
+    for i in range(key.shape[1]):
+        words[:, i] = _radix_key(key[:, i])
+    return words
+
+def SortPermutation(key, comm, engine=None, nranks=None, oversample=32):
+    """
+    Return the position of each item in the global sorted order of
+    ``key``. The sort is stable: items with equal keys keep their
+    original global order.
+
+    Only the keys and 8-byte indices are moved between ranks. Use
+    :func:`PermuteArray` to move the data to the sorted positions.
+
+    Parameters
+    ----------
+    key : array_like
+        the local sort keys, of integer or floating type; if 2d, the
+        later columns are more significant, as in :mod:`mpsort`
+    comm : MPI communicator
+        the MPI communicator
+    engine : 'mpsort', 'samplesort', optional
+        the sort engine; defaults to the ``sort_engine`` option. 'mpsort'
+        sorts the keys with :mod:`mpsort`; 'samplesort' sends the keys
+        to the ranks of a splitting obtained from a global histogram of
+        sampled keys, and sorts them locally.
+    nranks : int, optional
+        the number of ranks (the first ones of ``comm``) holding the keys
+        in the local sorts of 'samplesort'; defaults to the ``sort_nranks``
+        option, and ``None`` to use all ranks
+    oversample : int, optional
+        the number of candidate splitters per target rank of 'samplesort'
+
+    Returns
+    -------
+    dest : array_like
+        the global position of each local item in the sorted order
+    """
+    from nbodykit import _global_options
+
+    if engine is None:
+        engine = _global_options['sort_engine']
+    if nranks is None:
+        nranks = _global_options['sort_nranks']
+    if nranks is None:
+        nranks = comm.size
+    nranks = max(1, min(nranks, comm.size))
+
+    words = _sort_words(key)
+    nwords = words.shape[1]
+
+    # the global index of the local items
+    sizes = numpy.array(comm.allgather(len(words)), dtype='i8')
+    offsets = numpy.zeros(comm.size + 1, dtype='i8')
+    offsets[1:] = sizes.cumsum()
+    start = offsets[comm.rank]
+    index = numpy.arange(start, start + len(words), dtype='i8')
+
+    if engine == 'mpsort':
+        # the global index is the least significant word; it makes the
+        # sort stable, and finds the origin of the sorted items
+        data = numpy.empty(len(words), dtype=[('key', ('u8', (nwords + 1,)))])
+        data['key'][:, 1:] = words
+        data['key'][:, 0] = index
+        mpsort.sort(data, orderby='key', comm=comm)
+        origin = data['key'][:, 0].astype('i8')
+        position = index
+
+    elif engine == 'samplesort':
+        # a record that numpy compares lexicographically, most significant
+        # first; the origin breaks the ties, such that the sort is stable
+        # and runs of equal keys can be split between ranks
+        names = ['w%d' % i for i in reversed(range(nwords))] + ['origin']
+        data = numpy.empty(len(words), dtype=[(name, 'u8') for name in names[:-1]] + [('origin', 'i8')])
+        for i in range(nwords):
+            data['w%d' % i] = words[:, i]
+        data['origin'] = index
+        del words
+
+        data = AlltoallvArray(data, _samplesort_ranks(data, nranks, oversample, comm), comm)
+        data = data[numpy.lexsort([data[name] for name in reversed(names)])]
+        origin = data['origin']
+
+        rstart = numpy.sum(comm.allgather(len(data))[:comm.rank], dtype='i8')
+        position = numpy.arange(rstart, rstart + len(data), dtype='i8')
+
+    else:
+        raise ValueError("sort engine should be 'mpsort' or 'samplesort'; got '%s'" % engine)
+
+    # send the sorted positions back to the origin of the items
+    pairs = numpy.empty(len(origin), dtype=[('origin', 'i8'), ('dest', 'i8')])
+    pairs['origin'] = origin
+    pairs['dest'] = position
+    del data
+    pairs = AlltoallvArray(pairs, offsets.searchsorted(origin, side='right') - 1, comm)
+
+    dest = numpy.empty(len(index), dtype='i8')
+    dest[pairs['origin'] - start] = pairs['dest']
+    return dest
+
+def _samplesort_ranks(data, nranks, oversample, comm):
+    """
+    The rank of each item in the local sorts of the 'samplesort' engine
+    of :func:`SortPermutation`, evenly splitting the items between the
+    first ``nranks`` ranks.
+
+    The splitters are chosen from ``oversample`` candidates per rank,
+    evenly sampled from all ranks, by a global histogram of the items in
+    the candidate bins. The items must be unique records.
+    """
+    total = comm.allreduce(len(data))
+
+    ncand = oversample * nranks * len(data) // max(total, 1) + 1
+    ncand = min(ncand, len(data))
+    cand = data[numpy.linspace(0, len(data) - 1, ncand).astype('intp')]
+    cand = numpy.unique(GatherArray(cand, comm, root=Ellipsis))
+
+    hist = numpy.bincount(cand.searchsorted(data, side='right'),
+                          minlength=len(cand) + 1)
+    hist = comm.allreduce(hist)
+    cumcount = hist.cumsum()[:-1]
+    target = total * numpy.arange(1, nranks) // nranks
+    if len(cand) > 0:
+        i = cumcount.searchsorted(target).clip(0, len(cand) - 1)
+        splitters = cand[i]
+    else:
+        splitters = cand
+
+    return splitters.searchsorted(data, side='right')
+
+def PermuteArray(data, dest, comm, size=None):
+    """
+    Move the items of a distributed array to the global positions
+    ``dest``, with a single exchange.
+
+    Parameters
+    ----------
+    data : array_like
+        the local items
+    dest : array_like
+        the global position of each local item, a permutation over all
+        ranks, e.g. from :func:`SortPermutation`
+    comm : MPI communicator
+        the MPI communicator
+    size : int, optional
+        the number of items on this rank after the permutation; defaults
+        to ``len(data)``
+
+    Returns
+    -------
+    out : array_like
+        the items at the positions of this rank
+    """
+    data = numpy.asarray(data)
+    if size is None:
+        size = len(data)
+
+    offsets = numpy.zeros(comm.size + 1, dtype='i8')
+    offsets[1:] = numpy.cumsum(comm.allgather(size))
+    start = offsets[comm.rank]
+
+    buffer = numpy.empty(len(data), dtype=[('dest', 'i8'), ('data', data.dtype, data.shape[1:])])
+    buffer['dest'] = dest
+    buffer['data'] = data
+    buffer = AlltoallvArray(buffer, offsets.searchsorted(dest, side='right') - 1, comm)
+
+    out = numpy.empty((size,) + data.shape[1:], dtype=data.dtype)
+    out[buffer['dest'] - start] = buffer['data']
+    return out
+
+def ParallelSort(data, orderby=None, out=None, comm=None):
+    """
+    Sort a distributed array, with the engine selected by the
+    ``sort_engine`` option.
+
+    This has the signature of :func:`mpsort.sort`, which is used by the
+    'mpsort' engine. The 'samplesort' engine moves the keys and 8-byte
+    indices with :func:`SortPermutation`, and each item only once with
+    :func:`PermuteArray`, instead of shuffling the full items during the
+    sort.
+
+    Parameters
+    ----------
+    data : array_like
+        the local items
+    orderby : str, array_like, None
+        the name of the field of ``data`` to sort by, or the sort keys;
+        if None, sort by ``data``
+    out : array_like, optional
+        the output array, of the same global size; if None, sort in place
+    comm : MPI communicator
+        the MPI communicator
+
+    Returns
+    -------
+    out : array_like
+        the sorted array
+    """
+    from nbodykit import _global_options
+
+    if comm is None:
+        comm = MPI.COMM_WORLD
+
+    if _global_options['sort_engine'] == 'mpsort':
+        return mpsort.sort(data, orderby=orderby, out=out, comm=comm)
+
+    if orderby is None:
+        key = data
+    elif isinstance(orderby, str):
+        key = data[orderby]
+    else:
+        key = orderby
+
+    if out is None:
+        out = data
+
+    dest = SortPermutation(key, comm)
+    out[...] = PermuteArray(data, dest, comm, size=len(out))
+    return out
+
+def _mix64(x):
+    """ The splitmix64 finalizer, on an array of uint64. """
+    x = x ^ (x >> numpy.uint64(30))
+    x = x * numpy.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> numpy.uint64(27))
+    x = x * numpy.uint64(0x94d049bb133111eb)
+    x = x ^ (x >> numpy.uint64(31))
+    return x
+
+def HashArray(data, comm, chunksize=None):
+    """
+    A hash of the values of a distributed array, which does not depend
+    on the number of ranks the array is distributed on.
+
+    Each item is hashed with its global index, and the hashes are
+    summed, modulo 2**64. The items on a rank are read in chunks, such
+    that ``data`` can be a dask array larger than the memory.
+
+    Parameters
+    ----------
+    data : array_like
+        the local items; the global array is the items of all ranks,
+        in the order of the ranks
+    comm : MPI communicator
+        the MPI communicator
+    chunksize : int, optional
+        the number of items read at once; defaults to the
+        ``paint_chunk_size`` option
+
+    Returns
+    -------
+    hash : str
+        the hash, as a hexadecimal string
+    """
+    from nbodykit import _global_options
+
+    if chunksize is None:
+        chunksize = _global_options['paint_chunk_size']
+
+    size = len(data)
+    offset = sum(comm.allgather(size)[:comm.rank])
+
+    h = 0
+    with numpy.errstate(over='ignore'):
+        for i in range(0, size, chunksize):
+            x = numpy.ascontiguousarray(data[i:i + chunksize])
+
+            # the bytes of each item, as 8-byte words
+            b = x.reshape(len(x), -1).view('u1')
+            w = numpy.zeros((len(x), -(-b.shape[1] // 8) * 8), dtype='u1')
+            w[:, :b.shape[1]] = b
+            w = w.view('u8')
+
+            hi = _mix64(numpy.arange(offset + i, offset + i + len(x), dtype='u8'))
+            for j in range(w.shape[1]):
+                hi = _mix64(hi ^ w[:, j])
+            h += int(hi.sum(dtype='u8'))
+
+    h = comm.allreduce(h) % 2 ** 64
+    return '%016x' % h
+
 def attrs_to_dict(obj, prefix):
     if not hasattr(obj, 'attrs'):
         return {}
@@ -508,6 +921,43 @@ def timer(start, end):
     minutes, seconds = divmod(rem, 60)
     return "{:0>2}:{:0>2}:{:05.2f}".format(int(hours),int(minutes),seconds)
 
+def parse_bytes(s):
+    """
+    Utility function to convert a size in bytes, given as a number or
+    as a string with units, e.g., '4GB', '512 MiB', '1e8', to an integer
+    number of bytes.
+
+    Parameters
+    ----------
+    s : int, float, str
+        the size to convert
+
+    Returns
+    -------
+    int :
+        the number of bytes
+    """
+    from six import string_types
+
+    if not isinstance(s, string_types):
+        return int(s)
+
+    units = {'b' : 1, 'kb' : 1e3, 'mb' : 1e6, 'gb' : 1e9, 'tb' : 1e12,
+             'kib' : 2**10, 'mib' : 2**20, 'gib' : 2**30, 'tib' : 2**40}
+    s = s.replace(' ', '').lower()
+
+    i = len(s)
+    while i > 0 and s[i-1].isalpha():
+        i -= 1
+    number, unit = s[:i], s[i:]
+    if unit and unit[-1] != 'b':
+        unit = unit + 'b'
+
+    if unit not in units and unit:
+        raise ValueError("cannot parse the size '%s'; unknown unit '%s'" % (s, unit))
+
+    return int(float(number or 1) * units.get(unit, 1))
+
 @contextlib.contextmanager
 def captured_output(comm, root=0):
     """
@@ -530,7 +980,6 @@ def captured_output(comm, root=0):
             sys.stdout = old_stdout
             sys.stderr = old_stderr
 
-import mpsort
 class DistributedArray(object):
     """
     Distributed Array Object
@@ -634,17 +1083,17 @@ class DistributedArray(object):
             inp['el'][o:o + len(arg.local)]    = arg.local
             o = o + len(arg.local)
             go = go + arg.cshape[0]
-        mpsort.sort(inp, orderby='index', out=out, comm=comm)
+        ParallelSort(inp, orderby='index', out=out, comm=comm)
         return DistributedArray(out['el'].copy(), comm=comm)
 
     def sort(self, orderby=None):
         """
-        Sort array globally by key orderby.
+        Sort array globally by key orderby, with :func:`ParallelSort`.
 
-        Due to a limitation of mpsort, self[orderby] must be u8.
+        With the 'mpsort' engine, self[orderby] must be u8, i8, u4 or i4.
 
         """
-        mpsort.sort(self.local, orderby, comm=self.comm)
+        ParallelSort(self.local, orderby, comm=self.comm)
 
     def __getitem__(self, key):
         return DistributedArray(self.local[key], self.comm)
@@ -0,0 +1,209 @@
+"""
+Spherical harmonic kernels, represented as polynomials of the Cartesian
+components of unit vectors.
+
+The polynomial coefficients are derived once per process from the
+Legendre polynomials with NumPy, and are stored in a process-wide
+registry; see :func:`get_real_Ylm` and :func:`get_complex_Ylm`.
+The kernels are evaluated with cached powers of the unit vectors, which
+can be shared between all of the harmonics evaluated on the same input.
+"""
+import numpy
+from math import factorial
+
+# process-wide registry of kernels, keyed by (kind, l, m)
+_registry = {}
+
+def _legendre_derivative(l, m):
+    """
+    The coefficients of :math:`d^m P_l(x) / dx^m`, in increasing
+    powers of ``x``; the length of the result is ``l - m + 1``.
+    """
+    from numpy.polynomial import legendre, polynomial
+
+    c = numpy.zeros(l + 1)
+    c[l] = 1.
+    p = legendre.leg2poly(c)
+    if m > 0:
+        p = polynomial.polyder(p, m)
+
+    # exact zeros for the vanishing (wrong-parity) terms
+    p = numpy.array(p, dtype='f8')
+    p[(l - m - numpy.arange(len(p))) % 2 == 1] = 0.
+    return p
+
+def power_table(x, maxpower):
+    """
+    Return a list of the powers ``x**0``, ..., ``x**maxpower``, computed
+    with the recurrence ``x**n = x**(n-1) * x``.
+
+    The zero-th power is the scalar 1, which broadcasts against any input.
+    """
+    toret = [1., x]
+    for n in range(2, maxpower + 1):
+        toret.append(toret[-1] * x)
+    return toret[:maxpower + 1]
+
+class RealYlm(object):
+    """
+    The real spherical harmonic of order ``(l, m)``, as a homogeneous
+    polynomial of degree ``l`` in the Cartesian unit vectors
+    ``(xhat, yhat, zhat)``.
+
+    Parameters
+    ----------
+    l : int
+        the degree of the harmonic
+    m : int
+        the order of the harmonic; abs(m) <= l
+
+    References
+    ----------
+    https://en.wikipedia.org/wiki/Spherical_harmonics#Real_form
+    """
+    def __init__(self, l, m):
+
+        self.l = l = int(l)
+        self.m = m = int(m)
+        if abs(m) > l:
+            raise ValueError("the order of the harmonic must satisfy abs(m) <= l")
+
+        M = abs(m)
+
+        # the normalization factors
+        if m == 0:
+            amp = ((2*l+1) / (4*numpy.pi)) ** 0.5
+        else:
+            amp = (2*(2*l+1) / (4*numpy.pi) * factorial(l-M) / factorial(l+M)) ** 0.5
+
+        # r^(l-M) d^M P_l(z/r) / dz^M, with r^2 = x^2 + y^2 + z^2
+        zpoly = {}
+        q = _legendre_derivative(l, M)
+        for k, qk in enumerate(q):
+            if qk == 0: continue
+            n = (l - M - k) // 2
+            for a in range(n + 1):
+                for b in range(n - a + 1):
+                    c = n - a - b
+                    key = (2*a, 2*b, 2*c + k)
+                    coeff = qk * (factorial(n) // (factorial(a) * factorial(b) * factorial(c)))
+                    zpoly[key] = zpoly.get(key, 0.) + coeff
+
+        # the cos(M phi) or sin(M phi) dependence: Re or Im of (x + iy)^M
+        xypoly = {}
+        for j in range(M + 1):
+            if m >= 0 and j % 2 == 0:
+                sign = (-1) ** (j // 2)
+            elif m < 0 and j % 2 == 1:
+                sign = (-1) ** ((j - 1) // 2)
+            else:
+                continue
+            xypoly[(M - j, j, 0)] = sign * (factorial(M) // (factorial(j) * factorial(M - j)))
+
+        terms = {}
+        for p1, c1 in zpoly.items():
+            for p2, c2 in xypoly.items():
+                key = tuple(i1 + i2 for i1, i2 in zip(p1, p2))
+                terms[key] = terms.get(key, 0.) + c1 * c2
+
+        keys = sorted(k for k in terms if terms[k] != 0)
+        self.powers = numpy.array(keys, dtype='intp').reshape(-1, 3)
+        self.coeffs = amp * numpy.array([terms[k] for k in keys], dtype='f8')
+
+    def __repr__(self):
+        return "RealYlm(l=%d, m=%d)" % (self.l, self.m)
+
+    def __call__(self, xhat, yhat, zhat):
+        """
+        Evaluate the harmonic on the unit-normalized Cartesian coordinates.
+        """
+        table = [power_table(x, self.l) for x in (xhat, yhat, zhat)]
+        return self.evaluate(table)
+
+    def evaluate(self, table):
+        """
+        Evaluate the harmonic from a table of powers of the coordinates,
+        as returned by :func:`power_table` for each of ``(xhat, yhat, zhat)``,
+        up to at least a power of ``l``.
+        """
+        toret = 0.
+        for (a, b, c), coeff in zip(self.powers, self.coeffs):
+            toret = toret + coeff * (table[0][a] * table[1][b] * table[2][c])
+        return toret
+
+class ComplexYlm(object):
+    r"""
+    The complex spherical harmonic of order ``(l, m)``, with
+    :math:`m \geq 0`, as a polynomial of :math:`\hat{x} + i \hat{y}`
+    and :math:`\hat{z}`.
+
+    The harmonic includes the Condon-Shortley phase, and is given by
+
+    .. math::
+
+        Y_{lm} = (-1)^m N_{lm} (\hat{x} + i \hat{y})^m \frac{d^m P_l(\hat{z})}{d\hat{z}^m}.
+
+    Parameters
+    ----------
+    l : int
+        the degree of the harmonic
+    m : int
+        the order of the harmonic; 0 <= m <= l
+
+    References
+    ----------
+    https://en.wikipedia.org/wiki/Spherical_harmonics
+    """
+    def __init__(self, l, m):
+
+        self.l = l = int(l)
+        self.m = m = int(m)
+        if not 0 <= m <= l:
+            raise ValueError("the order of the harmonic must satisfy 0 <= m <= l")
+
+        amp = ((2*l+1) / (4*numpy.pi) * factorial(l-m) / factorial(l+m)) ** 0.5
+        self.coeffs = (-1) ** m * amp * _legendre_derivative(l, m)
+
+    def __repr__(self):
+        return "ComplexYlm(l=%d, m=%d)" % (self.l, self.m)
+
+    def __call__(self, xpyhat, zhat):
+        r"""
+        Evaluate the harmonic, where ``xpyhat`` is
+        :math:`\hat{x} + i \hat{y}` and ``zhat`` is :math:`\hat{z}`.
+        """
+        return self.evaluate(power_table(xpyhat, self.l), power_table(zhat, self.l))
+
+    def evaluate(self, xpyhat_table, zhat_table):
+        r"""
+        Evaluate the harmonic from the tables of powers of
+        :math:`\hat{x} + i \hat{y}` and :math:`\hat{z}`, as returned
+        by :func:`power_table` up to at least a power of ``l``.
+        """
+        toret = 0.
+        for k, coeff in enumerate(self.coeffs):
+            if coeff == 0: continue
+            toret = toret + coeff * zhat_table[k]
+        if self.m > 0:
+            toret = toret * xpyhat_table[self.m]
+        return toret
+
+def get_real_Ylm(l, m):
+    """
+    Return the :class:`RealYlm` kernel of order ``(l, m)`` from the
+    process-wide registry, creating it on first use.
+    """
+    key = ('real', int(l), int(m))
+    if key not in _registry:
+        _registry[key] = RealYlm(l, m)
+    return _registry[key]
+
+def get_complex_Ylm(l, m):
+    """
+    Return the :class:`ComplexYlm` kernel of order ``(l, m)`` from the
+    process-wide registry, creating it on first use.
+    """
+    key = ('complex', int(l), int(m))
+    if key not in _registry:
+        _registry[key] = ComplexYlm(l, m)
+    return _registry[key]